@@ -0,0 +1,133 @@
+""" Mesure de bout en bout des récupérations depuis l'Ecodevice (requêtes
+graph.json des données météo et téléchargements des fichiers de
+configuration), sur le simulateur local de l'Ecodevice avec différents
+nombres de requêtes simultanées. Les résultats sont affichés et peuvent
+être enregistrés dans un fichier json pour comparer les versions.
+
+Utilisation :
+    python bench_fetch.py --days 90 --latency 0.05 --concurrency 1 2 4 --output bench_fetch.json
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import ecodevice_simulator
+import globalconfigfile
+import weather
+
+# Retourne les statistiques (en millisecondes) d'une liste de durées
+def latency_summary(durations):
+    if not durations:
+        return {}
+    durations = sorted(durations)
+    summary = {'min': durations[0] * 1000, 'max': durations[-1] * 1000, 'moyenne': statistics.fmean(durations) * 1000}
+    if len(durations) > 1:
+        percentiles = statistics.quantiles(durations, n=100, method='inclusive')
+        summary.update({'p50': percentiles[49] * 1000, 'p90': percentiles[89] * 1000, 'p99': percentiles[98] * 1000})
+    return {key: round(value, 2) for key, value in summary.items()}
+
+# Mesure la récupération des données météo de tous les champs depuis une
+# date de début, pour un nombre de requêtes simultanées donné
+def bench_graph(server, startDate, concurrency, interval):
+    weather.maxConcurrentRequests = concurrency
+    weather.minRequestInterval = interval
+    if weather.session is not None:
+        weather.session.close()
+    weather.session = None # nouvelle session dimensionnée pour la concurrence
+    latencies = []
+    postGraph = weather.postGraph
+
+    def timed_postGraph(param, host=None, deadline=None):
+        start = time.perf_counter()
+        try:
+            return postGraph(param, host, deadline)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    weather.postGraph = timed_postGraph
+    server.take_stats()
+    try:
+        start = time.perf_counter()
+        rows = weather.getWeatherFromDevice(startDate)
+        duration = time.perf_counter() - start
+    finally:
+        weather.postGraph = postGraph
+    weather.session.close()
+    stats = server.take_stats()
+    return {'requêtes simultanées': concurrency,
+            'délai entre requêtes (s)': interval,
+            'durée (s)': round(duration, 3),
+            'requêtes': len(latencies),
+            'requêtes par seconde': round(len(latencies) / duration, 2) if duration else None,
+            'heures récupérées': len(rows),
+            'latence (ms)': latency_summary(latencies),
+            'serveur': stats}
+
+# Mesure les téléchargements des fichiers de configuration seule et
+# globale
+def bench_downloads(server, count):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, download in ('config', lambda path: weather.downloadConfigfile(path, 'config')), ('system', globalconfigfile.download_globalConf_file):
+            durations = []
+            size = 0
+            for k in range(count):
+                path = os.path.join(workdir, f'{name}_{k}.gce')
+                start = time.perf_counter()
+                download(path)
+                durations.append(time.perf_counter() - start)
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+            if name == 'system':
+                globalconfigfile.close_globalConf_file() # libère le fichier avant la suppression du répertoire
+            results.append({'fichier': name + '.gce', 'taille (octets)': size,
+                            'débit (Mo/s)': round(size / statistics.fmean(durations) / 1e6, 2) if size else None,
+                            'durée (ms)': latency_summary(durations)})
+    server.take_stats()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Mesure des récupérations depuis un Ecodevice simulé')
+    parser.add_argument('--days', type=int, default=90, help='historique météo demandé (jours)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 3, 4, 6], help='nombres de requêtes simultanées mesurés')
+    parser.add_argument('--interval', type=float, default=0.0, help='délai minimum entre deux requêtes (s)')
+    parser.add_argument('--latency', type=float, default=0.05, help='temps de réponse simulé (s)')
+    parser.add_argument('--jitter', type=float, default=0.01, help='variation du temps de réponse simulé (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='proportion de réponses en erreur simulées')
+    parser.add_argument('--max-connections', type=int, default=0, help='connexions simultanées acceptées par le simulateur (0 : sans limite)')
+    parser.add_argument('--downloads', type=int, default=3, help='nombre de téléchargements mesurés par fichier')
+    parser.add_argument('--output', help='fichier json des résultats')
+    args = parser.parse_args()
+
+    server = ecodevice_simulator.start_simulator(latency=args.latency, jitter=args.jitter, errorRate=args.error_rate, maxConnections=args.max_connections)
+    host = f'{server.server_address[0]}:{server.server_address[1]}'
+    weather.ecodevice = host
+    globalconfigfile.ecodevice = host
+    weather.retryBackoff = 0.05
+
+    startDate = datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=args.days), datetime.time())
+    results = {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+               'paramètres': vars(args),
+               'graph.json': [bench_graph(server, startDate, concurrency, args.interval) for concurrency in args.concurrency],
+               'téléchargements': bench_downloads(server, args.downloads)}
+    server.shutdown()
+
+    for result in results['graph.json']:
+        latency = result['latence (ms)']
+        print(f'{result["requêtes simultanées"]} requêtes simultanées : {result["durée (s)"]} s, {result["requêtes par seconde"]} requêtes/s, '
+              f'latence p50 {latency.get("p50")} ms p90 {latency.get("p90")} ms max {latency.get("max")} ms')
+    for result in results['téléchargements']:
+        print(f'{result["fichier"]} : {result["débit (Mo/s)"]} Mo/s, durée moyenne {result["durée (ms)"].get("moyenne")} ms')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as outfile:
+            json.dump(results, outfile, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+""" Mesure des lectures des fichiers de configuration de l'Ecodevice RT2
+sur des fichiers synthétiques (gcegen.py) de différentes durées
+d'historique :
+- micro : recherche des positions des jours et des heures (datePosition,
+  dateTimePosition) et lecture des relevés (get_day_TIC, get_hour_TIC)
+- macro : export d'un intervalle (get_TICmeasures_all), marquage des
+  erreurs (get_TICerrors), export csv (dont l'export en un seul
+  parcours des mesures et des erreurs), recherche des anomalies et
+  lecture des données météo (getWeatherFromConfigFile)
+
+Chaque mesure est répétée et la meilleure durée est retenue. Les
+résultats sont affichés et peuvent être enregistrés dans un fichier json,
+puis comparés à ceux d'une version précédente.
+
+Utilisation :
+    python bench_readers.py --days 30 365 1095 --output bench_readers.json
+    python bench_readers.py --compare bench_readers_avant.json
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import tempfile
+import time
+
+import gcegen
+import globalconfigfile as gcf
+import weather
+
+# Nombre de lectures par mesure micro
+microCount = 1000
+
+# Retourne la meilleure durée (en secondes) de plusieurs exécutions d'une
+# fonction, ainsi que le résultat de la dernière exécution. setup est
+# appelé avant chaque exécution, hors mesure
+def best_time(function, repeat, setup=None):
+    best = None
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = function()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, result
+
+# Retourne les dates et heures lues par les mesures micro, réparties sur
+# tout l'historique
+def sample_datetimes(startDate, days, count):
+    start = datetime.datetime.combine(startDate, datetime.time())
+    return [start + datetime.timedelta(days=(k * 7919) % days, hours=1 + (k * 13) % 23) for k in range(count)]
+
+# Mesure les lectures d'une configuration globale synthétique de days
+# jours
+def bench_globalConf(workdir, days, repeat):
+    fullfilename = os.path.join(workdir, f'system_{days}.gce')
+    gcegen.write_file(gcegen.generate_globalConf(days, cutRate=0.02, missingDayRate=0.005, absentRate=0.001), fullfilename)
+    gcf.load_globalConf_file(fullfilename)
+    globalConf = gcf.arrGlobalConf
+    samples = sample_datetimes(gcegen.defaultStartDate, days, microCount)
+    labels = list(gcf.TIC_label_order)
+
+    def reset_indexes():
+        globalConf.dayIndex = None
+        globalConf.hourIndex.clear()
+
+    results = {}
+    results['datePosition (premier appel)'], _ = best_time(lambda: gcf.datePosition(samples[0]), repeat, reset_indexes)
+    results['datePosition'], _ = best_time(lambda: [gcf.datePosition(date) for date in samples], repeat)
+    results['dateTimePosition (premier appel)'], _ = best_time(lambda: [gcf.dateTimePosition(date) for date in samples], repeat, reset_indexes)
+    results['dateTimePosition'], _ = best_time(lambda: [gcf.dateTimePosition(date) for date in samples], repeat)
+    results['get_day_TIC'], _ = best_time(lambda: [gcf.get_day_TIC(labels[k % len(labels)], date) for k, date in enumerate(samples)], repeat)
+    results['get_hour_TIC'], _ = best_time(lambda: [gcf.get_hour_TIC(labels[k % len(labels)], date) for k, date in enumerate(samples)], repeat)
+    micro = {name: round(duration / microCount * 1e6, 3) for name, duration in results.items()}
+    micro['datePosition (premier appel)'] = round(results['datePosition (premier appel)'] * 1e6, 3)
+
+    startDate = datetime.datetime.combine(gcegen.defaultStartDate, datetime.time()) + datetime.timedelta(days=1)
+    endDate = startDate + datetime.timedelta(days=days - 2)
+    csvfilename = os.path.join(workdir, f'system_{days}.csv')
+    macro = {}
+    macro['get_TICmeasures_all'], measures = best_time(lambda: gcf.get_TICmeasures_all(startDate, endDate), repeat)
+    macro['get_TICerrors'], errors = best_time(lambda: gcf.get_TICerrors(measures), repeat)
+    macro['outputTICmeasuresInCsv'], _ = best_time(lambda: gcf.outputTICmeasuresInCsv(errors, csvfilename), repeat)
+    errorsCsvfilename = os.path.join(workdir, f'system_{days}_erreurs.csv')
+    macro['outputTICmeasuresAndErrorsInCsv'], _ = best_time(lambda: gcf.outputTICmeasuresAndErrorsInCsv(gcf.iter_TICmeasures(startDate, endDate), csvfilename, errorsCsvfilename), repeat)
+    if gcf.np is not None:
+        macro['scan_TIC_anomalies'], _ = best_time(gcf.scan_TIC_anomalies, repeat)
+    globalConf.close()
+    return {'jours': days,
+            'taille (octets)': os.path.getsize(fullfilename),
+            'mesures exportées': len(measures),
+            'micro (µs par lecture)': micro,
+            'macro (s)': {name: round(duration, 4) for name, duration in macro.items()}}
+
+# Mesure la lecture des données météo d'une configuration seule
+# synthétique de days jours
+def bench_config(workdir, days, repeat):
+    fullfilename = os.path.join(workdir, f'config_{days}.gce')
+    gcegen.write_file(gcegen.generate_config(days * 24, gapRate=0.0), fullfilename)
+    csvfilename = os.path.join(workdir, f'config_{days}.csv')
+    macro = {}
+    macro['loadConfigFile'], _ = best_time(lambda: weather.loadConfigFile(fullfilename), repeat)
+    macro['getWeatherFromConfigFile'], rows = best_time(weather.getWeatherFromConfigFile, repeat)
+    macro['outputWeatherInCsv'], _ = best_time(lambda: weather.outputWeatherInCsv(rows, csvfilename), repeat)
+    return {'jours': days,
+            'heures lues': len(rows),
+            'macro (s)': {name: round(duration, 4) for name, duration in macro.items()}}
+
+# Affiche les résultats, avec le rapport aux résultats précédents donnés
+# (> 1 : plus lent)
+def print_results(results, previous=None):
+    before = {}
+    if previous is not None:
+        for kind in 'configuration globale', 'configuration seule':
+            for result in previous.get(kind, []):
+                before[kind, result['jours']] = result
+    for kind in 'configuration globale', 'configuration seule':
+        for result in results[kind]:
+            print(f'\n{kind}, {result["jours"]} jours')
+            old = before.get((kind, result['jours']), {})
+            for group, unit in ('micro (µs par lecture)', 'µs'), ('macro (s)', 's'):
+                for name, value in result.get(group, {}).items():
+                    ratio = ''
+                    oldValue = old.get(group, {}).get(name)
+                    if oldValue:
+                        ratio = f' (x{value / oldValue:.2f})'
+                    print(f'  {name} : {value} {unit}{ratio}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Mesure des lectures des fichiers de configuration de l\'Ecodevice RT2')
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 90, 365, 1095], help='durées d\'historique mesurées (jours)')
+    parser.add_argument('--repeat', type=int, default=3, help='nombre d\'exécutions par mesure (meilleure durée retenue)')
+    parser.add_argument('--output', help='fichier json des résultats')
+    parser.add_argument('--compare', help='fichier json de résultats précédents à comparer')
+    args = parser.parse_args()
+
+    results = {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+               'python': platform.python_version(),
+               'numpy': None if gcf.np is None else gcf.np.__version__,
+               'paramètres': vars(args)}
+    with tempfile.TemporaryDirectory() as workdir:
+        results['configuration globale'] = [bench_globalConf(workdir, days, args.repeat) for days in args.days]
+        results['configuration seule'] = [bench_config(workdir, days, args.repeat) for days in args.days]
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as infile:
+            previous = json.load(infile)
+    print_results(results, previous)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as outfile:
+            json.dump(results, outfile, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
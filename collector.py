@@ -0,0 +1,215 @@
+""" Collecte des sauvegardes et des données météo de plusieurs Ecodevice
+RT2 en même temps : pour chaque Ecodevice de la liste, téléchargement de
+la configuration globale (system) et de la configuration seule (config)
+et récupération des données météo par les requêtes graph.json depuis une
+date de début. Les Ecodevice sont traités en parallèle (asyncio), les
+tâches d'un même Ecodevice dans la limite de ses requêtes simultanées,
+avec un délai aléatoire avant chaque tâche (pour ne pas solliciter tous
+les Ecodevice au même instant) et un délai maximum par tâche. La durée
+de la collecte est ainsi celle de l'Ecodevice le plus lent, et non la
+somme des durées.
+
+Les résultats sont conservés dans un dossier par Ecodevice :
+
+    dossier/<nom>/system_<date>.gce    configuration globale
+    dossier/<nom>/config_<date>.gce    configuration seule
+    dossier/<nom>/météo.sqlite         cache des données météo (voir weather.py)
+    dossier/<nom>/météo_<date>.csv     données météo depuis la date de début
+    dossier/<nom>/archive.sqlite       archive dédupliquée (option --archive, voir gcearchive.py)
+
+La liste des Ecodevice est donnée en arguments (nom=adresse) ou dans un
+fichier csv (séparateur ';') avec une ligne d'entête :
+
+    Nom;Adresse;Requêtes simultanées
+    maison;192.168.1.19;1
+    atelier;192.168.2.19;
+
+Utilisation :
+    python collector.py collecte maison=192.168.1.19 atelier=192.168.2.19
+    python collector.py collecte --devices ecodevices.csv --weather-start 2024-01-01 --archive
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import csv
+import datetime
+import os
+import random
+import time
+
+import gcearchive
+import gcedownload
+import globalconfigfile as gcf
+import weather
+
+# Tâches possibles pour chaque Ecodevice
+collectJobs = ('system', 'config', 'météo')
+
+# Requêtes simultanées par défaut vers un même Ecodevice (tâches en
+# parallèle, chaque récupération météo envoyant elle-même jusqu'à
+# weather.maxConcurrentRequests requêtes)
+defaultDeviceConcurrency = 1
+
+# Délai maximum d'une tâche (secondes) et délai aléatoire maximum avant
+# chaque tâche (secondes)
+defaultJobTimeout = 600
+defaultJitter = 2.0
+
+# Lit un fichier csv de la liste des Ecodevice et retourne la liste des
+# Ecodevice, chacun sous la forme d'un dictionnaire avec le nom,
+# l'adresse et le nombre de requêtes simultanées
+def read_devices_csv(fullfilename):
+    devices = []
+    with open(fullfilename, newline='') as csvfile:
+        reader = csv.reader(csvfile, delimiter=';')
+        next(reader, None) # entête
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            cells = [cell.strip() for cell in row] + ['']
+            if not cells[0] or not cells[1]:
+                raise Exception(f'Fichier des Ecodevice non conforme, ligne {reader.line_num} : nom et adresse attendus')
+            devices.append({'nom': cells[0], 'adresse': cells[1], 'requêtes simultanées': int(cells[2]) if cells[2] else defaultDeviceConcurrency})
+    return devices
+
+# Retourne un Ecodevice donné en argument sous la forme nom=adresse
+def parse_device(text):
+    name, separator, host = text.partition('=')
+    if not separator or not name or not host:
+        raise argparse.ArgumentTypeError(f'{text} : nom=adresse attendu')
+    return {'nom': name, 'adresse': host, 'requêtes simultanées': defaultDeviceConcurrency}
+
+# Télécharge une configuration (system ou config) d'un Ecodevice dans
+# son dossier, avant l'échéance donnée (time.monotonic()) s'il y en a
+# une. Retourne le nom du fichier écrit
+def download_configuration(device, kind, directory, deadline=None):
+    fullfilename = os.path.join(directory, f'{kind}_{datetime.datetime.now():%Y-%m-%dT%H-%M-%S}.gce')
+    configType = 'global' if kind == 'system' else 'config'
+    validate = gcf.validate_globalConf_file if kind == 'system' else weather.validateConfigFile
+    gcedownload.download_gce('http://' + device['adresse'] + '/admin/download/' + weather.configAPI[configType] + '.gce', fullfilename, validate, deadline)
+    return fullfilename
+
+# Récupère les données météo d'un Ecodevice depuis une date de début (en
+# utilisant le cache météo de son dossier), avant l'échéance donnée
+# (time.monotonic()) s'il y en a une, et les exporte dans un fichier csv.
+# Retourne le nom du fichier écrit
+def collect_weather(device, startDate, directory, deadline=None):
+    cache = weather.openWeatherCache(os.path.join(directory, 'météo.sqlite'))
+    try:
+        rows = weather.getWeatherFromDevice(startDate, cache, device['adresse'], deadline)
+    finally:
+        cache.close()
+    fullfilename = os.path.join(directory, f'météo_{datetime.datetime.now():%Y-%m-%dT%H-%M-%S}.csv')
+    weather.outputWeatherInCsv(rows, fullfilename)
+    return fullfilename
+
+# Ajoute une sauvegarde téléchargée à l'archive dédupliquée du dossier
+# de l'Ecodevice
+def archive_file(fullfilename, directory):
+    archive = gcearchive.open_archive(os.path.join(directory, 'archive.sqlite'))
+    try:
+        gcearchive.ingest(archive, fullfilename)
+    finally:
+        archive.close()
+
+# Exécute une tâche d'un Ecodevice (dans un thread, les téléchargements
+# et les requêtes étant bloquants), après un délai aléatoire et dans la
+# limite des requêtes simultanées de l'Ecodevice. Le délai maximum est
+# appliqué dans les téléchargements et les requêtes eux-mêmes ; un
+# thread ne pouvant pas être interrompu, la tâche garde sa place dans la
+# limite de l'Ecodevice jusqu'à sa fin réelle (au plus la durée d'une
+# requête après le délai), et une tâche terminée après le délai est
+# indiquée en délai dépassé. Retourne le résultat de la tâche (état,
+# durée, fichier écrit)
+async def run_job(device, job, semaphore, options):
+    directory = os.path.join(options['dossier'], device['nom'])
+    await asyncio.sleep(random.uniform(0, options['jitter']))
+    async with semaphore:
+        start = time.perf_counter()
+        deadline = time.monotonic() + options['délai']
+        result = {'nom': device['nom'], 'tâche': job, 'état': 'ok', 'fichier': '', 'erreur': ''}
+        try:
+            if job == 'météo':
+                call = asyncio.to_thread(collect_weather, device, options['début météo'], directory, deadline)
+            else:
+                call = asyncio.to_thread(download_configuration, device, job, directory, deadline)
+            task = asyncio.ensure_future(call)
+            done, pending = await asyncio.wait({task}, timeout=options['délai'])
+            if pending:
+                print(f'{device["nom"]} {job} : délai dépassé, attente de la fin de la tâche')
+            result['fichier'] = await task
+            if pending or time.monotonic() >= deadline:
+                result['état'] = 'délai dépassé'
+                result['erreur'] = 'tâche terminée après le délai'
+            if options['archive'] and job != 'météo':
+                await asyncio.to_thread(archive_file, result['fichier'], directory)
+        except Exception as e:
+            result['état'] = 'délai dépassé' if time.monotonic() >= deadline else 'erreur'
+            result['erreur'] = str(e)
+        result['durée (s)'] = time.perf_counter() - start
+        print(f'{device["nom"]} {job} : {result["état"]} en {result["durée (s)"]:.2f} s' + (f' ({result["erreur"]})' if result['erreur'] else ''))
+        return result
+
+# Collecte les tâches données pour tous les Ecodevice en parallèle.
+# Retourne la liste des résultats de chaque tâche
+async def collect_devices(devices, jobs, options):
+    for device in devices:
+        os.makedirs(os.path.join(options['dossier'], device['nom']), exist_ok=True)
+    # assez de threads pour que chaque Ecodevice avance à son rythme
+    threads = sum(device['requêtes simultanées'] for device in devices) * 2
+    asyncio.get_running_loop().set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=max(1, threads)))
+    tasks = []
+    for device in devices:
+        semaphore = asyncio.Semaphore(device['requêtes simultanées'])
+        tasks += [run_job(device, job, semaphore, options) for job in jobs]
+    return await asyncio.gather(*tasks)
+
+# Collecte tous les Ecodevice (point d'entrée synchrone). Retourne la
+# liste des résultats de chaque tâche
+def collect(devices, rootdir, jobs=collectJobs, weatherStart=None, timeout=defaultJobTimeout, jitter=defaultJitter, archive=False):
+    names = [device['nom'] for device in devices]
+    if len(set(names)) != len(names):
+        raise Exception('Les noms des Ecodevice doivent être différents.')
+    options = {'dossier': rootdir,
+               'début météo': weatherStart or datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=7), datetime.time()),
+               'délai': timeout, 'jitter': jitter, 'archive': archive}
+    return asyncio.run(collect_devices(devices, jobs, options))
+
+# Exporte les résultats de la collecte dans un fichier csv
+def output_results(results, fullfilename):
+    with open(fullfilename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';')
+        writer.writerow(['Nom', 'Tâche', 'Etat', 'Durée (s)', 'Fichier', 'Erreur'])
+        for result in results:
+            writer.writerow([result['nom'], result['tâche'], result['état'], f'{result["durée (s)"]:.2f}', result['fichier'], result['erreur']])
+
+def main():
+    parser = argparse.ArgumentParser(description='Collecte en parallèle des sauvegardes et des données météo de plusieurs Ecodevice RT2')
+    parser.add_argument('rootdir', help='dossier de la collecte (un sous-dossier par Ecodevice)')
+    parser.add_argument('device', nargs='*', type=parse_device, help='Ecodevice sous la forme nom=adresse')
+    parser.add_argument('--devices', help='fichier csv de la liste des Ecodevice (Nom;Adresse;Requêtes simultanées)')
+    parser.add_argument('--jobs', nargs='+', choices=collectJobs, default=list(collectJobs), help='tâches pour chaque Ecodevice')
+    parser.add_argument('--weather-start', type=datetime.datetime.fromisoformat, help='date de début des données météo (AAAA-MM-JJ), 7 jours avant par défaut')
+    parser.add_argument('--timeout', type=float, default=defaultJobTimeout, help='délai maximum d\'une tâche (s)')
+    parser.add_argument('--jitter', type=float, default=defaultJitter, help='délai aléatoire maximum avant chaque tâche (s)')
+    parser.add_argument('--archive', action='store_true', help='ajouter les sauvegardes téléchargées à l\'archive de chaque Ecodevice')
+    args = parser.parse_args()
+
+    devices = list(args.device)
+    if args.devices:
+        devices += read_devices_csv(args.devices)
+    if not devices:
+        parser.error('aucun Ecodevice donné')
+    start = time.perf_counter()
+    results = collect(devices, args.rootdir, args.jobs, args.weather_start, args.timeout, args.jitter, args.archive)
+    fullfilename = os.path.join(args.rootdir, f'collecte_{datetime.datetime.now():%Y-%m-%dT%H-%M-%S}.csv')
+    output_results(results, fullfilename)
+    failed = sum(result['état'] != 'ok' for result in results)
+    print(f'{len(devices)} Ecodevice collectés en {time.perf_counter() - start:.2f} s (somme des tâches {sum(result["durée (s)"] for result in results):.2f} s), {failed} tâches en échec, résultats dans {fullfilename}')
+
+if __name__ == '__main__':
+    main()
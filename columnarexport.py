@@ -0,0 +1,187 @@
+""" Ce script exporte l'historique des index TIC d'un fichier de
+configuration globale et les données météo X-THL d'un fichier de
+configuration (seule ou globale) d'un Ecodevice RT2 dans des fichiers
+colonnes typés (Parquet ou Arrow IPC), partitionnés par mois :
+
+    dossier/jours/mois=2024-01/<fichier>.parquet   relevés quotidiens
+    dossier/heures/mois=2024-01/<fichier>.parquet  relevés horaires
+    dossier/météo/mois=2024-01/<fichier>.parquet   données météo
+
+Chaque fichier .gce exporté ajoute ses propres fichiers (colonne
+'fichier'), un nouvel export du même fichier remplace les précédents :
+les exports de nombreuses sauvegardes se lisent ensuite ensemble comme un
+seul jeu de données (read_dataset), sans relire de csv.
+
+Nécessite numpy et pyarrow (pip install numpy pyarrow).
+
+Utilisation :
+    python columnarexport.py tic system_2024-01-27T10-01-34.gce export
+    python columnarexport.py météo config_2024-01-30T15-31-26.gce export --format arrow
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import argparse
+import datetime
+import os
+
+import globalconfigfile as gcf
+import weather
+
+try:
+    import pyarrow as pa # optionnel, uniquement pour l'export en colonnes
+    import pyarrow.dataset
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pa = None
+
+# Formats d'export (extension des fichiers)
+fileFormats = {'parquet': 'parquet', 'arrow': 'arrow'}
+
+# Vérifie que pyarrow est disponible
+def require_pyarrow():
+    gcf.require_numpy()
+    if pa is None:
+        raise Exception('Cette fonction nécessite pyarrow (pip install pyarrow).')
+
+# Retourne les mois (premier et dernier jour) couvrant un intervalle de
+# dates
+def month_ranges(startDate, endDate):
+    ranges = []
+    monthStart = datetime.datetime(startDate.year, startDate.month, 1)
+    while monthStart <= endDate:
+        nextMonth = datetime.datetime(monthStart.year + monthStart.month // 12, monthStart.month % 12 + 1, 1)
+        ranges.append((max(monthStart, startDate), min(gcf.next_day(nextMonth, -1), endDate)))
+        monthStart = nextMonth
+    return ranges
+
+# Retourne un tableau pyarrow d'entiers, les valeurs non disponibles
+# (masque) étant nulles
+def masked_array(values, available, type):
+    return pa.array(values.ravel(), type=type, mask=~available.ravel())
+
+# Retourne la colonne des index TIC (dictionnaire) répétée pour chaque
+# ligne de valeurs
+def label_column(count):
+    labels = pa.array(list(gcf.TIC_label_order), type=pa.string())
+    return pa.DictionaryArray.from_arrays(pa.array(gcf.np.tile(gcf.np.arange(gcf.TICCount, dtype=gcf.np.int8), count)), labels)
+
+# Retourne la table des relevés quotidiens, une ligne par jour et index
+# TIC, à partir du résultat de get_TIC_range (index et prix cumulés à
+# 0h, consommations et prix du jour et entre 23:00 et 00:00 ; Wh et
+# cents, valeurs nulles si non disponibles)
+def TIC_day_table(TICrange, source):
+    np = gcf.np
+    days = len(TICrange['dates'])
+    dates = np.array(TICrange['dates'], dtype='datetime64[D]')
+    present = np.repeat(np.asarray(TICrange['jour présent'])[:, None], gcf.TICCount, axis=1)
+    complete = np.repeat(np.asarray(TICrange['jour complet'])[:, None], gcf.TICCount, axis=1)
+    columns = {'fichier': pa.array([source] * days * gcf.TICCount, type=pa.string()).dictionary_encode(),
+               'jour': pa.array(np.repeat(dates, gcf.TICCount), type=pa.date32()),
+               'index TIC': label_column(days),
+               'index': masked_array(np.asarray(TICrange['index']), present, pa.int64()),
+               'cumul prix': masked_array(np.asarray(TICrange['cumul prix']), present, pa.int64())}
+    for key, name in ('conso jour', 'conso jour'), ('prix jour', 'prix jour'), ('conso 00', 'conso 23h-00h'), ('prix 00', 'prix 23h-00h'):
+        columns[name] = masked_array(np.asarray(TICrange[key]), complete, pa.int64())
+    return pa.table(columns)
+
+# Retourne la table des relevés horaires (de 01:00 à 23:00), une ligne
+# par heure et index TIC, à partir du résultat de get_TIC_range
+# (consommations en Wh et prix en cents, valeurs nulles pour les heures
+# non enregistrées ou les valeurs absentes)
+def TIC_hour_table(TICrange, source):
+    np = gcf.np
+    days = len(TICrange['dates'])
+    hours = np.array(TICrange['dates'], dtype='datetime64[s]')[:, None] + np.arange(1, 24) * np.timedelta64(3600, 's')
+    available = np.asarray(TICrange['heure présente'])[..., None] & ~np.asarray(TICrange['conso absente'])
+    return pa.table({'fichier': pa.array([source] * days * 23 * gcf.TICCount, type=pa.string()).dictionary_encode(),
+                     'heure': pa.array(np.repeat(hours.ravel(), gcf.TICCount), type=pa.timestamp('s')),
+                     'index TIC': label_column(days * 23),
+                     'conso': masked_array(np.asarray(TICrange['conso']), available, pa.int32()),
+                     'prix': masked_array(np.asarray(TICrange['prix']), available, pa.int32())})
+
+# Retourne la table des données météo, une ligne par heure, à partir du
+# résultat de weather.decodeWeatherFromConfigFile (températures en °C,
+# humidités en %, luminosités entières)
+def weather_table(weatherColumns, source):
+    hours = weatherColumns['Heure']
+    columns = {'fichier': pa.array([source] * len(hours), type=pa.string()).dictionary_encode(),
+               'heure': pa.array(hours.astype('datetime64[s]'), type=pa.timestamp('s'))}
+    for field in weather.weatherField.values():
+        columns[field] = pa.array(weatherColumns[field], type=pa.int32() if field.endswith('Lum') else pa.float64())
+    return pa.table(columns)
+
+# Ecrit une table dans le fichier de la partition d'un mois (dossier
+# mois=AAAA-MM), en remplaçant l'export précédent du même fichier .gce.
+# Retourne le nom du fichier écrit
+def write_month_table(table, rootdir, month, source, fileFormat='parquet'):
+    directory = os.path.join(rootdir, f'mois={month:%Y-%m}')
+    os.makedirs(directory, exist_ok=True)
+    fullfilename = os.path.join(directory, f'{source}.{fileFormats[fileFormat]}')
+    if fileFormat == 'parquet':
+        pa.parquet.write_table(table, fullfilename, compression='zstd')
+    else:
+        pa.feather.write_feather(table, fullfilename, compression='zstd')
+    return fullfilename
+
+# Exporte les relevés quotidiens et horaires d'un intervalle de dates
+# (par défaut tout l'historique) dans les dossiers jours et heures,
+# mois par mois. Retourne la liste des fichiers écrits
+def export_TIC_history(rootdir, source, startDate=None, endDate=None, fileFormat='parquet', globalConf=None):
+    require_pyarrow()
+    if startDate is None or endDate is None:
+        first, last = gcf.history_date_range(globalConf)
+        startDate = startDate or first
+        endDate = endDate or last
+    written = []
+    for monthStart, monthEnd in month_ranges(startDate, endDate):
+        TICrange = gcf.get_TIC_range(monthStart, monthEnd, globalConf)
+        written.append(write_month_table(TIC_day_table(TICrange, source), os.path.join(rootdir, 'jours'), monthStart, source, fileFormat))
+        written.append(write_month_table(TIC_hour_table(TICrange, source), os.path.join(rootdir, 'heures'), monthStart, source, fileFormat))
+    return written
+
+# Exporte les données météo de la configuration chargée par weather.py
+# dans le dossier météo, mois par mois. Retourne la liste des fichiers
+# écrits
+def export_weather(rootdir, source, fileFormat='parquet'):
+    require_pyarrow()
+    np = gcf.np
+    weatherColumns = weather.decodeWeatherFromConfigFile()
+    months = weatherColumns['Heure'].astype('datetime64[M]')
+    written = []
+    for month in np.unique(months):
+        rows = months == month
+        table = weather_table({key: values[rows] for key, values in weatherColumns.items()}, source)
+        written.append(write_month_table(table, os.path.join(rootdir, 'météo'), month.astype(datetime.date), source, fileFormat))
+    return written
+
+# Retourne le jeu de données (pyarrow.dataset) d'un dossier exporté
+# ('jours', 'heures' ou 'météo'), avec la colonne de partition 'mois'
+def read_dataset(rootdir, kind, fileFormat='parquet'):
+    require_pyarrow()
+    return pa.dataset.dataset(os.path.join(rootdir, kind), format='parquet' if fileFormat == 'parquet' else 'ipc', partitioning='hive')
+
+def main():
+    parser = argparse.ArgumentParser(description='Export en colonnes (Parquet ou Arrow) de l\'historique TIC et des données météo de l\'Ecodevice RT2')
+    parser.add_argument('kind', choices=['tic', 'météo'], help='historique TIC (configuration globale) ou données météo')
+    parser.add_argument('gce', help='fichier de configuration .gce')
+    parser.add_argument('rootdir', help='dossier d\'export')
+    parser.add_argument('--start', type=datetime.datetime.fromisoformat, help='date de début (AAAA-MM-JJ), début de l\'historique par défaut')
+    parser.add_argument('--end', type=datetime.datetime.fromisoformat, help='date de fin (AAAA-MM-JJ), fin de l\'historique par défaut')
+    parser.add_argument('--format', choices=list(fileFormats), default='parquet')
+    parser.add_argument('--index-cache', choices=['écriture', 'lecture', 'aucun'], default='lecture', help='usage du cache des index à côté du fichier (lu sans être écrit par défaut)')
+    args = parser.parse_args()
+
+    source = os.path.splitext(os.path.basename(args.gce))[0]
+    if args.kind == 'tic':
+        gcf.load_globalConf_file(args.gce, args.index_cache)
+        written = export_TIC_history(args.rootdir, source, args.start, args.end, args.format)
+    else:
+        weather.loadConfigFile(args.gce)
+        written = export_weather(args.rootdir, source, args.format)
+    print(f'{len(written)} fichiers écrits dans {args.rootdir}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+""" Ce script simule localement le serveur web d'un Ecodevice RT2 pour
+tester et mesurer les scripts sans solliciter l'Ecodevice :
+- /graph.json (requête POST period/startY/startM/startD/opt/target) avec
+  des données météo X-THL synthétiques au même format que l'Ecodevice
+- /admin/download/config.gce et /admin/download/system.gce avec des
+  fichiers donnés ou des fichiers synthétiques (gcegen.py)
+
+Le temps de réponse, le taux d'erreurs, les téléchargements interrompus
+et les limites de connexions sont configurables. Les téléchargements
+peuvent être repris (en-tête Range).
+
+Utilisation :
+    python ecodevice_simulator.py --port 8080 --latency 0.05 --error-rate 0.02
+
+Puis dans les scripts : ecodevice = '127.0.0.1:8080'
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import argparse
+import datetime
+import http.server
+import json
+import math
+import random
+import threading
+import time
+import urllib.parse
+
+import gcegen
+
+# Durée de l'historique des fichiers synthétiques servis à défaut de
+# fichiers donnés (jours)
+syntheticDays = 365
+
+# Retourne la valeur synthétique d'un champ météo pour une heure donnée
+# (température et humidité journalières, luminosité de jour)
+def graph_value(target, hour):
+    phase = 2 * math.pi * (hour.hour - 9) / 24
+    sensor = (int(target) - 200) // 3
+    field = (int(target) - 200) % 3
+    if field == 0: # Temp
+        return round(12 + 5 * sensor + 6 * math.sin(phase) + (hour.day % 7) / 2, 2)
+    if field == 1: # Hum
+        return round(70 - 15 * math.sin(phase) + (hour.day % 5), 2)
+    return max(0, int(20000 * math.sin(2 * math.pi * (hour.hour - 6) / 24))) # Lum
+
+# Retourne la réponse graph.json pour une requête : les valeurs horaires
+# des 3 jours à partir de la veille de la date demandée (0 pour les
+# heures futures)
+def graph_response(form):
+    date = datetime.datetime(int(form['startY']), int(form['startM']), int(form['startD']))
+    target = form['target']
+    now = datetime.datetime.now()
+    values = []
+    hour = date - datetime.timedelta(days=1)
+    for _ in range(72):
+        values.append(graph_value(target, hour) if hour <= now else 0)
+        hour += datetime.timedelta(hours=1)
+    return {'data': json.dumps(values).replace(' ', '')}
+
+# Retourne le contenu synthétique reproductible d'un fichier de
+# configuration ('config' ou 'system')
+def synthetic_file(name):
+    if name == 'config':
+        return bytes(gcegen.generate_config(syntheticDays * 24))
+    return bytes(gcegen.generate_globalConf(syntheticDays, cutRate=0.02, absentRate=0.001))
+
+# Serveur simulé : paramètres de simulation et statistiques partagés
+# entre les connexions
+class EcodeviceSimulator(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, errorRate=0.0, truncateRate=0.0, maxConnections=0, maxRequestsPerConnection=0, files=None, seed=0):
+        super().__init__(address, EcodeviceRequestHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.errorRate = errorRate
+        self.truncateRate = truncateRate
+        self.maxConnections = maxConnections
+        self.maxRequestsPerConnection = maxRequestsPerConnection
+        self.files = files or {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'connexions': 0, 'connexions refusées': 0, 'connexions simultanées max': 0, 'requêtes': 0, 'erreurs simulées': 0, 'téléchargements interrompus': 0, 'octets envoyés': 0}
+        self.connections = 0
+
+    # Retourne le contenu d'un fichier de configuration ('config' ou
+    # 'system'), lu une seule fois
+    def file_content(self, name):
+        with self.lock:
+            content = self.files.get(name)
+            if content is None or isinstance(content, str):
+                if content is None:
+                    content = synthetic_file(name)
+                else:
+                    with open(content, 'rb') as infile:
+                        content = infile.read()
+                self.files[name] = content
+        return content
+
+    # Tire le temps de réponse et l'erreur éventuelle d'une requête
+    def draw(self):
+        with self.lock:
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            error = self.random.random() < self.errorRate
+            self.stats['requêtes'] += 1
+            if error:
+                self.stats['erreurs simulées'] += 1
+        return delay, error
+
+    # Tire l'interruption éventuelle d'un téléchargement
+    def draw_truncation(self):
+        with self.lock:
+            truncated = self.random.random() < self.truncateRate
+            if truncated:
+                self.stats['téléchargements interrompus'] += 1
+        return truncated
+
+    # Retourne une copie des statistiques et les remet à zéro
+    def take_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            for key in self.stats:
+                self.stats[key] = 0
+        return stats
+
+class EcodeviceRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.requestCount = 0
+        self.refused = False
+        server = self.server
+        with server.lock:
+            if server.maxConnections and server.connections >= server.maxConnections:
+                self.refused = True
+                server.stats['connexions refusées'] += 1
+            else:
+                server.connections += 1
+                server.stats['connexions'] += 1
+                server.stats['connexions simultanées max'] = max(server.stats['connexions simultanées max'], server.connections)
+
+    def finish(self):
+        super().finish()
+        if not self.refused:
+            with self.server.lock:
+                self.server.connections -= 1
+
+    def handle(self):
+        if self.refused:
+            self.raw_requestline = self.rfile.readline(65537)
+            if self.parse_request():
+                self.send_body(503, b'Service Unavailable', 'text/plain')
+            return
+        super().handle()
+
+    # Envoie une réponse. Si truncated, seule la première moitié du corps
+    # est envoyée puis la connexion est fermée
+    def send_body(self, status, body, contentType, headers=None, truncated=False):
+        self.requestCount += 1
+        self.send_response(status)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        limit = self.server.maxRequestsPerConnection
+        if self.refused or truncated or (limit and self.requestCount >= limit):
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        if truncated:
+            body = body[:len(body) // 2]
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.stats['octets envoyés'] += len(body)
+
+    def simulate(self):
+        delay, error = self.server.draw()
+        time.sleep(delay)
+        if error:
+            self.send_body(500, b'Internal Server Error', 'text/plain')
+        return not error
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = {key: values[0] for key, values in urllib.parse.parse_qs(self.rfile.read(length).decode()).items()}
+        if self.path != '/graph.json':
+            self.send_body(404, b'Not Found', 'text/plain')
+            return
+        if not self.simulate():
+            return
+        try:
+            body = json.dumps(graph_response(form)).encode()
+        except (KeyError, ValueError):
+            self.send_body(400, b'Bad Request', 'text/plain')
+            return
+        self.send_body(200, body, 'application/json')
+
+    def do_GET(self):
+        names = {'/admin/download/config.gce': 'config', '/admin/download/system.gce': 'system'}
+        if self.path not in names:
+            self.send_body(404, b'Not Found', 'text/plain')
+            return
+        if not self.simulate():
+            return
+        content = self.server.file_content(names[self.path])
+        headers = {'Accept-Ranges': 'bytes'}
+        requested = self.headers.get('Range', '')
+        if requested.startswith('bytes=') and requested.endswith('-') and requested[6:-1].isdigit():
+            start = int(requested[6:-1])
+            if start >= len(content):
+                self.send_body(416, b'', 'application/octet-stream', {'Content-Range': f'bytes */{len(content)}'})
+                return
+            headers['Content-Range'] = f'bytes {start}-{len(content) - 1}/{len(content)}'
+            self.send_body(206, content[start:], 'application/octet-stream', headers, self.server.draw_truncation())
+            return
+        self.send_body(200, content, 'application/octet-stream', headers, self.server.draw_truncation())
+
+# Démarre le simulateur dans un thread et le retourne (port 0 : port
+# libre choisi automatiquement, voir server_address)
+def start_simulator(host='127.0.0.1', port=0, **options):
+    server = EcodeviceSimulator((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulateur local du serveur web de l\'Ecodevice RT2')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='temps de réponse moyen (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='variation du temps de réponse (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='proportion de réponses en erreur HTTP 500')
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help='proportion de téléchargements interrompus')
+    parser.add_argument('--max-connections', type=int, default=0, help='connexions simultanées maximum (0 : sans limite)')
+    parser.add_argument('--max-requests-per-connection', type=int, default=0, help='requêtes par connexion avant fermeture (0 : sans limite)')
+    parser.add_argument('--config', help='fichier servi pour config.gce')
+    parser.add_argument('--system', help='fichier servi pour system.gce')
+    args = parser.parse_args()
+
+    files = {name: path for name, path in (('config', args.config), ('system', args.system)) if path}
+    server = EcodeviceSimulator((args.host, args.port), latency=args.latency, jitter=args.jitter, errorRate=args.error_rate,
+                                truncateRate=args.truncate_rate, maxConnections=args.max_connections, maxRequestsPerConnection=args.max_requests_per_connection, files=files)
+    print(f'Simulateur Ecodevice sur http://{args.host}:{server.server_address[1]} (Ctrl+C pour arrêter)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+""" Commandes non interactives des scripts de l'Ecodevice RT2, pour les
+traitements planifiés (cron) : les fichiers et les dates sont donnés en
+arguments au lieu des constantes des scripts (workingdir,
+existing_filename...), sans question posée. Les modules ne sont importés
+que par la commande qui les utilise, et requests uniquement pour un
+téléchargement : les commandes sur des fichiers déjà téléchargés
+démarrent vite. Le cache des index des positions à côté des fichiers
+(voir globalconfigfile.py) est utilisé s'il existe, mais n'est écrit
+qu'avec l'option --index-cache écriture.
+
+Commandes :
+- download : télécharge la configuration globale (system) ou seule
+  (config) depuis l'Ecodevice
+- export-range : exporte les mesures TIC d'un intervalle de dates dans un
+  fichier csv (et les mesures avec marquage des erreurs)
+- scan-errors : exporte les anomalies de tout l'historique dans un
+  fichier csv (nécessite numpy)
+- apply-corrections : applique un fichier csv de corrections (et la
+  réparation des consommations horaires absentes) et écrit la nouvelle
+  configuration globale
+- export-weather : exporte les données météo X-THL d'un fichier de
+  configuration dans un fichier csv
+
+Utilisation :
+    python edrt2.py download system system.gce --host 192.168.1.19
+    python edrt2.py export-range system.gce 2024-01-04 2024-01-06 mesures.csv --errors erreurs.csv
+    python edrt2.py scan-errors system.gce anomalies.csv
+    python edrt2.py apply-corrections system.gce corrections.csv system_corrigé.gce --report rapport.csv
+    python edrt2.py export-weather config.gce météo.csv
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import argparse
+import datetime
+import sys
+
+# Télécharge un fichier de configuration depuis l'Ecodevice. Retourne le
+# code de sortie
+def command_download(args):
+    if args.kind == 'system':
+        import globalconfigfile as gcf
+        if args.host:
+            gcf.ecodevice = args.host
+        downloaded = gcf.download_globalConf_file(args.output, args.index_cache)
+    else:
+        import weather
+        if args.host:
+            weather.ecodevice = args.host
+        downloaded = weather.downloadConfigfile(args.output, 'config')
+    if not downloaded:
+        return 1
+    print(f'Le fichier a été enregistré et nommé {args.output}')
+    return 0
+
+# Exporte les mesures TIC d'un intervalle de dates. Retourne le code de
+# sortie
+def command_export_range(args):
+    import globalconfigfile as gcf
+    gcf.load_globalConf_file(args.gce, args.index_cache)
+    measures = gcf.iter_TICmeasures(args.start, args.end)
+    if args.errors:
+        gcf.outputTICmeasuresAndErrorsInCsv(measures, args.output, args.errors)
+    else:
+        gcf.outputTICmeasuresInCsv(measures, args.output)
+    print(f'Mesures du {args.start:%Y-%m-%d} au {args.end:%Y-%m-%d} exportées dans le fichier {args.output}')
+    return 0
+
+# Exporte les anomalies de tout l'historique. Retourne le code de sortie
+def command_scan_errors(args):
+    import globalconfigfile as gcf
+    gcf.load_globalConf_file(args.gce, args.index_cache)
+    anomalies = gcf.scan_TIC_anomalies(args.max_hour_cons)
+    gcf.outputTICanomaliesInCsv(anomalies, args.output)
+    print(f'{len(anomalies)} anomalies trouvées dans l\'historique et exportées dans le fichier {args.output}')
+    return 0
+
+# Applique un fichier de corrections et/ou la réparation des
+# consommations horaires absentes, puis écrit la nouvelle configuration
+# globale. Retourne le code de sortie
+def command_apply_corrections(args):
+    import globalconfigfile as gcf
+    gcf.load_globalConf_file(args.gce, args.index_cache)
+    changes = []
+    if args.corrections:
+        changes = gcf.plan_TICcorrections(gcf.read_TICcorrections_csv(args.corrections))
+        gcf.apply_TICcorrections(changes)
+        print(f'{len(changes)} modifications lues dans le fichier de corrections')
+    if args.repair_profile:
+        corrections, report = gcf.plan_TICabsent_repairs(args.repair_profile)
+        repairs = gcf.plan_TICcorrections(corrections)
+        gcf.apply_TICcorrections(repairs)
+        changes = changes + repairs
+        print(f'{len(corrections)} relevés horaires absents réparés')
+        if args.repair_report:
+            gcf.outputTICrepairsInCsv(report, args.repair_report)
+    if args.report:
+        gcf.outputTICcorrectionsInCsv(changes, args.report)
+    if args.dry_run:
+        print('Aucun fichier écrit (--dry-run)')
+        return 0
+    gcf.write_globalConf_file(args.output)
+    print(f'La configuration corrigée a été enregistrée dans le fichier {args.output}')
+    return 0
+
+# Exporte les données météo d'un fichier de configuration. Retourne le
+# code de sortie
+def command_export_weather(args):
+    import weather
+    weather.loadConfigFile(args.gce)
+    rows = weather.getWeatherFromConfigFile()
+    weather.outputWeatherInCsv(rows, args.output)
+    print(f'{len(rows)} heures de données météo exportées dans le fichier {args.output}')
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Commandes non interactives des scripts de l\'Ecodevice RT2')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('download', help='télécharger une configuration depuis l\'Ecodevice')
+    command.add_argument('kind', choices=['system', 'config'], help='configuration globale ou seule')
+    command.add_argument('output', help='fichier .gce à écrire')
+    command.add_argument('--host', help='adresse de l\'Ecodevice (par défaut celle des scripts)')
+    command.set_defaults(function=command_download)
+
+    command = commands.add_parser('export-range', help='exporter les mesures TIC d\'un intervalle de dates')
+    command.add_argument('gce', help='fichier de configuration globale')
+    command.add_argument('start', type=datetime.datetime.fromisoformat, help='date de début (AAAA-MM-JJ)')
+    command.add_argument('end', type=datetime.datetime.fromisoformat, help='date de fin (AAAA-MM-JJ)')
+    command.add_argument('output', help='fichier csv des mesures')
+    command.add_argument('--errors', help='fichier csv des mesures avec marquage des erreurs')
+    command.set_defaults(function=command_export_range)
+
+    command = commands.add_parser('scan-errors', help='rechercher les anomalies de tout l\'historique')
+    command.add_argument('gce', help='fichier de configuration globale')
+    command.add_argument('output', help='fichier csv des anomalies')
+    command.add_argument('--max-hour-cons', type=int, default=36000, help='consommation horaire maximum attendue (Wh)')
+    command.set_defaults(function=command_scan_errors)
+
+    command = commands.add_parser('apply-corrections', help='appliquer des corrections et écrire la nouvelle configuration globale')
+    command.add_argument('gce', help='fichier de configuration globale')
+    command.add_argument('corrections', nargs='?', help='fichier csv des corrections')
+    command.add_argument('output', help='fichier .gce corrigé à écrire')
+    command.add_argument('--report', help='fichier csv du rapport avant / après')
+    command.add_argument('--repair-profile', choices=['plat', 'semaines précédentes'], help='réparer aussi les consommations horaires absentes')
+    command.add_argument('--repair-report', help='fichier csv du rapport des réparations')
+    command.add_argument('--dry-run', action='store_true', help='vérifier et produire les rapports sans écrire la configuration')
+    command.set_defaults(function=command_apply_corrections)
+
+    command = commands.add_parser('export-weather', help='exporter les données météo d\'un fichier de configuration')
+    command.add_argument('gce', help='fichier de configuration seule ou globale')
+    command.add_argument('output', help='fichier csv des données météo')
+    command.set_defaults(function=command_export_weather)
+
+    for name in ('download', 'export-range', 'scan-errors', 'apply-corrections'):
+        commands.choices[name].add_argument('--index-cache', choices=['écriture', 'lecture', 'aucun'], default='lecture', help='usage du cache des index à côté du fichier (lu sans être écrit par défaut)')
+
+    args = parser.parse_args()
+    try:
+        return args.function(args)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
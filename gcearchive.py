@@ -0,0 +1,292 @@
+""" Ce script archive les fichiers de configuration (.gce) téléchargés
+régulièrement depuis un Ecodevice RT2 (configurations globales et
+configurations seules) dans une base SQLite, sans stocker plusieurs fois
+les mêmes données : les fichiers sont découpés en blocs (pages de la
+configuration, jours de l'historique, heures de données météo X-THL)
+identifiés par leur empreinte, et chaque bloc n'est stocké qu'une fois.
+
+L'archive tient à jour, pour chaque jour de l'historique et chaque heure
+de données météo, l'enregistrement de référence : celui qui comporte le
+plus d'heures relevées, puis le plus récent. Les requêtes sur des années
+d'historique se font alors sur l'archive, sans ouvrir chaque sauvegarde.
+Chaque sauvegarde archivée peut aussi être restaurée à l'identique.
+
+Utilisation :
+    python gcearchive.py ingest archive.sqlite system_*.gce config_*.gce
+    python gcearchive.py list archive.sqlite
+    python gcearchive.py history archive.sqlite historique.gce [--start 2024-01-01] [--end 2024-12-31]
+    python gcearchive.py weather archive.sqlite météo.gce
+    python gcearchive.py restore archive.sqlite system_2024-01-27T10-01-34 system.gce
+
+Les fichiers produits par history et weather se lisent avec
+globalconfigfile.py et weather.py comme des sauvegardes téléchargées.
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import argparse
+import datetime
+import os
+import sqlite3
+import zlib
+
+import gcepatch
+import globalconfigfile as gcf
+import weather
+
+# Création des tables de l'archive. Une sauvegarde est identifiée par
+# son contenu (sha256) : plusieurs sauvegardes peuvent avoir le même nom
+# de fichier (system.gce de plusieurs Ecodevice par exemple)
+archiveSchema = '''
+CREATE TABLE IF NOT EXISTS blocks (hash BLOB PRIMARY KEY, data BLOB);
+CREATE TABLE IF NOT EXISTS snapshots (id INTEGER PRIMARY KEY, name TEXT, kind TEXT, size INTEGER, sha256 BLOB UNIQUE, time TEXT, ingested TEXT);
+CREATE TABLE IF NOT EXISTS snapshot_blocks (snapshot INTEGER, position INTEGER, hash BLOB, PRIMARY KEY (snapshot, position));
+CREATE TABLE IF NOT EXISTS days (date TEXT PRIMARY KEY, hash BLOB, hours INTEGER, time TEXT, snapshot INTEGER);
+CREATE TABLE IF NOT EXISTS weather_hours (hour TEXT PRIMARY KEY, hash BLOB, time TEXT, snapshot INTEGER);
+'''
+
+# Ouvre (et crée si besoin) une archive. La table des sauvegardes d'une
+# archive créée avec des noms uniques est recréée sans cette contrainte
+def open_archive(fullfilename):
+    archive = sqlite3.connect(fullfilename)
+    row = archive.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'snapshots'").fetchone()
+    if row is not None and 'name TEXT UNIQUE' in row[0]:
+        archive.executescript('BEGIN; ALTER TABLE snapshots RENAME TO snapshots_v1;' + archiveSchema +
+                              'INSERT INTO snapshots SELECT * FROM snapshots_v1; DROP TABLE snapshots_v1; COMMIT;')
+    archive.executescript(archiveSchema)
+    return archive
+
+# Enregistre un bloc dans l'archive s'il n'y est pas déjà (compressé).
+# Retourne son empreinte
+def store_block(archive, block):
+    blockHash = gcepatch.block_hash(block)
+    if archive.execute('SELECT 1 FROM blocks WHERE hash = ?', (blockHash,)).fetchone() is None:
+        archive.execute('INSERT INTO blocks VALUES (?, ?)', (blockHash, zlib.compress(bytes(block))))
+    return blockHash
+
+# Retourne le contenu d'un bloc de l'archive
+def load_block(archive, blockHash):
+    row = archive.execute('SELECT data FROM blocks WHERE hash = ?', (blockHash,)).fetchone()
+    if row is None:
+        raise Exception(f'Bloc {blockHash.hex()} absent de l\'archive.')
+    return zlib.decompress(row[0])
+
+# Retourne la date d'un enregistrement de jour de l'historique, None si
+# son en-tête n'est pas une date valide
+def day_record_date(record):
+    if record[3] != 0:
+        return None
+    try:
+        return datetime.date(2000 + record[0], record[1], record[2])
+    except ValueError:
+        return None
+
+# Retourne le nombre d'heures relevées (de 01:00 à 23:00) d'un
+# enregistrement de jour
+def day_record_hours(record):
+    hours = 0
+    for position in range(gcf.hour00ByteLength, gcf.dayByteLength, gcf.hourByteLength):
+        if record[position:position+3] == record[0:3] and 1 <= record[position+3] <= 23:
+            hours += 1
+    return hours
+
+# Retourne les enregistrements horaires des données météo d'une
+# configuration (heure, position), jusqu'à la première heure absente ou
+# invalide comme pour weather.py
+def weather_records(globalConf):
+    records = []
+    for position in range(weather.weatherPosition, len(globalConf) - weather.weatherHourLength + 1, weather.weatherHourLength):
+        header = globalConf[position:position+4]
+        try:
+            hour = datetime.datetime(2000 + header[0], header[1], header[2], header[3])
+        except ValueError:
+            break
+        if hour.year <= 2000:
+            break
+        records.append((hour, position))
+    return records
+
+# Retourne la date et heure d'une sauvegarde : celle du nom du fichier
+# téléchargé par les scripts (system_AAAA-MM-JJTHH-MM-SS), sinon la date
+# de modification du fichier
+def snapshot_time(fullfilename):
+    name = os.path.splitext(os.path.basename(fullfilename))[0]
+    try:
+        return datetime.datetime.strptime(name.split('_', 1)[1][:19], '%Y-%m-%dT%H-%M-%S')
+    except (IndexError, ValueError):
+        return datetime.datetime.fromtimestamp(os.path.getmtime(fullfilename)).replace(microsecond=0)
+
+# Archive une sauvegarde (configuration globale ou seule). Une sauvegarde
+# déjà archivée (même contenu) est ignorée. Retourne le nombre de
+# nouveaux blocs stockés, None si la sauvegarde était déjà archivée
+def ingest(archive, fullfilename, name=None, snapshotTime=None):
+    name = name or os.path.splitext(os.path.basename(fullfilename))[0]
+    snapshotTime = (snapshotTime or snapshot_time(fullfilename)).isoformat()
+    globalConf = gcf.GlobalConfig(fullfilename)
+    try:
+        sha256 = gcepatch.globalConf_hash(globalConf)
+        if archive.execute('SELECT 1 FROM snapshots WHERE sha256 = ?', (sha256,)).fetchone() is not None:
+            return None
+        kind = 'globale' if len(globalConf) >= gcf.historyPosition + gcf.dayByteLength else 'seule'
+        blockCount = archive.execute('SELECT COUNT(*) FROM blocks').fetchone()[0]
+        snapshot = archive.execute('INSERT INTO snapshots (name, kind, size, sha256, time, ingested) VALUES (?, ?, ?, ?, ?, ?)',
+                                   (name, kind, len(globalConf), sha256, snapshotTime, datetime.datetime.now().isoformat(timespec='seconds'))).lastrowid
+        for position, length in gcepatch.blocks_of(len(globalConf)):
+            block = globalConf[position:position+length]
+            blockHash = store_block(archive, block)
+            archive.execute('INSERT INTO snapshot_blocks VALUES (?, ?, ?)', (snapshot, position, blockHash))
+            if position < gcf.historyPosition or length != gcf.dayByteLength:
+                continue
+            date = day_record_date(block)
+            if date is None:
+                continue
+            # enregistrement de référence : le plus d'heures relevées,
+            # puis le plus récent
+            archive.execute('INSERT INTO days VALUES (?, ?, ?, ?, ?) ON CONFLICT (date) DO UPDATE SET hash = excluded.hash, hours = excluded.hours, time = excluded.time, snapshot = excluded.snapshot '
+                            'WHERE (excluded.hours, excluded.time) > (days.hours, days.time)',
+                            (date.isoformat(), blockHash, day_record_hours(block), snapshotTime, snapshot))
+        for hour, position in weather_records(globalConf):
+            blockHash = store_block(archive, globalConf[position:position+weather.weatherHourLength])
+            archive.execute('INSERT INTO weather_hours VALUES (?, ?, ?, ?) ON CONFLICT (hour) DO UPDATE SET hash = excluded.hash, time = excluded.time, snapshot = excluded.snapshot '
+                            'WHERE excluded.time >= weather_hours.time',
+                            (hour.isoformat(), blockHash, snapshotTime, snapshot))
+        archive.commit()
+        return archive.execute('SELECT COUNT(*) FROM blocks').fetchone()[0] - blockCount
+    except Exception:
+        archive.rollback()
+        raise
+    finally:
+        globalConf.close()
+
+# Retourne les enregistrements de référence des jours entre deux dates
+# (incluses, tout l'historique par défaut), par date
+def day_records(archive, startDate=None, endDate=None):
+    start = startDate.strftime('%Y-%m-%d') if startDate else ''
+    end = endDate.strftime('%Y-%m-%d') if endDate else '9999'
+    rows = archive.execute('SELECT days.date, blocks.data FROM days JOIN blocks ON blocks.hash = days.hash WHERE days.date >= ? AND days.date <= ? ORDER BY days.date', (start, end))
+    return {datetime.date.fromisoformat(date): zlib.decompress(data) for date, data in rows}
+
+# Retourne les enregistrements de référence des heures de données météo
+# entre deux dates et heures (incluses, toutes par défaut), par heure
+def weather_hour_records(archive, startDateTime=None, endDateTime=None):
+    start = startDateTime.isoformat() if startDateTime else ''
+    end = endDateTime.isoformat() if endDateTime else '9999'
+    rows = archive.execute('SELECT weather_hours.hour, blocks.data FROM weather_hours JOIN blocks ON blocks.hash = weather_hours.hash WHERE weather_hours.hour >= ? AND weather_hours.hour <= ? ORDER BY weather_hours.hour', (start, end))
+    return {datetime.datetime.fromisoformat(hour): zlib.decompress(data) for hour, data in rows}
+
+# Retourne le contenu d'une sauvegarde archivée
+def snapshot_content(archive, snapshot):
+    content = bytearray()
+    for position, blockHash in archive.execute('SELECT position, hash FROM snapshot_blocks WHERE snapshot = ? ORDER BY position', (snapshot,)).fetchall():
+        if position != len(content):
+            raise Exception(f'Sauvegarde {snapshot} incomplète dans l\'archive (position 0x{position:06X}).')
+        content += load_block(archive, blockHash)
+    return content
+
+# Retourne l'identifiant de la sauvegarde la plus récente d'un type donné
+# ('globale' ou 'seule', ou tout type si None)
+def latest_snapshot(archive, kind=None):
+    row = archive.execute('SELECT id FROM snapshots WHERE ? IS NULL OR kind = ? ORDER BY time DESC LIMIT 1', (kind, kind)).fetchone()
+    if row is None:
+        raise Exception('Aucune sauvegarde dans l\'archive.')
+    return row[0]
+
+# Ecrit une configuration globale consolidée : la configuration de la
+# sauvegarde globale la plus récente, suivie de l'historique de
+# référence des jours entre deux dates (tout l'historique par défaut),
+# dans l'ordre chronologique. Retourne le nombre de jours écrits
+def write_history_file(archive, fullfilename, startDate=None, endDate=None):
+    header = snapshot_content(archive, latest_snapshot(archive, 'globale'))[:gcf.historyPosition]
+    records = day_records(archive, startDate, endDate)
+    with open(fullfilename, 'wb') as outfile:
+        outfile.write(header)
+        for record in records.values():
+            outfile.write(record)
+    return len(records)
+
+# Ecrit une configuration consolidée des données météo : la
+# configuration de la sauvegarde la plus récente jusqu'aux données météo,
+# suivie des heures de référence dans l'ordre chronologique et d'un
+# enregistrement vide (fin des mesures). Retourne le nombre d'heures
+# écrites
+def write_weather_file(archive, fullfilename, startDateTime=None, endDateTime=None):
+    header = snapshot_content(archive, latest_snapshot(archive))[:weather.weatherPosition]
+    records = weather_hour_records(archive, startDateTime, endDateTime)
+    with open(fullfilename, 'wb') as outfile:
+        outfile.write(header)
+        for record in records.values():
+            outfile.write(record)
+        outfile.write(b'\xff' * weather.weatherHourLength)
+    return len(records)
+
+# Restaure une sauvegarde archivée (par son nom, la plus récente si
+# plusieurs sauvegardes ont le même nom) dans un fichier
+def restore_snapshot(archive, name, fullfilename):
+    row = archive.execute('SELECT id, sha256 FROM snapshots WHERE name = ? ORDER BY time DESC, id DESC LIMIT 1', (name,)).fetchone()
+    if row is None:
+        raise Exception(f'Sauvegarde {name} absente de l\'archive.')
+    content = snapshot_content(archive, row[0])
+    with open(fullfilename, 'wb') as outfile:
+        outfile.write(content)
+    restored = gcf.GlobalConfig(fullfilename)
+    try:
+        if gcepatch.globalConf_hash(restored) != row[1]:
+            raise Exception(f'La sauvegarde {name} restaurée ne correspond pas à l\'empreinte archivée.')
+    finally:
+        restored.close()
+
+# Affiche le contenu de l'archive
+def print_archive(archive):
+    for name, kind, size, snapshotTime in archive.execute('SELECT name, kind, size, time FROM snapshots ORDER BY time'):
+        print(f'{snapshotTime} {name} (configuration {kind}, {size} octets)')
+    snapshots, total = archive.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM snapshots').fetchone()
+    blocks, stored = archive.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM blocks').fetchone()
+    days, first, last = archive.execute('SELECT COUNT(*), MIN(date), MAX(date) FROM days').fetchone()
+    hours = archive.execute('SELECT COUNT(*) FROM weather_hours').fetchone()[0]
+    print(f'{snapshots} sauvegardes ({total} octets), {blocks} blocs stockés ({stored} octets)')
+    print(f'{days} jours d\'historique du {first} au {last}, {hours} heures de données météo')
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive dédupliquée des sauvegardes de l\'Ecodevice RT2')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('ingest', help='archiver des sauvegardes')
+    command.add_argument('archive')
+    command.add_argument('files', nargs='+')
+    command = commands.add_parser('list', help='afficher le contenu de l\'archive')
+    command.add_argument('archive')
+    command = commands.add_parser('history', help='écrire une configuration globale avec l\'historique de référence')
+    command.add_argument('archive')
+    command.add_argument('output')
+    command.add_argument('--start', type=datetime.date.fromisoformat)
+    command.add_argument('--end', type=datetime.date.fromisoformat)
+    command = commands.add_parser('weather', help='écrire une configuration avec les données météo de référence')
+    command.add_argument('archive')
+    command.add_argument('output')
+    command = commands.add_parser('restore', help='restaurer une sauvegarde archivée')
+    command.add_argument('archive')
+    command.add_argument('name')
+    command.add_argument('output')
+    args = parser.parse_args()
+
+    archive = open_archive(args.archive)
+    if args.command == 'ingest':
+        for fullfilename in args.files:
+            newBlocks = ingest(archive, fullfilename)
+            if newBlocks is None:
+                print(f'{fullfilename} : déjà archivé')
+            else:
+                print(f'{fullfilename} : {newBlocks} nouveaux blocs')
+    elif args.command == 'list':
+        print_archive(archive)
+    elif args.command == 'history':
+        print(f'{write_history_file(archive, args.output, args.start, args.end)} jours écrits dans {args.output}')
+    elif args.command == 'weather':
+        print(f'{write_weather_file(archive, args.output)} heures écrites dans {args.output}')
+    else:
+        restore_snapshot(archive, args.name, args.output)
+        print(f'{args.name} restauré dans {args.output}')
+    archive.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+""" Ce script analyse en parallèle tous les fichiers de configuration
+(.gce) d'un dossier, par exemple des sauvegardes quotidiennes de
+plusieurs Ecodevice RT2 : chaque fichier est traité par un processus du
+groupe de processus, qui projette son propre fichier en mémoire et
+retourne des résultats compacts en colonnes :
+- export de l'intervalle de dates (par défaut tout l'historique) :
+  consommations et prix quotidiens par index TIC (configuration globale)
+- recherche des anomalies de l'historique (configuration globale)
+- données météo X-THL (configuration seule ou globale)
+
+Le cache des index des positions à côté des fichiers (voir
+globalconfigfile.py) est utilisé s'il existe, mais pas écrit par défaut
+pour ne pas ajouter de fichiers dans le dossier analysé (option
+--index-cache écriture pour le créer).
+
+Les résultats de tous les fichiers sont réunis dans des fichiers csv
+(colonne 'Fichier'), avec les durées de traitement de chaque fichier :
+
+    sortie_jours.csv, sortie_anomalies.csv, sortie_météo.csv, sortie_durées.csv
+
+Nécessite numpy.
+
+Utilisation :
+    python gcebatch.py sauvegardes analyse
+    python gcebatch.py sauvegardes analyse --start 2024-01-01 --end 2024-03-31 --workers 4
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import datetime
+import glob
+import os
+import time
+
+import globalconfigfile as gcf
+import weather
+
+# Retourne les résultats de l'export d'un intervalle de dates d'une
+# configuration globale, en colonnes : jours (datetime64), jours
+# complets, consommations et prix quotidiens (jours, index TIC)
+def TIC_day_columns(startDate, endDate, globalConf):
+    np = gcf.np
+    TICrange = gcf.get_TIC_range(startDate, endDate, globalConf)
+    return {'jour': np.array(TICrange['dates'], dtype='datetime64[D]'),
+            'jour complet': np.asarray(TICrange['jour complet']),
+            'conso jour': np.asarray(TICrange['conso jour']),
+            'prix jour': np.asarray(TICrange['prix jour'])}
+
+# Analyse un fichier de configuration (exécuté dans un processus du
+# groupe). Retourne les résultats (None pour ceux qui ne s'appliquent
+# pas au fichier) et les durées de chaque étape. Une erreur est
+# retournée dans les durées sans interrompre les autres fichiers. Le
+# cache des index est seulement lu par défaut (voir open_indexed_globalConf)
+def analyse_file(fullfilename, startDate=None, endDate=None, cache='lecture'):
+    start = time.perf_counter()
+    result = {'fichier': os.path.splitext(os.path.basename(fullfilename))[0], 'jours': None, 'anomalies': None, 'météo': None}
+    timings = {'fichier': result['fichier'], 'type': 'configuration seule', 'erreur': ''}
+    result['durées'] = timings
+    globalConf = None
+    try:
+        if os.path.getsize(fullfilename) >= gcf.historyPosition + gcf.dayByteLength:
+            timings['type'] = 'configuration globale'
+            globalConf = gcf.open_indexed_globalConf(fullfilename, cache)
+            timings['ouverture (s)'] = time.perf_counter() - start
+            step = time.perf_counter()
+            first, last = gcf.history_date_range(globalConf)
+            result['jours'] = TIC_day_columns(startDate or first, endDate or last, globalConf)
+            timings['export (s)'] = time.perf_counter() - step
+            step = time.perf_counter()
+            result['anomalies'] = gcf.scan_TIC_anomalies(globalConf=globalConf)
+            timings['anomalies (s)'] = time.perf_counter() - step
+        else:
+            globalConf = gcf.GlobalConfig(fullfilename)
+            timings['ouverture (s)'] = time.perf_counter() - start
+        step = time.perf_counter()
+        try:
+            weather.validateConfigFile(fullfilename)
+        except Exception:
+            pass # pas de données météo
+        else:
+            result['météo'] = weather.decodeWeatherFromConfigFile(globalConf.data)
+        timings['météo (s)'] = time.perf_counter() - step
+    except Exception as e:
+        timings['erreur'] = str(e)
+    finally:
+        if globalConf is not None:
+            globalConf.close()
+    timings['total (s)'] = time.perf_counter() - start
+    return result
+
+# Retourne le résultat d'un fichier dont l'analyse n'a pas abouti dans
+# son processus (processus arrêté, résultat impossible à transmettre)
+def failed_result(fullfilename, error):
+    name = os.path.splitext(os.path.basename(fullfilename))[0]
+    return {'fichier': name, 'jours': None, 'anomalies': None, 'météo': None,
+            'durées': {'fichier': name, 'type': '', 'erreur': str(error) or type(error).__name__}}
+
+# Analyse tous les fichiers .gce d'un dossier dans un groupe de
+# processus (workers processus, par défaut un par processeur). Un fichier
+# en échec est indiqué avec son erreur sans interrompre les autres.
+# Retourne les résultats de chaque fichier dans l'ordre des noms de
+# fichiers
+def analyse_directory(directory, startDate=None, endDate=None, workers=None, pattern='*.gce', cache='lecture'):
+    gcf.require_numpy()
+    fullfilenames = sorted(glob.glob(os.path.join(directory, pattern)))
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(analyse_file, fullfilename, startDate, endDate, cache): fullfilename for fullfilename in fullfilenames}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = failed_result(futures[future], e)
+            results.append(result)
+            timings = result['durées']
+            print(f'{timings["fichier"]} : ' + (f'{timings["total (s)"]:.2f} s' if 'total (s)' in timings else 'échec') + (f' (erreur : {timings["erreur"]})' if timings['erreur'] else ''))
+    results.sort(key=lambda result: result['fichier'])
+    return results
+
+# Ecrit les résultats réunis de tous les fichiers dans des fichiers csv
+# (nom de sortie suivi de _jours, _anomalies, _météo et _durées, prix en
+# cents). Retourne la liste des fichiers écrits
+def output_results(results, output):
+    np = gcf.np
+    labels = list(gcf.TIC_label_order)
+    written = []
+
+    fullfilename = output + '_jours.csv'
+    with open(fullfilename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';')
+        writer.writerow(['Fichier', 'Jour', 'Jour complet'] + [label + suffix for label in labels for suffix in (' conso jour', ' prix jour')])
+        for result in results:
+            days = result['jours']
+            if days is None:
+                continue
+            values = np.stack([days['conso jour'], days['prix jour']], axis=-1).reshape(len(days['jour']), -1).tolist()
+            for day, complete, row in zip(np.datetime_as_string(days['jour']), days['jour complet'].tolist(), values):
+                writer.writerow([result['fichier'], day, int(complete)] + row)
+    written.append(fullfilename)
+
+    fullfilename = output + '_anomalies.csv'
+    with open(fullfilename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';')
+        writer.writerow(['Fichier', 'Jour', 'Heure', 'Index TIC', 'Anomalie'])
+        for result in results:
+            for date, hour, label, kind in result['anomalies'] or []:
+                writer.writerow([result['fichier'], '' if date is None else f'{date:%Y-%m-%d}', '' if hour is None else f'{hour:02d}:00', label or '', kind])
+    written.append(fullfilename)
+
+    fullfilename = output + '_météo.csv'
+    with open(fullfilename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';')
+        writer.writerow(['Fichier', 'Heure'] + list(weather.weatherField.values()))
+        for result in results:
+            if result['météo'] is not None:
+                for row in weather.weatherRows(result['météo']):
+                    writer.writerow([result['fichier']] + list(row.values()))
+    written.append(fullfilename)
+
+    fullfilename = output + '_durées.csv'
+    fields = ['fichier', 'type', 'ouverture (s)', 'export (s)', 'anomalies (s)', 'météo (s)', 'total (s)', 'erreur']
+    with open(fullfilename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';')
+        writer.writerow([field.capitalize() for field in fields])
+        for result in results:
+            timings = result['durées']
+            writer.writerow([f'{timings[field]:.4f}' if isinstance(timings.get(field), float) else timings.get(field, '') for field in fields])
+    written.append(fullfilename)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyse en parallèle des fichiers de configuration .gce d\'un dossier')
+    parser.add_argument('directory', help='dossier des fichiers .gce')
+    parser.add_argument('output', help='début du nom des fichiers csv produits')
+    parser.add_argument('--start', type=datetime.datetime.fromisoformat, help='date de début de l\'export (AAAA-MM-JJ), début de l\'historique par défaut')
+    parser.add_argument('--end', type=datetime.datetime.fromisoformat, help='date de fin de l\'export (AAAA-MM-JJ), fin de l\'historique par défaut')
+    parser.add_argument('--workers', type=int, help='nombre de processus, un par processeur par défaut')
+    parser.add_argument('--pattern', default='*.gce', help='motif des noms de fichiers')
+    parser.add_argument('--index-cache', choices=['écriture', 'lecture', 'aucun'], default='lecture', help='usage du cache des index à côté des fichiers (lu sans être écrit par défaut)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = analyse_directory(args.directory, args.start, args.end, args.workers, args.pattern, args.index_cache)
+    written = output_results(results, args.output)
+    print(f'{len(results)} fichiers analysés en {time.perf_counter() - start:.2f} s, résultats dans {", ".join(written)}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+""" Téléchargement des fichiers de configuration (.gce) depuis un
+Ecodevice RT2, utilisé par globalconfigfile.py et weather.py : le
+fichier est écrit par morceaux directement sur le disque (sans copie
+complète en mémoire), avec des délais de connexion et de lecture, de
+nouvelles tentatives et la reprise du téléchargement là où il s'est
+arrêté si l'Ecodevice le permet. Le fichier n'est renommé avec son nom
+définitif qu'une fois complet et vérifié.
+
+requests n'est importé qu'au premier téléchargement, pour que les
+scripts qui travaillent sur des fichiers déjà téléchargés démarrent
+vite.
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import os
+import time
+
+import gcestats
+
+# Délais de connexion et de lecture (secondes)
+downloadTimeout = (5, 30)
+
+# Nombre de nouvelles tentatives après un échec, délai avant la première
+# nouvelle tentative (doublé à chaque tentative)
+downloadRetries = 3
+downloadBackoff = 1.0
+
+# Taille des morceaux écrits sur le disque
+downloadChunkLength = 0x10000
+
+# Extension du fichier en cours de téléchargement
+partialSuffix = '.part'
+
+# Retourne la taille totale annoncée par une réponse (None si inconnue)
+def announced_length(response):
+    contentRange = response.headers.get('Content-Range', '')
+    if response.status_code in (206, 416) and '/' in contentRange:
+        total = contentRange.rsplit('/', 1)[1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get('Content-Length', '')
+    return int(length) if length.isdigit() else None
+
+# Télécharge une partie du fichier à la suite de celle déjà reçue dans le
+# fichier partiel, avant l'échéance donnée (time.monotonic()) s'il y en a
+# une. Le fichier partiel est supprimé s'il est plus long que le fichier
+# de l'Ecodevice. Retourne la taille totale attendue (None si inconnue)
+def download_part(url, partfilename, deadline=None):
+    import requests
+    received = os.path.getsize(partfilename) if os.path.exists(partfilename) else 0
+    headers = {'Range': f'bytes={received}-'} if received else {}
+    timeout = downloadTimeout
+    if deadline is not None:
+        timeout = tuple(min(value, max(0.1, deadline - time.monotonic())) for value in downloadTimeout)
+    start = time.perf_counter()
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if gcestats.enabled:
+            gcestats.add_time('http : téléchargement (réponse)', time.perf_counter() - start, histogram=True)
+        if response.status_code == 416: # déjà complet, ou partie d'un autre fichier
+            total = announced_length(response)
+            if total is not None and total != received:
+                os.remove(partfilename)
+            return received if total is None else total
+        response.raise_for_status()
+        if response.status_code != 206:
+            received = 0 # reprise non prise en charge : nouveau départ
+        total = announced_length(response)
+        with open(partfilename, 'r+b' if received else 'wb') as outfile:
+            outfile.seek(received)
+            outfile.truncate()
+            for chunk in response.iter_content(chunk_size=downloadChunkLength):
+                outfile.write(chunk)
+                if gcestats.enabled:
+                    gcestats.count('http : téléchargement octets reçus', len(chunk))
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise requests.Timeout('délai dépassé')
+    return total
+
+# Télécharge un fichier depuis une url dans le fichier dont le nom est
+# donné. La taille reçue est comparée à la taille annoncée, puis le
+# contenu est vérifié par la fonction validate (qui lève une exception
+# si le fichier n'est pas conforme) avant de renommer le fichier. Lève
+# une exception si le téléchargement a échoué malgré les nouvelles
+# tentatives, ou n'est pas terminé à l'échéance donnée (time.monotonic()).
+# Le fichier partiel d'un téléchargement interrompu est conservé pour être
+# repris au lancement suivant
+def download_gce(url, fullfilename, validate=None, deadline=None):
+    import requests
+    partfilename = fullfilename + partialSuffix
+    delay = downloadBackoff
+    error = None
+    for attempt in range(downloadRetries + 1):
+        if deadline is not None and time.monotonic() >= deadline:
+            error = 'délai dépassé'
+            break
+        if attempt > 0 and gcestats.enabled:
+            gcestats.count('http : téléchargement nouvelles tentatives')
+        try:
+            with gcestats.timer('http : téléchargement'):
+                total = download_part(url, partfilename, deadline)
+            received = os.path.getsize(partfilename) if os.path.exists(partfilename) else 0
+            if total is None or received == total:
+                error = None
+                break
+            error = f'{received} octets reçus sur {total}'
+        except requests.HTTPError as e:
+            error = f'erreur HTTP {e.response.status_code}'
+            if e.response.status_code < 500: # erreur définitive
+                if os.path.exists(partfilename):
+                    os.remove(partfilename)
+                break
+        except requests.RequestException as e:
+            error = type(e).__name__
+        if attempt < downloadRetries:
+            time.sleep(delay if deadline is None else max(0, min(delay, deadline - time.monotonic())))
+            delay = delay * 2
+    if error is not None:
+        if gcestats.enabled:
+            gcestats.count('http : téléchargement échecs')
+        raise Exception(f'Le téléchargement de {url} a échoué ({error}).')
+    if validate is not None:
+        try:
+            validate(partfilename)
+        except Exception as e:
+            os.remove(partfilename)
+            raise Exception(f'Le fichier téléchargé depuis {url} n\'est pas conforme ({e}).')
+    os.replace(partfilename, fullfilename)
@@ -0,0 +1,198 @@
+""" Ce script génère des fichiers de configuration synthétiques d'un
+Ecodevice RT2, au format attendu par les scripts :
+- configuration globale (system.gce) avec un historique TIC de n jours
+  (index quotidiens, consommations et prix horaires en Tempo), des jours
+  absents, des coupures de courant (heures absentes) et des valeurs
+  absentes (0xFFFF)
+- configuration seule (config.gce) avec n heures de données météo X-THL
+  et des heures absentes
+
+Ils servent à tester et mesurer les scripts (bench_readers.py,
+ecodevice_simulator.py) sans données personnelles. Le même germe
+produit toujours le même fichier.
+
+Utilisation :
+    python gcegen.py system 365 system_synthétique.gce --cut-rate 0.02 --absent-rate 0.001
+    python gcegen.py config 8760 config_synthétique.gce --gap-rate 0.001
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import argparse
+import datetime
+import random
+
+import globalconfigfile as gcf
+import weather
+
+# Date de début par défaut des historiques générés
+defaultStartDate = datetime.date(2023, 1, 1)
+
+# Nombre de jours par couleur Tempo sur une année (le reste en bleu)
+tempoRedDays = 22
+tempoWhiteDays = 43
+
+# Prix du kWh en cents par index TIC
+TICprices = {'Inactif': 0, 'HCJB': 12.96, 'HPJB': 16.09, 'HCJW': 14.86, 'HPJW': 17.30, 'HCJR': 15.68, 'HPJR': 65.86}
+
+# Retourne l'index TIC actif pour une heure consommée (heure de début) et
+# une couleur de jour ('B', 'W' ou 'R') : heures creuses de 22h à 6h
+def active_label(hour, color):
+    return ('HC' if hour >= 22 or hour < 6 else 'HP') + 'J' + color
+
+# Retourne la consommation synthétique en Wh d'une heure (plus forte le
+# matin et le soir, et les jours rouges et blancs)
+def hour_consumption(rng, hour, color):
+    base = 1200 if 6 <= hour < 9 or 18 <= hour < 22 else 600
+    factor = {'B': 1.0, 'W': 1.3, 'R': 1.6}[color]
+    return int(base * factor * rng.uniform(0.5, 1.5))
+
+#
+# Configuration globale
+#
+
+# Retourne le contenu d'une configuration globale synthétique avec un
+# historique de days jours à partir de startDate :
+# - missingDayRate : proportion de jours sans enregistrement
+# - cutRate : proportion de jours avec une coupure de courant (suite
+#   d'heures sans enregistrement, les heures suivantes du jour sont
+#   décalées comme dans l'Ecodevice)
+# - absentRate : proportion d'heures enregistrées avec des valeurs
+#   absentes (0xFFFF)
+# - capacity : nombre d'emplacements de jours de l'historique (les
+#   emplacements non utilisés sont vides), par défaut ceux utilisés
+# La consommation des heures non enregistrées est comptée dans les
+# index, comme pour le compteur
+def generate_globalConf(days, startDate=defaultStartDate, missingDayRate=0.0, cutRate=0.0, absentRate=0.0, capacity=None, seed=0):
+    rng = random.Random(seed)
+    index = [rng.randint(0, 5_000_000) if label != 'Inactif' else 0 for label in gcf.TIC_label_order]
+    price = [value * int(TICprices[label] * 100) // 100_000 for value, label in zip(index, gcf.TIC_label_order)]
+    records = []
+    for k in range(days):
+        date = startDate + datetime.timedelta(days=k)
+        color = rng.choices('RWB', weights=(tempoRedDays, tempoWhiteDays, 365 - tempoRedDays - tempoWhiteDays))[0]
+        record = bytearray(gcf.dayByteLength)
+        record[0:4] = gcf.dateAsBytes(date)
+        for order in range(gcf.TICCount):
+            position = gcf.TICDayIndexPriceOffset + order * (gcf.TICDayIndexLength + gcf.TICDayPriceLength)
+            record[position:position+gcf.TICDayIndexLength] = index[order].to_bytes(gcf.TICDayIndexLength, byteorder='big')
+            record[position+gcf.TICDayIndexLength:position+gcf.TICDayIndexLength+gcf.TICDayPriceLength] = price[order].to_bytes(gcf.TICDayPriceLength, byteorder='big')
+        cut = range(0)
+        if rng.random() < cutRate:
+            start = rng.randint(1, 23)
+            cut = range(start, min(24, start + rng.randint(1, 6)))
+        slot = 0
+        for hour in range(24): # consommation de hour à hour+1 (relevée à hour+1, ou dans le jour suivant à 00:00)
+            label = active_label(hour, color)
+            order = gcf.TIC_label_order[label]
+            cons = hour_consumption(rng, hour, color)
+            hourPrice = round(cons * TICprices[label] / 1000)
+            index[order] += cons
+            price[order] += hourPrice
+            if hour == 23 or hour + 1 in cut:
+                continue
+            position = gcf.hour00ByteLength + slot * gcf.hourByteLength
+            slot += 1
+            record[position:position+4] = gcf.dateAsBytes(date)[:3] + bytes([hour + 1])
+            absent = rng.random() < absentRate
+            for o in range(gcf.TICCount):
+                values = (gcf.absentValue, gcf.absentValue) if absent else (cons, hourPrice) if o == order else (0, 0)
+                valuePosition = position + gcf.TICHourConsPriceOffset + o * 2 * gcf.TICHourConsOrPriceLength
+                record[valuePosition:valuePosition+gcf.TICHourConsOrPriceLength] = values[0].to_bytes(gcf.TICHourConsOrPriceLength, byteorder='big')
+                record[valuePosition+gcf.TICHourConsOrPriceLength:valuePosition+2*gcf.TICHourConsOrPriceLength] = values[1].to_bytes(gcf.TICHourConsOrPriceLength, byteorder='big')
+        position = gcf.hour00ByteLength + slot * gcf.hourByteLength
+        record[position:] = b'\xff' * (gcf.dayByteLength - position) # emplacements des heures non enregistrées
+        if rng.random() >= missingDayRate:
+            records.append(record)
+    capacity = len(records) if capacity is None else capacity
+    if capacity < len(records):
+        raise Exception(f'Capacité de l\'historique insuffisante ({capacity} jours pour {len(records)} jours générés).')
+    content = bytearray(gcf.historyPosition)
+    for order in range(gcf.TICCount):
+        offset = order * gcf.TICCurrentIndexOrPriceLength
+        content[gcf.TICCurrentIndexPosition+offset:gcf.TICCurrentIndexPosition+offset+gcf.TICCurrentIndexOrPriceLength] = index[order].to_bytes(gcf.TICCurrentIndexOrPriceLength, byteorder='big')
+        content[gcf.TICCurrentPricePosition+offset:gcf.TICCurrentPricePosition+offset+gcf.TICCurrentIndexOrPriceLength] = price[order].to_bytes(gcf.TICCurrentIndexOrPriceLength, byteorder='big')
+    for record in records:
+        content += record
+    content += b'\xff' * ((capacity - len(records)) * gcf.dayByteLength)
+    return content
+
+#
+# Configuration seule (données météo)
+#
+
+# Retourne la valeur brute d'un champ météo (inverse des conversions de
+# weather.py)
+def raw_weather_value(field, value):
+    if field.endswith('Temp'):
+        value = (value + 46.85) * 65535 / 175.72
+    if field.endswith('Hum'):
+        value = (value + 6) * 65535 / 125
+    return max(0, min(0xFFFF, round(value)))
+
+# Retourne le contenu d'une configuration seule synthétique avec hours
+# heures de données météo X-THL à partir de startDate (heures absentes
+# dans la proportion gapRate). Les données sont suivies d'un
+# enregistrement vide qui marque la fin des mesures
+def generate_config(hours, startDate=defaultStartDate, gapRate=0.0, seed=0):
+    rng = random.Random(seed)
+    start = datetime.datetime.combine(startDate, datetime.time())
+    records = bytearray()
+    for k in range(hours):
+        hour = start + datetime.timedelta(hours=k)
+        if rng.random() < gapRate:
+            continue
+        record = bytearray(weather.weatherHourLength)
+        record[0:4] = gcf.dateTimeAsBytes(hour)
+        daily = 1 - abs(hour.hour - 14) / 12
+        for column, field in enumerate(weather.weatherField.values()):
+            if field.endswith('Temp'):
+                value = (5 if field.startswith('X-THL 0') else 19) + 8 * daily + rng.uniform(-1, 1)
+            if field.endswith('Hum'):
+                value = 85 - 30 * daily + rng.uniform(-3, 3)
+            if field.endswith('Lum'):
+                value = max(0, int(30000 * (daily - 0.4) * rng.uniform(0.5, 1.0)))
+            position = weather.dataOffset + column * weather.dataLength
+            record[position:position+weather.dataLength] = raw_weather_value(field, value).to_bytes(weather.dataLength, byteorder='big')
+        records += record
+    records += b'\xff' * weather.weatherHourLength
+    length = weather.weatherPosition + len(records)
+    length += -length % gcf.GlobalConfig.pageLength
+    content = bytearray(weather.weatherPosition) + records
+    content += bytes(length - len(content))
+    return content
+
+# Ecrit un contenu généré dans un fichier
+def write_file(content, fullfilename):
+    with open(fullfilename, 'wb') as outfile:
+        outfile.write(content)
+
+def main():
+    parser = argparse.ArgumentParser(description='Génération de fichiers de configuration synthétiques de l\'Ecodevice RT2')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('system', help='configuration globale avec un historique TIC')
+    command.add_argument('days', type=int, help='nombre de jours de l\'historique')
+    command.add_argument('output')
+    command.add_argument('--missing-day-rate', type=float, default=0.0, help='proportion de jours absents')
+    command.add_argument('--cut-rate', type=float, default=0.0, help='proportion de jours avec une coupure de courant')
+    command.add_argument('--absent-rate', type=float, default=0.0, help='proportion d\'heures avec des valeurs absentes')
+    command.add_argument('--capacity', type=int, help='nombre d\'emplacements de jours de l\'historique')
+    command = commands.add_parser('config', help='configuration seule avec des données météo X-THL')
+    command.add_argument('hours', type=int, help='nombre d\'heures de données météo')
+    command.add_argument('output')
+    command.add_argument('--gap-rate', type=float, default=0.0, help='proportion d\'heures absentes')
+    for command in commands.choices.values():
+        command.add_argument('--start', type=datetime.date.fromisoformat, default=defaultStartDate, help='date de début (AAAA-MM-JJ)')
+        command.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'system':
+        content = generate_globalConf(args.days, args.start, args.missing_day_rate, args.cut_rate, args.absent_rate, args.capacity, args.seed)
+    else:
+        content = generate_config(args.hours, args.start, args.gap_rate, args.seed)
+    write_file(content, args.output)
+    print(f'{args.output} : {len(content)} octets')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+""" Ce script compare deux fichiers de configuration globale (.gce) d'un
+Ecodevice RT2 et produit un fichier de différences compact (patch), avec
+la description des relevés modifiés (index TIC, jour, heure). Le patch
+peut ensuite être appliqué sur un autre fichier, par exemple un fichier
+fraîchement téléchargé avant de le restaurer dans l'Ecodevice.
+
+Utilisation :
+    python gcepatch.py diff ancien.gce nouveau.gce modifications.gcp
+    python gcepatch.py show modifications.gcp
+    python gcepatch.py apply modifications.gcp base.gce résultat.gce [--force]
+
+Se référer au readme.
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import argparse
+import hashlib
+import zlib
+
+import globalconfigfile as gcf
+
+# Format du fichier de différences
+patchMagic = b'GCEPATCH'
+patchVersion = 1
+
+# Ecart maximum (en octets) entre deux modifications d'un même bloc pour
+# les regrouper
+runGap = 8
+
+#
+# Calcul des différences
+#
+
+# Retourne les blocs comparés, (position, longueur) : des pages avant
+# l'historique, puis un bloc par jour de l'historique
+def blocks_of(length):
+    position = 0
+    while position < length:
+        if position < gcf.historyPosition:
+            end = min(gcf.historyPosition, position + gcf.GlobalConfig.pageLength)
+        else:
+            end = position + gcf.dayByteLength
+        end = min(end, length)
+        yield position, end - position
+        position = end
+
+# Retourne l'empreinte d'un bloc
+def block_hash(block):
+    return hashlib.blake2b(block, digest_size=16).digest()
+
+# Retourne l'empreinte sha256 d'une configuration (modifications
+# comprises)
+def globalConf_hash(globalConf):
+    digest = hashlib.sha256()
+    chunk = 0x100000
+    for position in range(0, len(globalConf), chunk):
+        digest.update(globalConf[position:position+chunk])
+    return digest.digest()
+
+# Retourne les zones modifiées (position dans le bloc, longueur) entre
+# deux blocs de même longueur
+def changed_runs(old, new):
+    runs = []
+    start = None
+    last = None
+    for position, (a, b) in enumerate(zip(old, new)):
+        if a == b:
+            continue
+        if start is not None and position - last > runGap:
+            runs.append((start, last + 1 - start))
+            start = None
+        if start is None:
+            start = position
+        last = position
+    if start is not None:
+        runs.append((start, last + 1 - start))
+    return runs
+
+# Retourne la date d'un en-tête de jour ou d'heure sous forme de texte
+def format_header(header):
+    try:
+        return f'{2000 + header[0]:04d}-{header[1]:02d}-{header[2]:02d}'
+    except IndexError:
+        return header.hex()
+
+# Retourne la description du relevé situé à une position donnée de la
+# configuration
+def describe_position(position, globalConf):
+    labels = {order: label for label, order in gcf.TIC_label_order.items()}
+    if position >= gcf.historyPosition:
+        dayPosition = position - (position - gcf.historyPosition) % gcf.dayByteLength
+        local = position - dayPosition
+        date = format_header(globalConf[dayPosition:dayPosition+4])
+        if local < 4:
+            return f'{date} en-tête du jour'
+        if local < gcf.hour00ByteLength:
+            offset = local - gcf.TICDayIndexPriceOffset
+            length = gcf.TICDayIndexLength + gcf.TICDayPriceLength
+            if 0 <= offset < gcf.TICCount * length:
+                field = 'index' if offset % length < gcf.TICDayIndexLength else 'cumul prix'
+                return f'{date} 00:00 {labels.get(offset // length, offset // length)} {field}'
+            return f'{date} 00:00'
+        hourPosition = position - (local - gcf.hour00ByteLength) % gcf.hourByteLength
+        hour = globalConf[hourPosition+3]
+        offset = position - hourPosition - gcf.TICHourConsPriceOffset
+        length = gcf.TICHourConsOrPriceLength * 2
+        if position - hourPosition < 4:
+            return f'{date} en-tête de l\'heure {hour:02d}:00'
+        if 0 <= offset < gcf.TICCount * length:
+            field = 'conso' if offset % length < gcf.TICHourConsOrPriceLength else 'prix'
+            return f'{date} {hour:02d}:00 {labels.get(offset // length, offset // length)} {field}'
+        return f'{date} {hour:02d}:00'
+    for start, field in (gcf.TICCurrentIndexPosition, 'index'), (gcf.TICCurrentPricePosition, 'cumul prix'):
+        order = (position - start) // gcf.TICCurrentIndexOrPriceLength
+        if 0 <= order < gcf.TICCount:
+            return f'courant {labels.get(order, order)} {field}'
+    return f'configuration 0x{position:06X}'
+
+# Retourne les jours de l'historique remplacés par un autre jour entre
+# deux configurations (historique circulaire décalé), sous forme de
+# dictionnaire position -> (date avant, date après). Les emplacements
+# vides remplis par un nouveau jour n'en font pas partie
+def replaced_days(old, new):
+    replaced = {}
+    for position in range(gcf.historyPosition, len(new), gcf.dayByteLength):
+        oldHeader, newHeader = old[position:position+4], new[position:position+4]
+        if oldHeader != newHeader and oldHeader != b'\xff' * 4:
+            replaced[position] = format_header(oldHeader), format_header(newHeader)
+    return replaced
+
+# Retourne le patch des différences entre deux configurations de même
+# taille. Les blocs identiques (même empreinte) sont ignorés, les blocs
+# différents sont décrits par leurs zones modifiées (valeurs avant et
+# après, description du relevé). Les relevés sont décrits avec les dates
+# de la nouvelle configuration : les jours dont la position a changé
+# (historique circulaire décalé entre les deux fichiers) sont indiqués
+# dans la description et retournés dans 'jours remplacés' (non conservé
+# dans le fichier du patch)
+def diff_globalConf(old, new):
+    if len(old) != len(new):
+        raise Exception(f'Les fichiers n\'ont pas la même taille ({len(old)} et {len(new)} octets).')
+    replaced = replaced_days(old, new)
+    blocks = []
+    for position, length in blocks_of(len(new)):
+        oldBlock = old[position:position+length]
+        newBlock = new[position:position+length]
+        oldHash = block_hash(oldBlock)
+        if oldHash == block_hash(newBlock):
+            continue
+        runs = []
+        for offset, runLength in changed_runs(oldBlock, newBlock):
+            description = describe_position(position + offset, new)
+            if position in replaced:
+                description += f' (remplace le {replaced[position][0]})'
+            runs.append({'position': position + offset,
+                         'avant': oldBlock[offset:offset+runLength],
+                         'après': newBlock[offset:offset+runLength],
+                         'description': description})
+        blocks.append({'position': position, 'longueur': length, 'empreinte': oldHash, 'modifications': runs})
+    return {'taille': len(new), 'empreinte avant': globalConf_hash(old), 'empreinte après': globalConf_hash(new), 'blocs': blocks,
+            'jours remplacés': replaced}
+
+#
+# Lecture et écriture du patch
+#
+
+# Ecrit un patch dans un fichier (binaire, compressé)
+def write_patch(patch, fullfilename):
+    body = bytearray()
+    body += patch['taille'].to_bytes(4, byteorder='big')
+    body += patch['empreinte avant'] + patch['empreinte après']
+    body += len(patch['blocs']).to_bytes(4, byteorder='big')
+    for block in patch['blocs']:
+        body += block['position'].to_bytes(4, byteorder='big')
+        body += block['longueur'].to_bytes(4, byteorder='big')
+        body += block['empreinte']
+        body += len(block['modifications']).to_bytes(2, byteorder='big')
+        for run in block['modifications']:
+            description = run['description'].encode('utf-8')
+            body += run['position'].to_bytes(4, byteorder='big')
+            body += len(run['après']).to_bytes(4, byteorder='big')
+            body += run['avant'] + run['après']
+            body += len(description).to_bytes(2, byteorder='big') + description
+    with open(fullfilename, 'wb') as outfile:
+        outfile.write(patchMagic + bytes([patchVersion]))
+        outfile.write(zlib.compress(bytes(body), 9))
+
+# Lit un patch depuis un fichier. Le contenu est vérifié (longueurs,
+# positions des blocs et des zones dans le fichier) : un fichier tronqué
+# ou non conforme n'est pas un patch
+def read_patch(fullfilename):
+    with open(fullfilename, 'rb') as infile:
+        content = infile.read()
+    error = f'{fullfilename} n\'est pas un patch de configuration globale (version {patchVersion}).'
+    if len(content) <= len(patchMagic) or content[:len(patchMagic)] != patchMagic or content[len(patchMagic)] != patchVersion:
+        raise Exception(error)
+    try:
+        body = zlib.decompress(content[len(patchMagic)+1:])
+    except zlib.error:
+        raise Exception(error)
+    position = 0
+
+    def take(length):
+        nonlocal position
+        if position + length > len(body):
+            raise Exception(error)
+        position += length
+        return body[position-length:position]
+
+    def take_int(length):
+        return int.from_bytes(take(length), byteorder='big')
+
+    patch = {'taille': take_int(4), 'empreinte avant': take(32), 'empreinte après': take(32), 'blocs': []}
+    for _ in range(take_int(4)):
+        block = {'position': take_int(4), 'longueur': take_int(4), 'empreinte': take(16), 'modifications': []}
+        if block['position'] + block['longueur'] > patch['taille']:
+            raise Exception(error)
+        for _ in range(take_int(2)):
+            runPosition = take_int(4)
+            length = take_int(4)
+            if not block['position'] <= runPosition <= runPosition + length <= block['position'] + block['longueur']:
+                raise Exception(error)
+            run = {'position': runPosition, 'avant': take(length), 'après': take(length)}
+            try:
+                run['description'] = take(take_int(2)).decode('utf-8')
+            except UnicodeDecodeError:
+                raise Exception(error)
+            block['modifications'].append(run)
+        patch['blocs'].append(block)
+    if position != len(body):
+        raise Exception(error)
+    return patch
+
+#
+# Application du patch
+#
+
+# Applique un patch sur une configuration (en mémoire). Chaque zone
+# modifiée est vérifiée : le bloc doit être identique au bloc d'origine,
+# ou à défaut les octets de la zone doivent être ceux d'origine (un
+# fichier téléchargé plus récent diffère par les nouveaux relevés). Les
+# zones en conflit sont toutes signalées et rien n'est appliqué, sauf si
+# force est demandé. Retourne la liste des zones en conflit
+def apply_patch(patch, globalConf, force=False):
+    if len(globalConf) != patch['taille']:
+        raise Exception(f'Taille de fichier différente de celle du patch ({len(globalConf)} et {patch["taille"]} octets).')
+    conflicts = []
+    for block in patch['blocs']:
+        position = block['position']
+        if block_hash(globalConf[position:position+block['longueur']]) == block['empreinte']:
+            continue
+        for run in block['modifications']:
+            current = globalConf[run['position']:run['position']+len(run['avant'])]
+            if current != run['avant'] and current != run['après']:
+                conflicts.append(run)
+    if conflicts and not force:
+        raise Exception('Le patch ne peut pas être appliqué, relevés modifiés depuis :\n' + '\n'.join(run['description'] for run in conflicts))
+    for block in patch['blocs']:
+        for run in block['modifications']:
+            globalConf[run['position']:run['position']+len(run['après'])] = run['après']
+    return conflicts
+
+# Affiche le contenu d'un patch
+def print_patch(patch):
+    runs = [run for block in patch['blocs'] for run in block['modifications']]
+    print(f'{len(patch["blocs"])} blocs modifiés, {len(runs)} zones modifiées')
+    for run in runs:
+        print(f'0x{run["position"]:06X} ({len(run["après"])} octets) : {run["description"]}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Différences entre fichiers de configuration globale de l\'Ecodevice RT2')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('diff', help='produire le patch des différences entre deux fichiers',
+                                  description='Les blocs sont comparés à la même position dans les deux fichiers : si l\'historique circulaire '
+                                  'a été décalé entre les deux sauvegardes, les jours remplacés sont signalés et les relevés décrits avec '
+                                  'les dates du nouveau fichier.')
+    command.add_argument('old')
+    command.add_argument('new')
+    command.add_argument('patch')
+    command = commands.add_parser('show', help='afficher le contenu d\'un patch')
+    command.add_argument('patch')
+    command = commands.add_parser('apply', help='appliquer un patch sur un fichier et écrire le résultat')
+    command.add_argument('patch')
+    command.add_argument('base')
+    command.add_argument('output')
+    command.add_argument('--force', action='store_true', help='appliquer malgré les conflits')
+    args = parser.parse_args()
+
+    if args.command == 'diff':
+        oldConf = gcf.GlobalConfig(args.old)
+        try:
+            newConf = gcf.GlobalConfig(args.new)
+            try:
+                patch = diff_globalConf(oldConf, newConf)
+            finally:
+                newConf.close()
+        finally:
+            oldConf.close()
+        write_patch(patch, args.patch)
+        print_patch(patch)
+        replaced = list(patch['jours remplacés'].values())
+        if replaced:
+            examples = ', '.join(f'{before} par {after}' for before, after in replaced[:3])
+            print(f'Attention : {len(replaced)} jours de l\'historique remplacés par d\'autres jours entre les deux fichiers (historique décalé : {examples}...).')
+            print('Les relevés sont décrits avec les dates du nouveau fichier, le patch ne s\'applique qu\'à un fichier dont les jours sont aux mêmes positions.')
+    elif args.command == 'show':
+        print_patch(read_patch(args.patch))
+    else:
+        patch = read_patch(args.patch)
+        globalConf = gcf.GlobalConfig(args.base)
+        try:
+            conflicts = apply_patch(patch, globalConf, args.force)
+            globalConf.write(args.output)
+        finally:
+            globalConf.close()
+        outputConf = gcf.GlobalConfig(args.output)
+        try:
+            outputHash = globalConf_hash(outputConf)
+        finally:
+            outputConf.close()
+        if outputHash == patch['empreinte après']:
+            print(f'Patch appliqué, {args.output} est identique au fichier d\'origine du patch.')
+        else:
+            print(f'Patch appliqué ({len(conflicts)} conflits forcés), {args.output} contient aussi les relevés propres à {args.base}.')
+
+if __name__ == '__main__':
+    main()
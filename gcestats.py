@@ -0,0 +1,138 @@
+""" Compteurs et mesures de durées des lectures et des téléchargements
+des scripts de l'Ecodevice RT2 (recherches de positions, décodage des
+relevés, requêtes HTTP, écriture des fichiers csv), pour savoir où
+passe le temps avant d'optimiser.
+
+Les mesures sont désactivées par défaut (un simple test d'un booléen
+dans les fonctions mesurées). Elles sont activées par enable(), ou en
+donnant un nom de fichier dans la variable d'environnement GCESTATS :
+le résumé json est alors écrit dans ce fichier à la fin de l'exécution
+du script.
+
+Utilisation :
+    GCESTATS=mesures.json python columnarexport.py tic system.gce export
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import atexit
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+# Mesures activées (à tester avant chaque mesure dans les fonctions
+# appelées très souvent)
+enabled = False
+
+# Limites des classes des histogrammes de durées (millisecondes), la
+# dernière classe compte les durées supérieures
+histogramBounds = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+counters = {} # nom -> valeur
+timers = {} # nom -> [nombre, durée totale, durée maximum] (secondes)
+histograms = {} # nom -> nombre de durées par classe
+lock = threading.Lock() # mesures depuis plusieurs threads (requêtes météo)
+
+# Active les mesures
+def enable():
+    global enabled
+    enabled = True
+
+# Désactive les mesures (les valeurs sont conservées)
+def disable():
+    global enabled
+    enabled = False
+
+# Remet toutes les mesures à zéro
+def reset():
+    with lock:
+        counters.clear()
+        timers.clear()
+        histograms.clear()
+
+# Ajoute une valeur à un compteur
+def count(name, value=1):
+    with lock:
+        counters[name] = counters.get(name, 0) + value
+
+# Ajoute une durée (secondes) à une mesure de durée, et à son
+# histogramme si demandé
+def add_time(name, duration, histogram=False):
+    with lock:
+        timer = timers.setdefault(name, [0, 0.0, 0.0])
+        timer[0] += 1
+        timer[1] += duration
+        timer[2] = max(timer[2], duration)
+        if histogram:
+            buckets = histograms.setdefault(name, [0] * (len(histogramBounds) + 1))
+            milliseconds = duration * 1000
+            buckets[next((k for k, bound in enumerate(histogramBounds) if milliseconds <= bound), len(histogramBounds))] += 1
+
+# Mesure la durée d'un bloc (with gcestats.timer('nom'): ...)
+@contextlib.contextmanager
+def timer(name, histogram=False):
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - start, histogram)
+
+# Retourne une fonction dont chaque appel est mesuré (décorateur), pour
+# les fonctions appelées peu souvent (écriture d'un fichier csv)
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+# Retourne le résumé de toutes les mesures (durées en secondes)
+def summary():
+    with lock:
+        return {'compteurs': dict(sorted(counters.items())),
+                'durées': {name: {'nombre': number, 'total': round(total, 6), 'moyenne': round(total / number, 6), 'maximum': round(maximum, 6)}
+                           for name, (number, total, maximum) in sorted(timers.items())},
+                'histogrammes (ms)': {name: dict(zip([f'<= {bound}' for bound in histogramBounds] + [f'> {histogramBounds[-1]}'], buckets))
+                                      for name, buckets in sorted(histograms.items())}}
+
+# Ecrit le résumé des mesures dans un fichier json
+def write_summary(fullfilename):
+    with open(fullfilename, 'w', encoding='utf-8') as outfile:
+        json.dump(summary(), outfile, ensure_ascii=False, indent=2)
+
+# Affiche le résumé des mesures
+def print_summary():
+    result = summary()
+    for name, value in result['compteurs'].items():
+        print(f'{name} : {value}')
+    for name, timer in result['durées'].items():
+        print(f'{name} : {timer["nombre"]} fois, {timer["total"]:.3f} s (moyenne {timer["moyenne"] * 1000:.3f} ms, maximum {timer["maximum"] * 1000:.3f} ms)')
+
+# Ecrit le résumé des mesures à la fin de l'exécution, uniquement depuis
+# le processus principal (pas depuis les processus d'un groupe de
+# processus, qui ont leurs propres mesures)
+def write_summary_at_exit(fullfilename):
+    if multiprocessing.parent_process() is None:
+        write_summary(fullfilename)
+
+# Activation par la variable d'environnement GCESTATS (nom du fichier du
+# résumé écrit à la fin de l'exécution)
+statsFilename = os.environ.get('GCESTATS')
+if statsFilename:
+    enable()
+    atexit.register(write_summary_at_exit, statsFilename)
@@ -10,8 +10,20 @@ Publié sur https://github.com/nobleval
 
 import time
 import datetime
-import requests
+import os
+import mmap
 import csv
+import decimal
+import hashlib
+import json
+
+import gcedownload
+import gcestats
+
+try:
+    import numpy as np # optionnel, uniquement pour les lectures par tableaux
+except ImportError:
+    np = None
 
 #
 # DONNEES PERSONNELLES A MODIFIER
@@ -28,6 +40,22 @@ workingdir= 'D:/My Documents/~Perso/2023/gce config'
 # travailler (si il existe), sans extension .gce
 existing_filename = 'system_2024-01-27T10-01-34'
 
+# Nom du fichier csv des corrections à appliquer (dans le répertoire de
+# travail, avec l'extension .csv), vide si les corrections sont codées
+# dans le script
+corrections_filename = ''
+
+# Profil de réparation des consommations horaires absentes de tout
+# l'historique ('plat' ou 'semaines précédentes', voir
+# plan_TICabsent_repairs), vide pour ne pas réparer
+repair_profile = ''
+
+# Cache des index des positions à côté des fichiers chargés
+# (fichier.gce.index.json, voir load_index_cache) : 'écriture' pour
+# l'utiliser et le créer ou le mettre à jour, 'lecture' pour l'utiliser
+# seulement s'il existe déjà, 'aucun' pour l'ignorer
+indexCache = 'écriture'
+
 # Noms des index TIC associés à leur numéro d'ordre dans l'Ecodevice
 TIC_label_order={'Inactif':0, 'HCJB':1, 'HPJB':2, 'HCJW':3, 'HPJW':4, 'HCJR':5, 'HPJR':6}
 
@@ -42,6 +70,7 @@ TICCurrentIndexPosition = 0x101F23
 TICCurrentPricePosition = 0x101EA3
 historyPosition = 0x108000
 logPosition = 0x1026C0
+weatherPosition = 0x060000 # données météo X-THL (voir weather.py)
 
 # Offset (nombre d'octets)
 TICHourConsPriceOffset = (8 * 16) + 4 # depuis une position d'une heure
@@ -55,6 +84,10 @@ TICDayPriceLength = 4
 hour00ByteLength = 26 * 16 
 hourByteLength = 10 * 16
 dayByteLength = hour00ByteLength + (23 * hourByteLength)
+weatherHourLength = 4 * 16
+
+# Nombre d'index TIC enregistrés
+TICCount = 7
 
 # Valeur spéciale en l'absence de mesure (coupure de courant par exemple)
 absentValue = 0xFFFF # 65535
@@ -67,32 +100,338 @@ def dateAsBytes(datetime):
 def dateTimeAsBytes(datetime):
     return bytes.fromhex(f'{datetime.year-2000:02x}' + f'{datetime.month:02x}' + f'{datetime.day:02x}' + f'{datetime.hour:02x}')
 
+# Indique si une zone modifiée à une position donnée recouvre un
+# en-tête de jour de l'historique
+def touches_day_header(position, length):
+    offset = position - historyPosition
+    if offset + length <= 0:
+        return False
+    k = max(0, (offset - 4) // dayByteLength + 1) # premier en-tête qui se termine après la position
+    return historyPosition + k * dayByteLength < position + length
+
+# Retourne les positions des jours dont un en-tête d'heure est recouvert
+# par une zone modifiée à une position donnée
+def days_with_touched_hour_header(position, length):
+    days = []
+    first = max(0, (position - historyPosition) // dayByteLength)
+    last = (position + length - 1 - historyPosition) // dayByteLength
+    for k in range(first, last + 1):
+        dayPosition = historyPosition + k * dayByteLength
+        start = position - dayPosition - hour00ByteLength
+        end = position + length - dayPosition - hour00ByteLength
+        for hourStart in range(0, 23 * hourByteLength, hourByteLength):
+            if hourStart < end and hourStart + 4 > start:
+                days.append(dayPosition)
+                break
+    return days
+
+# Configuration globale chargée depuis un fichier projeté en mémoire
+# (mmap) en lecture seule. Les modifications sont conservées dans des
+# copies des pages modifiées (copie sur écriture), le fichier n'est
+# jamais modifié. L'objet se lit et se modifie par tranches comme un
+# bytearray (sans changement de taille), et porte les index des
+# positions des jours et des heures de l'historique. Plusieurs
+# configurations peuvent être ouvertes en même temps
+class GlobalConfig:
+    pageLength = 0x1000 # taille d'une page copiée lors d'une modification
+
+    def __init__(self, fullfilename):
+        self.fullfilename = fullfilename
+        self.file = open(fullfilename, "rb")
+        stat = os.fstat(self.file.fileno())
+        size = stat.st_size
+        self.mtime = stat.st_mtime_ns # pour le cache des index (voir load_index_cache)
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.pages = {} # numéro de page -> copie modifiée de la page
+        # Index des positions des jours dans l'historique (date en
+        # octets -> position), construit une seule fois à la première
+        # recherche et invalidé lorsqu'une modification touche un
+        # en-tête de jour
+        self.dayIndex = None
+        # Tables des positions des heures de chaque jour (position du
+        # jour -> positions des heures 0 à 23), construites à la
+        # première lecture d'une heure du jour et invalidées lorsqu'une
+        # modification touche un en-tête
+        self.hourIndex = {}
+        # Résumé du fichier (dernier jour valide de l'historique, nombre
+        # d'heures de données météo), calculé par build_indexes
+        self.summary = None
+        # Objets prévenus de chaque modification (méthode touched, voir
+        # TICAggregates)
+        self.observers = []
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            key = key + len(self) if key < 0 else key
+            return self[key:key+1][0]
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise Exception('Lecture par tranche avec un pas non pris en charge.')
+        if not self.pages or stop <= start:
+            return self.data[start:stop]
+        firstPage, lastPage = start // self.pageLength, (stop - 1) // self.pageLength
+        if firstPage == lastPage and firstPage not in self.pages:
+            return self.data[start:stop]
+        chunks = []
+        for page in range(firstPage, lastPage + 1):
+            pageStart = page * self.pageLength
+            begin, end = max(start, pageStart) - pageStart, min(stop, pageStart + self.pageLength) - pageStart
+            if page in self.pages:
+                chunks.append(bytes(self.pages[page][begin:end]))
+            else:
+                chunks.append(self.data[pageStart+begin:pageStart+end])
+        return b''.join(chunks)
+
+    def __setitem__(self, key, value):
+        start, stop, step = key.indices(len(self))
+        if step != 1 or stop - start != len(value):
+            raise Exception('La modification ne doit pas changer la taille de la configuration.')
+        position = start
+        while position < stop:
+            page = position // self.pageLength
+            pageStart = page * self.pageLength
+            if page not in self.pages:
+                self.pages[page] = bytearray(self.data[pageStart:pageStart+self.pageLength])
+            end = min(stop, pageStart + self.pageLength)
+            self.pages[page][position-pageStart:end-pageStart] = value[position-start:end-start]
+            position = end
+        # maintien des index des positions
+        if touches_day_header(start, len(value)):
+            self.dayIndex = None # reconstruit à la prochaine recherche
+            self.hourIndex.clear()
+        else:
+            for dayPosition in days_with_touched_hour_header(start, len(value)):
+                self.hourIndex.pop(dayPosition, None)
+        for observer in self.observers:
+            observer.touched(start, len(value))
+
+    # Ecrit le contenu original et les modifications dans un nouveau
+    # fichier, par morceaux sans copie complète en mémoire
+    def write(self, fullfilename):
+        with open(fullfilename, "wb") as outfile, memoryview(self.data) as data:
+            position = 0
+            for page in sorted(self.pages):
+                outfile.write(data[position:page*self.pageLength])
+                outfile.write(self.pages[page])
+                position = (page + 1) * self.pageLength
+            outfile.write(data[position:])
+
+    # Libère la projection en mémoire et le fichier. Les tableaux numpy
+    # sans copie sur la projection (history_view, décodage de la météo
+    # et les vues qui en dérivent) l'empêchent d'être fermée tant qu'ils
+    # existent (BufferError) : elle est alors libérée avec le dernier de
+    # ces tableaux, et le fichier reste verrouillé sous Windows jusque là.
+    # Il faut donc copier (copy()) ce qui doit survivre à la fermeture
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            try:
+                self.data.close()
+            except BufferError:
+                pass # libérée par Python avec le dernier tableau qui l'utilise
+        self.file.close()
+
+    # Construit l'index des positions des jours en un seul parcours de
+    # l'historique (seule la première occurrence d'une date est retenue,
+    # comme lors d'une recherche séquentielle)
+    def build_dayIndex(self):
+        self.dayIndex = {}
+        for position in range(historyPosition, len(self), dayByteLength):
+            bDate = self[position:position+4]
+            if bDate not in self.dayIndex:
+                self.dayIndex[bDate] = position
+        if gcestats.enabled:
+            gcestats.count('positions : en-têtes de jour lus', max(0, (len(self) - historyPosition + dayByteLength - 1) // dayByteLength))
+
+    # Retourne la position d'une date dans l'historique
+    def datePosition(self, datetime):
+        if gcestats.enabled:
+            gcestats.count('positions : recherches de jour')
+        if self.dayIndex is None:
+            self.build_dayIndex()
+        return self.dayIndex.get(dateAsBytes(datetime), -1)
+
+    # Construit la table des positions des heures d'un jour en un seul
+    # parcours des en-têtes des enregistrements horaires du jour (jusqu'à
+    # l'en-tête du jour suivant inclus, comme une recherche séquentielle).
+    # Seule la première occurrence d'une heure est retenue, la structure
+    # pouvant être irrégulière (heures absentes suite à une coupure de
+    # courant par exemple)
+    def build_hourTable(self, dayPosition, bDate):
+        if gcestats.enabled:
+            gcestats.count('positions : tables des heures')
+            gcestats.count('positions : en-têtes d\'heure parcourus', 24)
+        table = [-1] * 24
+        for position in range(dayPosition + hour00ByteLength, dayPosition + dayByteLength + 1, hourByteLength):
+            header = self[position:position+4]
+            if len(header) == 4 and header[:3] == bDate[:3] and header[3] < 24 and table[header[3]] == -1:
+                table[header[3]] = position
+        return table
+
+    # Construit tous les index des positions (jours et heures de tous
+    # les jours) et le résumé du fichier
+    def build_indexes(self):
+        self.build_dayIndex()
+        self.hourIndex = {position: self.build_hourTable(position, bDate) for bDate, position in self.dayIndex.items()}
+        lastDate = None
+        for bDate in self.dayIndex:
+            try:
+                date = datetime.date(2000 + bDate[0], bDate[1], bDate[2])
+            except ValueError:
+                continue
+            if bDate[3] == 0 and (lastDate is None or date > lastDate):
+                lastDate = date
+        weatherHours = 0
+        for position in range(weatherPosition, len(self) - weatherHourLength + 1, weatherHourLength):
+            header = self[position:position+4]
+            try:
+                hour = datetime.datetime(2000 + header[0], header[1], header[2], header[3])
+            except ValueError:
+                break
+            if hour.year <= 2000:
+                break
+            weatherHours += 1
+        self.summary = {'dernier jour': None if lastDate is None else lastDate.isoformat(), 'heures météo': weatherHours}
+
+    # Retourne la position d'une date et heure dans l'historique
+    def dateTimePosition(self, datetime):
+        if gcestats.enabled:
+            gcestats.count('positions : recherches d\'heure')
+        dayPosition=self.datePosition(datetime)
+        if dayPosition == -1:
+            return -1
+        table = self.hourIndex.get(dayPosition)
+        if table is None:
+            table = self.hourIndex[dayPosition] = self.build_hourTable(dayPosition, dateAsBytes(datetime))
+        return table[datetime.hour]
+
+    # Retourne une vue numpy sur les enregistrements de jour de
+    # l'historique, une ligne par jour dans l'ordre du fichier. La vue
+    # est sans copie tant qu'aucune modification ne touche l'historique,
+    # sinon les jours modifiés sont recopiés dans une copie de la vue. La
+    # vue sans copie retarde la libération de la projection (voir close)
+    def history_view(self):
+        dtype = history_dtype()
+        count = max(0, (len(self) - historyPosition) // dayByteLength)
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        view = np.frombuffer(self.data, dtype=dtype, count=count, offset=historyPosition)
+        rows = set()
+        for page in self.pages:
+            first = max(0, (page * self.pageLength - historyPosition) // dayByteLength)
+            last = min(count - 1, ((page + 1) * self.pageLength - 1 - historyPosition) // dayByteLength)
+            rows.update(range(first, last + 1))
+        if rows:
+            view = view.copy()
+            for row in rows:
+                position = historyPosition + row * dayByteLength
+                view[row] = np.frombuffer(self[position:position+dayByteLength], dtype=dtype)[0]
+        return view
+
+#
+# Cache des index des positions dans un fichier à côté du fichier .gce
+# (fichier.gce.index.json), pour ne pas les reconstruire à chaque
+# chargement du même fichier. Le cache est associé à la taille, la date
+# de modification et l'empreinte du fichier : il est ignoré et
+# reconstruit si le fichier a changé
+#
+
+indexCacheSuffix = '.index.json'
+indexCacheVersion = 2 # tables des heures : première occurrence de chaque heure
+
+# Retourne l'empreinte du fichier d'une configuration (sans ses
+# modifications en mémoire)
+def file_hash(globalConf):
+    return hashlib.blake2b(globalConf.data, digest_size=16).hexdigest()
+
+# Charge les index des positions et le résumé d'une configuration depuis
+# son cache si il correspond au fichier (sa date de modification y est
+# mise à jour si write). Retourne False si le cache est absent ou périmé
+def load_index_cache(globalConf, write=True):
+    try:
+        with open(globalConf.fullfilename + indexCacheSuffix, encoding='utf-8') as infile:
+            cache = json.load(infile)
+    except (OSError, ValueError):
+        return False
+    if cache.get('version') != indexCacheVersion or cache.get('taille') != len(globalConf):
+        return False
+    if cache.get('date de modification') != globalConf.mtime:
+        # fichier recopié ou modifié : le contenu est vérifié
+        if cache.get('empreinte') != file_hash(globalConf):
+            return False
+        if write:
+            cache['date de modification'] = globalConf.mtime
+            write_index_cache(globalConf, cache)
+    globalConf.dayIndex = {bytes.fromhex(bDate): position for bDate, position in cache['jours'].items()}
+    globalConf.hourIndex = {int(position): table for position, table in cache['heures'].items()}
+    globalConf.summary = cache['résumé']
+    return True
+
+# Ecrit le cache des index d'une configuration (ignoré si le répertoire
+# n'est pas accessible en écriture)
+def write_index_cache(globalConf, cache):
+    fullfilename = globalConf.fullfilename + indexCacheSuffix
+    try:
+        with open(fullfilename + '.tmp', 'w', encoding='utf-8') as outfile:
+            json.dump(cache, outfile)
+        os.replace(fullfilename + '.tmp', fullfilename)
+    except OSError:
+        pass
+
+# Enregistre les index des positions et le résumé d'une configuration
+# (sans modification en mémoire) dans son cache
+def save_index_cache(globalConf):
+    if globalConf.pages:
+        raise Exception('Le cache des index ne peut être enregistré que pour un fichier non modifié.')
+    if globalConf.dayIndex is None or globalConf.summary is None:
+        globalConf.build_indexes()
+    cache = {'version': indexCacheVersion,
+             'taille': len(globalConf),
+             'date de modification': globalConf.mtime,
+             'empreinte': file_hash(globalConf),
+             'jours': {bDate.hex(): position for bDate, position in globalConf.dayIndex.items()},
+             'heures': {str(position): table for position, table in globalConf.hourIndex.items()},
+             'résumé': globalConf.summary}
+    write_index_cache(globalConf, cache)
+
+# Retourne la configuration globale d'un fichier avec ses index des
+# positions, chargés depuis le cache ou construits puis enregistrés dans
+# le cache, selon l'usage du cache donné ('écriture', 'lecture' ou
+# 'aucun', par défaut le réglage indexCache)
+def open_indexed_globalConf(fullfilename, cache=None):
+    cache = indexCache if cache is None else cache
+    if cache not in ('écriture', 'lecture', 'aucun'):
+        raise Exception(f'Usage du cache des index inconnu : {cache}')
+    globalConf = GlobalConfig(fullfilename)
+    cached = False
+    if cache != 'aucun':
+        with gcestats.timer('positions : cache des index'):
+            cached = load_index_cache(globalConf, cache == 'écriture')
+    if not cached:
+        with gcestats.timer('positions : construction des index'):
+            globalConf.build_indexes()
+        if cache == 'écriture':
+            save_index_cache(globalConf)
+    return globalConf
+
+# Configuration globale chargée en mémoire par le script (GlobalConfig),
+# None tant qu'aucun fichier n'est chargé
+arrGlobalConf = None
+
+# Retourne la configuration globale donnée, ou à défaut celle chargée en
+# mémoire par le script
+def current_globalConf(globalConf=None):
+    return arrGlobalConf if globalConf is None else globalConf
+
 # Retourne la position dans le fichier d'une date dans l'historique    
 def datePosition(datetime):
-    position=historyPosition
-    bDatetime=dateAsBytes(datetime)
-    found=arrGlobalConf[position:position+len(bDatetime)] == bDatetime
-    while not found and position < len(arrGlobalConf):
-        position=position+dayByteLength
-        found=arrGlobalConf[position:position+len(bDatetime)] == bDatetime
-    if found:
-        return position
-    else:
-        return -1
+    return arrGlobalConf.datePosition(datetime)
 
 # Retourne la position dans le fichier d'une date et heure dans l'historique
 def dateTimePosition(datetime):
-    dayPosition=datePosition(datetime)
-    bDatetime=dateTimeAsBytes(datetime)
-    position=dayPosition + hour00ByteLength
-    found=arrGlobalConf[position:position+len(bDatetime)] == bDatetime
-    while not found and position < dayPosition + dayByteLength:
-        position=position+hourByteLength
-        found=arrGlobalConf[position:position+len(bDatetime)] == bDatetime
-    if found:
-        return position
-    else:
-        return -1
+    return arrGlobalConf.dateTimePosition(datetime)
 
 # Retourne les positions dans le fichier de l'index TIC courant et du prix cumulé, pour un index TIC donné
 def positionsOfCurrentTIC(label):
@@ -113,7 +452,6 @@ def positionsOfHourTIC(label, datetime):
 
 # Modifie une valeur en octets à une position donnée
 def set_bytes(value, position):
-    global arrGlobalConf
     arrGlobalConf[position:position+len(value)]=value
 
 # Met à jour l'index TIC courant et le prix cumulé donné en euros, pour un index TIC donné
@@ -187,6 +525,85 @@ def get_hour_TIC(label, datetime):
         price = 0
     return cons, price # en cents
 
+#
+# Lecture de l'historique par tableaux (optionnel, nécessite numpy)
+#
+
+# Vérifie que numpy est disponible
+def require_numpy():
+    if np is None:
+        raise Exception('Cette fonction nécessite numpy (pip install numpy).')
+
+# Retourne la structure d'un enregistrement de jour de l'historique :
+# en-tête du jour, index TIC (6 octets) et prix cumulés à 0h, puis les
+# 23 enregistrements horaires (en-tête, consommation et prix pour chacun
+# des 7 index TIC), valeurs en big endian
+def history_dtype():
+    require_numpy()
+    dayTIC = np.dtype({'names': ['index', 'price'],
+                       'formats': [('u1', TICDayIndexLength), '>u4'],
+                       'offsets': [0, TICDayIndexLength],
+                       'itemsize': TICDayIndexLength + TICDayPriceLength})
+    hour = np.dtype({'names': ['header', 'TIC'],
+                     'formats': [('u1', 4), ('>u2', (TICCount, 2))],
+                     'offsets': [0, TICHourConsPriceOffset],
+                     'itemsize': hourByteLength})
+    return np.dtype({'names': ['header', 'TIC', 'hours'],
+                     'formats': [('u1', 4), (dayTIC, TICCount), (hour, 23)],
+                     'offsets': [0, TICDayIndexPriceOffset, hour00ByteLength],
+                     'itemsize': dayByteLength})
+
+# Retourne une vue (sans copie) sur les enregistrements de jour de
+# l'historique en mémoire, une ligne par jour dans l'ordre du fichier. La
+# vue est destinée à la lecture : les modifications se font avec
+# set_bytes pour maintenir les index des positions
+def history_view(globalConf=None):
+    return current_globalConf(globalConf).history_view()
+
+# Retourne la ligne de la vue correspondant à une date (-1 si absente)
+def view_row(datetime, globalConf=None):
+    position = current_globalConf(globalConf).datePosition(datetime)
+    if position == -1:
+        return -1
+    return (position - historyPosition) // dayByteLength
+
+# Retourne les dates des lignes de la vue (NaT pour un en-tête qui n'est
+# pas une date valide)
+def view_dates(view):
+    header = view['header'].astype(np.int64)
+    year, month, day = 2000 + header[:, 0], header[:, 1], header[:, 2]
+    valid = (month >= 1) & (month <= 12) & (day >= 1) & (header[:, 3] == 0)
+    months = (year - 1970) * 12 + np.clip(month, 1, 12) - 1
+    firstDay = months.astype('datetime64[M]').astype('datetime64[D]')
+    monthLength = (months + 1).astype('datetime64[M]').astype('datetime64[D]') - firstDay
+    valid &= day <= monthLength.astype(np.int64)
+    dates = firstDay + (day - 1)
+    dates[~valid] = np.datetime64('NaT')
+    return dates
+
+# Retourne les index TIC et les prix cumulés en cents à 0h, tableaux
+# (jours, index TIC) dans l'ordre de TIC_label_order
+def view_day_TIC(view):
+    weights = 256 ** np.arange(TICDayIndexLength - 1, -1, -1, dtype=np.int64)
+    TICindex = view['TIC']['index'].astype(np.int64) @ weights
+    price = view['TIC']['price'].astype(np.int64)
+    return TICindex, price # en cents
+
+# Retourne les consommations horaires et les prix en cents bruts (valeur
+# absentValue en l'absence de mesure), tableaux (jours, heures de 1h à
+# 23h, index TIC)
+def view_hour_TIC(view):
+    values = view['hours']['TIC']
+    return values[..., 0], values[..., 1]
+
+# Retourne un masque (jours, heures de 1h à 23h) des enregistrements
+# horaires dont l'en-tête correspond à la position attendue (les autres
+# doivent être lus via dateTimePosition)
+def view_hour_headers_ok(view):
+    header = view['hours']['header']
+    expected = np.arange(1, 24, dtype=np.uint8)
+    return (header[..., :3] == view['header'][:, None, :3]).all(axis=-1) & (header[..., 3] == expected)
+
 #
 # Fonctions annexes
 #
@@ -250,6 +667,158 @@ def hour_cons_between_23_and_00_TIC(label, date):
     daily_cons=daily_cons_TIC(label, date)
     return daily_cons[0] - day_sum[0], daily_cons[1] - day_sum[1]
 
+# Lit l'index TIC et le prix cumulé en cents à une position de jour
+# donnée, pour un index TIC donné par son numéro d'ordre
+def read_day_TIC(dayPosition, order, globalConf=None):
+    globalConf = current_globalConf(globalConf)
+    position = dayPosition + TICDayIndexPriceOffset + order * (TICDayIndexLength + TICDayPriceLength)
+    TICindex = int.from_bytes(globalConf[position:position+TICDayIndexLength], byteorder='big')
+    position = position + TICDayIndexLength
+    price = int.from_bytes(globalConf[position:position+TICDayPriceLength], byteorder='big')
+    if gcestats.enabled:
+        gcestats.count('décodage : relevés quotidiens')
+        gcestats.count('décodage : octets', TICDayIndexLength + TICDayPriceLength)
+    return TICindex, price
+
+# Lit la consommation horaire et le prix en cents bruts à une position
+# d'heure donnée, pour un index TIC donné par son numéro d'ordre
+def read_hour_TIC(hourPosition, order, globalConf=None):
+    globalConf = current_globalConf(globalConf)
+    position = hourPosition + TICHourConsPriceOffset + order * TICHourConsOrPriceLength * 2
+    cons = int.from_bytes(globalConf[position:position+TICHourConsOrPriceLength], byteorder='big')
+    position = position + TICHourConsOrPriceLength
+    price = int.from_bytes(globalConf[position:position+TICHourConsOrPriceLength], byteorder='big')
+    if gcestats.enabled:
+        gcestats.count('décodage : relevés horaires')
+        gcestats.count('décodage : octets', 2 * TICHourConsOrPriceLength)
+    return cons, price
+
+# Retourne en une seule lecture, pour tous les index TIC et pour chaque
+# jour entre une date de début et une date de fin (incluses), les
+# valeurs de l'historique et les valeurs calculées, sous forme de
+# colonnes indexées par [jour][index TIC] ou [jour][heure - 1][index TIC]
+# (numéro d'ordre de TIC_label_order) :
+# - 'dates' : jours à 00:00
+# - 'jour présent' : le jour est présent dans l'historique
+# - 'index', 'cumul prix' : index TIC et prix cumulés à 0h (en cents)
+# - 'jour complet' : le jour et le jour suivant sont présents
+# - 'conso jour', 'prix jour' : consommation et prix du jour (différence
+#   avec le jour suivant)
+# - 'heure présente' : l'enregistrement horaire est présent
+# - 'conso', 'prix' : consommations et prix horaires relevés de 01:00 à
+#   23:00 (0 en l'absence de mesure, comme get_hour_TIC)
+# - 'conso absente' : la consommation horaire relevée vaut absentValue
+# - 'somme conso', 'somme prix' : somme des relevés de 01:00 à 23:00
+# - 'conso 00', 'prix 00' : consommation et prix calculés entre 23:00 et
+#   00:00
+# Les tableaux sont des tableaux numpy si numpy est disponible, sinon des
+# listes. La configuration globale lue est celle chargée par le script,
+# sauf si une autre configuration (GlobalConfig) est donnée
+@gcestats.timed('lecture : get_TIC_range')
+def get_TIC_range(startDate, endDate, globalConf=None):
+    globalConf = current_globalConf(globalConf)
+    start = datetime.datetime(startDate.year, startDate.month, startDate.day)
+    count = max(0, (datetime.datetime(endDate.year, endDate.month, endDate.day) - start).days + 1)
+    dates = [next_day(start, k) for k in range(count + 1)] # avec le jour suivant la date de fin
+    if np is None:
+        TICrange = get_TIC_range_without_numpy(dates, globalConf)
+    else:
+        TICrange = get_TIC_range_with_numpy(dates, globalConf)
+    TICrange['dates'] = dates[:-1]
+    return TICrange
+
+# Calcul de get_TIC_range avec numpy, à partir de la vue sur l'historique
+def get_TIC_range_with_numpy(dates, globalConf):
+    view = globalConf.history_view()
+    if len(view) == 0:
+        return get_TIC_range_without_numpy(dates, globalConf)
+    rows = np.array([view_row(date, globalConf) for date in dates], dtype=np.int64)
+    if gcestats.enabled:
+        gcestats.count('décodage : jours (vue numpy)', len(rows))
+        gcestats.count('décodage : octets (vue numpy)', len(rows) * dayByteLength)
+    present = (rows >= 0) & (rows < len(view)) # un dernier jour incomplet est ignoré
+    rows = np.where(present, rows, 0)
+    TICindex, price = view_day_TIC(view[rows])
+    TICindex[~present] = 0
+    price[~present] = 0
+    days = view[rows[:-1]]
+    hourCons, hourPrice = (values.astype(np.int64) for values in view_hour_TIC(days))
+    hourPresent = view_hour_headers_ok(days) & present[:-1, None]
+    # structure irrégulière : les heures qui ne sont pas à leur position
+    # attendue sont recherchées dans le jour
+    for day, hour in zip(*np.nonzero(present[:-1, None] & ~hourPresent)):
+        position = globalConf.dateTimePosition(dates[day].replace(hour=hour + 1))
+        if position == -1:
+            continue
+        hourPresent[day, hour] = True
+        for order in range(TICCount):
+            hourCons[day, hour, order], hourPrice[day, hour, order] = read_hour_TIC(position, order, globalConf)
+    absent = (hourCons == absentValue) & hourPresent[..., None]
+    for values in hourCons, hourPrice:
+        values[(values == absentValue) | ~hourPresent[..., None]] = 0
+    complete = present[:-1] & present[1:]
+    TICrange = {}
+    TICrange['jour présent'] = present[:-1]
+    TICrange['index'] = TICindex[:-1]
+    TICrange['cumul prix'] = price[:-1]
+    TICrange['jour complet'] = complete
+    TICrange['conso jour'] = np.where(complete[:, None], TICindex[1:] - TICindex[:-1], 0)
+    TICrange['prix jour'] = np.where(complete[:, None], price[1:] - price[:-1], 0)
+    TICrange['heure présente'] = hourPresent
+    TICrange['conso'] = hourCons
+    TICrange['prix'] = hourPrice
+    TICrange['conso absente'] = absent
+    TICrange['somme conso'] = hourCons.sum(axis=1)
+    TICrange['somme prix'] = hourPrice.sum(axis=1)
+    TICrange['conso 00'] = TICrange['conso jour'] - TICrange['somme conso']
+    TICrange['prix 00'] = TICrange['prix jour'] - TICrange['somme prix']
+    return TICrange
+
+# Calcul de get_TIC_range sans numpy, par lecture des positions indexées
+def get_TIC_range_without_numpy(dates, globalConf):
+    labelCount = TICCount
+    positions = [globalConf.datePosition(date) for date in dates]
+    present = [position != -1 for position in positions]
+    TICindex, price = [], []
+    for position in positions:
+        values = [(0, 0)] * labelCount
+        if position != -1:
+            values = [read_day_TIC(position, order, globalConf) for order in range(labelCount)]
+        TICindex.append([value[0] for value in values])
+        price.append([value[1] for value in values])
+    TICrange = {key: [] for key in ('jour complet', 'conso jour', 'prix jour', 'heure présente', 'conso', 'prix', 'conso absente', 'somme conso', 'somme prix', 'conso 00', 'prix 00')}
+    for day, date in enumerate(dates[:-1]):
+        complete = present[day] and present[day + 1]
+        hourPresent, hourCons, hourPrice, absent = [], [], [], []
+        for hour in range(1, 24):
+            position = globalConf.dateTimePosition(date.replace(hour=hour)) if present[day] else -1
+            values = [(0, 0)] * labelCount
+            if position != -1:
+                values = [read_hour_TIC(position, order, globalConf) for order in range(labelCount)]
+            hourPresent.append(position != -1)
+            absent.append([value[0] == absentValue for value in values])
+            hourCons.append([0 if value[0] == absentValue else value[0] for value in values])
+            hourPrice.append([0 if value[1] == absentValue else value[1] for value in values])
+        dailyCons = [TICindex[day + 1][order] - TICindex[day][order] if complete else 0 for order in range(labelCount)]
+        dailyPrice = [price[day + 1][order] - price[day][order] if complete else 0 for order in range(labelCount)]
+        sumCons = [sum(values[order] for values in hourCons) for order in range(labelCount)]
+        sumPrice = [sum(values[order] for values in hourPrice) for order in range(labelCount)]
+        TICrange['jour complet'].append(complete)
+        TICrange['conso jour'].append(dailyCons)
+        TICrange['prix jour'].append(dailyPrice)
+        TICrange['heure présente'].append(hourPresent)
+        TICrange['conso'].append(hourCons)
+        TICrange['prix'].append(hourPrice)
+        TICrange['conso absente'].append(absent)
+        TICrange['somme conso'].append(sumCons)
+        TICrange['somme prix'].append(sumPrice)
+        TICrange['conso 00'].append([dailyCons[order] - sumCons[order] for order in range(labelCount)])
+        TICrange['prix 00'].append([dailyPrice[order] - sumPrice[order] for order in range(labelCount)])
+    TICrange['jour présent'] = present[:-1]
+    TICrange['index'] = TICindex[:-1]
+    TICrange['cumul prix'] = price[:-1]
+    return TICrange
+
 #
 # Fonctions pour exporter les mesures TIC dans un fichier csv, pour
 # visualiser les erreurs ou les corrections
@@ -296,60 +865,198 @@ def get_currentTIC_all():
         dic[tic_label + ' cumul prix'] = currentTIC[1] # en cents
     return dic    
 
+# Nombre de jours lus à la fois par get_TIC_range lors des exports de
+# mesures (la mémoire utilisée ne dépend pas de la durée exportée)
+TICchunkDays = 31
+
+# Retourne un générateur des mesures TIC entre une date de début et une
+# date de fin, calculées à partir de get_TIC_range par tranches de
+# chunkDays jours (les valeurs non disponibles car absentes de
+# l'historique sont laissées vides). Les mesures sont produites au fur et
+# à mesure de la lecture de l'historique
+def iter_TICmeasures(startDate, endDate, chunkDays=TICchunkDays):
+    chunkStart = datetime.datetime(startDate.year, startDate.month, startDate.day)
+    endDate = datetime.datetime(endDate.year, endDate.month, endDate.day)
+    while chunkStart <= endDate:
+        chunkEnd = min(next_day(chunkStart, chunkDays - 1), endDate)
+        TICrange = get_TIC_range(next_day(chunkStart, -1), chunkEnd) # avec le jour précédent pour les calculs à 00:00
+        columns = {key: value if isinstance(value, list) else value.tolist() for key, value in TICrange.items()}
+        for day in range(1, len(columns['dates'])):
+            date = columns['dates'][day]
+            # quotidien et horaire à 00:00
+            dic = {}
+            dic['Heure du relevé'] = date.strftime('%Y-%m-%d 00:00')
+            dic['EDRT2'] = next_hour(date, -1).strftime('%Hh')
+            present = columns['jour présent'][day]
+            complete = columns['jour complet'][day - 1]
+            for tic_label, order in TIC_label_order.items():
+                dic[tic_label + ' index'] = columns['index'][day][order] if present else None
+                dic[tic_label + ' cumul prix'] = columns['cumul prix'][day][order] if present else None # en cents
+                dic[tic_label + ' conso jour'] = columns['conso jour'][day - 1][order] if complete else None # calculé
+                dic[tic_label + ' prix jour'] = columns['prix jour'][day - 1][order] if complete else None # calculé, en cents
+                dic[tic_label + ' conso'] = columns['conso 00'][day - 1][order] if complete else None # calculé
+                dic[tic_label + ' prix'] = columns['prix 00'][day - 1][order] if complete else None # calculé, en cents
+            yield dic
+            if date == endDate:
+                break
+            # horaire
+            for hour in range(1, 24):
+                dic = {}
+                dic['Heure du relevé'] = date.strftime(f'%Y-%m-%d {hour:02d}:00')
+                dic['EDRT2'] = f'{hour - 1:02d}h'
+                present = columns['heure présente'][day][hour - 1]
+                for tic_label, order in TIC_label_order.items():
+                    dic[tic_label + ' conso'] = columns['conso'][day][hour - 1][order] if present else None
+                    dic[tic_label + ' prix'] = columns['prix'][day][hour - 1][order] if present else None # en cents
+                yield dic
+        chunkStart = next_day(chunkEnd, 1)
+    yield get_currentTIC_all() # index TIC courants et prix cumulés (associés à une heure fictive de relevé qui est "maintenant")
+
 # Retourne la liste des mesures TIC entre une date de début et une date
-# de fin
+# de fin (voir iter_TICmeasures)
 def get_TICmeasures_all(startDate, endDate):
-    TICmeasures = []
-    startDateTime=datetime.datetime(startDate.year, startDate.month, startDate.day, 0, 0)
-    endDateTime=datetime.datetime(endDate.year, endDate.month, endDate.day, 0, 0)
-    h = startDateTime
-    while h < next_hour(endDateTime, 1):
-        if h.hour==0:
-            TICmeasures.append(get_dayTIC_all(h)) # quotidien et horaire à 00:00
-        else:
-            TICmeasures.append(get_hourTIC_all(h)) # horaire
-        h = next_hour(h, 1)
-    TICmeasures.append(get_currentTIC_all()) # index TIC courants et prix cumulés (associés à une heure fictive de relevé qui est "maintenant")
-    return TICmeasures
+    return list(iter_TICmeasures(startDate, endDate))
 
-# Retourne une liste des mesures TIC avec marquage des incohérences, à
-# partir d'une liste existante de mesures Les vérifications portent sur
-# des index ou des prix cumulés qui seraient décroissants ainsi que des
-# valeurs négatives obtenues lors des calculs
-def get_TICerrors(measures):
-    TICerrors = []
+# Retourne les valeurs précédentes initiales pour le marquage des
+# incohérences (index et prix cumulés à 0)
+def initial_TICprevious_values():
     previous_values = {}
     for tic_label in TIC_label_order:
         previous_values[tic_label + ' index'] = 0
-        previous_values[tic_label + ' cumul prix'] = 0    
-    for m in measures:
-        result = {}
-        result['Heure du relevé']=m['Heure du relevé']
-        result['EDRT2']=m['EDRT2']
-        for key, value in m.items():
-            if key == 'Heure du relevé' or key == 'EDRT2':
-                continue
-            if key.endswith('index') or key.endswith('cumul prix'):
-                if value < previous_values[key]: # index ou prix cumulé décroissant
-                    result[key]='ERREUR'
-                else:
-                    result[key]=value
-                previous_values[key] = value
-                continue
-            if value < 0:
-                result[key]='ERREUR'    # valeur négative
+        previous_values[tic_label + ' cumul prix'] = 0
+    return previous_values
+
+# Retourne une mesure TIC avec marquage des incohérences, par rapport aux
+# index et prix cumulés précédents (mis à jour). Les vérifications
+# portent sur des index ou des prix cumulés qui seraient décroissants
+# ainsi que des valeurs négatives obtenues lors des calculs
+def mark_TICerrors(m, previous_values):
+    result = {}
+    result['Heure du relevé']=m['Heure du relevé']
+    result['EDRT2']=m['EDRT2']
+    for key, value in m.items():
+        if key == 'Heure du relevé' or key == 'EDRT2':
+            continue
+        if value is None: # valeur absente de l'historique
+            result[key]=value
+            continue
+        if key.endswith('index') or key.endswith('cumul prix'):
+            if value < previous_values[key]: # index ou prix cumulé décroissant
+                result[key]='ERREUR'
             else:
                 result[key]=value
-        TICerrors.append(result)
-    return TICerrors       
+            previous_values[key] = value
+            continue
+        if value < 0:
+            result[key]='ERREUR'    # valeur négative
+        else:
+            result[key]=value
+    return result
 
-# Exporte une liste de mesures TIC dans un fichier csv
-def outputTICmeasuresInCsv(measures, fullfilename):
-    #csv header
+# Retourne un générateur des mesures TIC avec marquage des incohérences,
+# à partir de mesures existantes (liste ou générateur)
+def iter_TICerrors(measures):
+    previous_values = initial_TICprevious_values()
+    for m in measures:
+        yield mark_TICerrors(m, previous_values)
+
+# Retourne une liste des mesures TIC avec marquage des incohérences, à
+# partir d'une liste existante de mesures (voir mark_TICerrors)
+def get_TICerrors(measures):
+    return list(iter_TICerrors(measures))
+
+# Type d'anomalies détectées dans l'historique
+anomalyKinds = {
+    'index': 'index décroissant',
+    'cumul prix': 'prix cumulé décroissant',
+    'conso': 'conso négative',
+    'prix': 'prix négatif',
+    'absent': 'valeurs absentes',
+    'pic': 'pic de conso',
+    'jour absent': 'jour absent',
+    'ordre': 'jour non ordonné',
+    'en-tête': 'en-tête de jour invalide',
+}
+
+# Retourne la liste des anomalies de tout l'historique, vérifié en une
+# seule passe par tableaux (nécessite numpy). Chaque anomalie est un
+# tuple (jour, heure, index TIC, type) où l'heure et l'index TIC valent
+# None lorsqu'ils ne s'appliquent pas. Les vérifications portent sur :
+# - les index et prix cumulés décroissants d'un jour au suivant
+# - les consommations et prix négatifs calculés entre 23:00 et 00:00
+#   (signalés à 00:00 du jour suivant, comme dans le fichier csv)
+# - les suites de valeurs absentes (signalées à leur première heure avec
+#   leur durée)
+# - les consommations horaires supérieures à maxHourCons (en Wh)
+# - les jours absents, non ordonnés ou dont l'en-tête est invalide
+@gcestats.timed('lecture : scan_TIC_anomalies')
+def scan_TIC_anomalies(maxHourCons=36000, globalConf=None):
+    globalConf = current_globalConf(globalConf)
+    require_numpy()
+    anomalies = []
+    labels = {order: label for label, order in TIC_label_order.items()}
+    as_datetime = lambda date: datetime.datetime.combine(date.astype(datetime.date), datetime.time())
+    view = globalConf.history_view()
+    dates = view_dates(view)
+    valid = ~np.isnat(dates)
+    if not valid.any():
+        return anomalies
+    # en-têtes de jour (dans l'ordre du fichier, les enregistrements
+    # invalides après le dernier jour valide sont inutilisés)
+    validRows = np.nonzero(valid)[0]
+    for row in np.nonzero(~valid[:validRows[-1]])[0]:
+        previous = validRows[validRows < row]
+        date = dates[previous[-1]] if len(previous) else None
+        anomalies.append((None if date is None else as_datetime(date), None, None, anomalyKinds['en-tête']))
+    validDates = dates[valid]
+    for k in np.nonzero(np.diff(validDates).astype(np.int64) <= 0)[0]:
+        anomalies.append((as_datetime(validDates[k + 1]), None, None, anomalyKinds['ordre']))
+    TICrange = get_TIC_range(as_datetime(validDates.min()), as_datetime(validDates.max()), globalConf)
+    days = np.array(TICrange['dates'])
+    for day in np.nonzero(~TICrange['jour présent'])[0]:
+        anomalies.append((days[day], None, None, anomalyKinds['jour absent']))
+    # index et prix cumulés décroissants entre 2 jours présents consécutifs
+    present = np.nonzero(TICrange['jour présent'])[0]
+    for key in 'index', 'cumul prix':
+        values = TICrange[key][present]
+        for day, order in zip(*np.nonzero(np.diff(values, axis=0) < 0)):
+            anomalies.append((days[present[day + 1]], 0, labels.get(order), anomalyKinds[key]))
+    # valeurs calculées entre 23:00 et 00:00
+    complete = TICrange['jour complet'][:, None]
+    for key, kind in ('conso 00', 'conso'), ('prix 00', 'prix'):
+        for day, order in zip(*np.nonzero(complete & (TICrange[key] < 0))):
+            anomalies.append((next_day(days[day], 1), 0, labels.get(order), anomalyKinds[kind]))
+    for day, order in zip(*np.nonzero(complete & (TICrange['conso 00'] > maxHourCons))):
+        anomalies.append((next_day(days[day], 1), 0, labels.get(order), anomalyKinds['pic']))
+    # pics de consommation horaire
+    for day, hour, order in zip(*np.nonzero(TICrange['conso'] > maxHourCons)):
+        anomalies.append((days[day], int(hour) + 1, labels.get(order), anomalyKinds['pic']))
+    # suites de valeurs absentes, continues d'un jour au suivant
+    absent = TICrange['conso absente'].reshape(-1, TICCount)
+    edges = np.diff(np.vstack([np.zeros((1, TICCount), dtype=np.int8), absent.astype(np.int8), np.zeros((1, TICCount), dtype=np.int8)]), axis=0)
+    for order in range(TICCount):
+        starts = np.nonzero(edges[:, order] == 1)[0]
+        ends = np.nonzero(edges[:, order] == -1)[0]
+        for start, end in zip(starts, ends):
+            day, hour = divmod(int(start), 23)
+            anomalies.append((days[day], hour + 1, labels.get(order), f'{anomalyKinds["absent"]} ({end - start} h)'))
+    anomalies.sort(key=lambda anomaly: (anomaly[0] or datetime.datetime.min, anomaly[1] or 0, TIC_label_order.get(anomaly[2], -1)))
+    return anomalies
+
+# Exporte une liste d'anomalies de l'historique dans un fichier csv
+@gcestats.timed('csv : outputTICanomaliesInCsv')
+def outputTICanomaliesInCsv(anomalies, fullfilename):
+    with open(fullfilename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';')
+        writer.writerow(['Jour', 'Heure', 'Index TIC', 'Anomalie'])
+        for date, hour, label, kind in anomalies:
+            writer.writerow(['' if date is None else f'{date:%Y-%m-%d}', '' if hour is None else f'{hour:02d}:00', label or '', kind])
+
+# Retourne les noms des colonnes du csv des mesures TIC
+def TICmeasures_field_names():
     field_names = []
     field_names.append('Heure du relevé')
     field_names.append('EDRT2')
-    delimiter = ';'
     for tic_label in TIC_label_order:
         field_names.append(tic_label + ' index')
         field_names.append(tic_label + ' cumul prix')
@@ -357,13 +1064,469 @@ def outputTICmeasuresInCsv(measures, fullfilename):
         field_names.append(tic_label + ' prix jour')
         field_names.append(tic_label + ' conso')
         field_names.append(tic_label + ' prix')
+    return field_names
 
+# Exporte des mesures TIC (liste ou générateur) dans un fichier csv
+@gcestats.timed('csv : outputTICmeasuresInCsv')
+def outputTICmeasuresInCsv(measures, fullfilename):
+    delimiter = ';'
     #output the csv file
     with open(fullfilename, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, delimiter=delimiter, fieldnames = field_names)
+        writer = csv.DictWriter(csvfile, delimiter=delimiter, fieldnames = TICmeasures_field_names())
         writer.writeheader()
         writer.writerows(measures)
 
+# Exporte des mesures TIC (liste ou générateur) dans un fichier csv et
+# les mêmes mesures avec marquage des incohérences dans un second
+# fichier csv, en un seul parcours des mesures
+@gcestats.timed('csv : outputTICmeasuresAndErrorsInCsv')
+def outputTICmeasuresAndErrorsInCsv(measures, fullfilename, errorsFullfilename):
+    delimiter = ';'
+    field_names = TICmeasures_field_names()
+    with open(fullfilename, 'w', newline='') as csvfile, open(errorsFullfilename, 'w', newline='') as errorsCsvfile:
+        writer = csv.DictWriter(csvfile, delimiter=delimiter, fieldnames = field_names)
+        errorsWriter = csv.DictWriter(errorsCsvfile, delimiter=delimiter, fieldnames = field_names)
+        writer.writeheader()
+        errorsWriter.writeheader()
+        previous_values = initial_TICprevious_values()
+        for m in measures:
+            writer.writerow(m)
+            errorsWriter.writerow(mark_TICerrors(m, previous_values))
+
+#
+# Agrégation des consommations et des prix par index TIC (nécessite
+# numpy)
+#
+# Les consommations et prix de chaque heure de l'historique (de 0h à
+# 23h, la dernière heure du jour étant calculée entre 23:00 et 00:00)
+# sont cumulés par index TIC : la somme sur tout intervalle d'heures ou
+# de jours est alors la différence de deux cumuls, sans relire
+# l'historique. Les cumuls sont mis à jour lors des modifications de la
+# configuration (corrections)
+#
+
+# Couleurs Tempo et suffixe des index TIC associés
+tempoColors = {'Bleu': 'JB', 'Blanc': 'JW', 'Rouge': 'JR'}
+
+# Retourne les dates du premier et du dernier jour valides de
+# l'historique d'une configuration globale
+def history_date_range(globalConf=None):
+    dates = view_dates(history_view(globalConf))
+    dates = dates[~np.isnat(dates)]
+    if len(dates) == 0:
+        raise Exception('Aucun jour valide dans l\'historique.')
+    first, last = (datetime.datetime.combine(date.astype(datetime.date), datetime.time()) for date in (dates.min(), dates.max()))
+    return first, last
+
+# Retourne les consommations et prix de chaque heure (0h à 23h) des
+# jours d'un résultat de get_TIC_range (avec numpy), tableaux (jours,
+# heures, index TIC), et le masque des valeurs manquantes (heures non
+# enregistrées ou valeurs absentes, heure 23h-00h d'un jour incomplet)
+def TIC_hour_values(TICrange):
+    complete = TICrange['jour complet']
+    days = len(TICrange['dates'])
+    cons = np.zeros((days, 24, TICCount), dtype=np.int64)
+    price = np.zeros((days, 24, TICCount), dtype=np.int64)
+    missing = np.zeros((days, 24, TICCount), dtype=bool)
+    cons[:, :23] = TICrange['conso']
+    price[:, :23] = TICrange['prix']
+    cons[:, 23] = np.where(complete[:, None], TICrange['conso 00'], 0)
+    price[:, 23] = np.where(complete[:, None], TICrange['prix 00'], 0)
+    missing[:, :23] = ~TICrange['heure présente'][..., None] | TICrange['conso absente']
+    missing[:, 23] = ~complete[:, None]
+    return cons, price, missing
+
+# Retourne les groupes d'index TIC par couleur Tempo (pour TICAggregates.rollup)
+def tempoColorGroups():
+    return {color: [label for label in TIC_label_order if label.endswith(suffix)] for color, suffix in tempoColors.items()}
+
+# Cumuls des consommations et des prix horaires par index TIC de tout
+# l'historique d'une configuration (du premier au dernier jour valide)
+class TICAggregates:
+
+    def __init__(self, globalConf=None):
+        require_numpy()
+        self.globalConf = current_globalConf(globalConf)
+        self.globalConf.observers.append(self) # suivi des modifications (voir touched)
+        self.build()
+
+    # Retourne les consommations, prix et valeurs manquantes de chaque
+    # heure des jours d'un intervalle (voir TIC_hour_values)
+    def hour_values(self, startDate, endDate):
+        return TIC_hour_values(get_TIC_range(startDate, endDate, self.globalConf))
+
+    # Construit les cumuls de tout l'historique
+    def build(self):
+        self.start, last = history_date_range(self.globalConf)
+        self.days = (last - self.start).days + 1
+        self.dirtyDays = set() # jours modifiés depuis le dernier calcul
+        self.stale = False # en-têtes de jour modifiés : cumuls à reconstruire
+        cons, price, missing = self.hour_values(self.start, last)
+        self.cons, self.price, self.missing = (np.zeros((self.days * 24 + 1, TICCount), dtype=np.int64) for _ in range(3))
+        for cumul, values in (self.cons, cons), (self.price, price), (self.missing, missing):
+            np.cumsum(values.reshape(-1, TICCount), axis=0, out=cumul[1:])
+
+    # Note les jours touchés par une modification de la configuration
+    # (appelé par GlobalConfig), recalculés à la prochaine lecture. Un
+    # index quotidien modifié change aussi la consommation calculée de la
+    # veille entre 23:00 et 00:00
+    def touched(self, position, length):
+        if position + length <= historyPosition:
+            return
+        if touches_day_header(position, length):
+            self.stale = True
+            return
+        first = max(0, (position - historyPosition) // dayByteLength)
+        last = (position + length - 1 - historyPosition) // dayByteLength
+        for row in range(first, last + 1):
+            header = self.globalConf[historyPosition + row * dayByteLength:historyPosition + row * dayByteLength + 4]
+            try:
+                date = datetime.datetime(2000 + header[0], header[1], header[2])
+            except ValueError:
+                continue
+            day = (date - self.start).days
+            if not 0 <= day < self.days:
+                self.stale = True
+                continue
+            self.dirtyDays.update(d for d in (day - 1, day) if d >= 0)
+
+    # Met à jour les cumuls des jours modifiés : pour chaque suite de
+    # jours modifiés, les différences avec les valeurs précédentes sont
+    # ajoutées aux cumuls des heures suivantes
+    def refresh(self):
+        if self.stale:
+            self.build()
+            return
+        days = sorted(self.dirtyDays)
+        self.dirtyDays = set()
+        while days:
+            first = last = days.pop(0)
+            while days and days[0] == last + 1:
+                last = days.pop(0)
+            values = self.hour_values(next_day(self.start, first), next_day(self.start, last))
+            begin, end = first * 24, (last + 1) * 24
+            for cumul, newValues in zip((self.cons, self.price, self.missing), values):
+                delta = newValues.reshape(-1, TICCount).astype(np.int64) - np.diff(cumul[begin:end + 1], axis=0)
+                cumul[begin + 1:end + 1] += np.cumsum(delta, axis=0)
+                cumul[end + 1:] += delta.sum(axis=0)
+
+    # Retourne les sommes par index TIC (tableaux (intervalles, index
+    # TIC)) des consommations, des prix et des valeurs manquantes entre
+    # des numéros d'heures de l'historique (début inclus, fin exclue). Les
+    # heures hors de l'historique sont comptées comme manquantes
+    def slot_sums(self, begin, end):
+        if self.stale or self.dirtyDays:
+            self.refresh()
+        begin, end = np.asarray(begin), np.maximum(begin, end)
+        inBegin, inEnd = (np.clip(slots, 0, self.days * 24) for slots in (begin, end))
+        cons, price, missing = (cumul[inEnd] - cumul[inBegin] for cumul in (self.cons, self.price, self.missing))
+        missing += ((end - begin) - (inEnd - inBegin))[..., None]
+        return cons, price, missing
+
+    # Retourne le numéro de l'heure d'une date et heure dans les cumuls
+    def slot(self, datetime1):
+        return (datetime1 - self.start) // datetime.timedelta(hours=1)
+
+    # Retourne la consommation, le prix en cents et le nombre de valeurs
+    # manquantes entre deux dates et heures (fin exclue), pour un index
+    # TIC ou une liste d'index TIC
+    def sum(self, labels, startDateTime, endDateTime):
+        orders = [TIC_label_order[label] for label in ([labels] if isinstance(labels, str) else labels)]
+        sums = self.slot_sums(self.slot(startDateTime), self.slot(endDateTime))
+        return tuple(int(values[orders].sum()) for values in sums)
+
+    # Retourne les consommations, prix en cents et nombres de valeurs
+    # manquantes par période ('jour', 'semaine' à partir du lundi ou
+    # 'mois') entre deux dates (incluses, tout l'historique par défaut),
+    # pour chaque groupe d'index TIC (par défaut un groupe par index TIC,
+    # voir aussi tempoColorGroups). Retourne une liste de dictionnaires
+    # {'période': date de début, groupe: (conso, prix, manquantes)}
+    def rollup(self, period='jour', groups=None, startDate=None, endDate=None):
+        groups = groups or {label: [label] for label in TIC_label_order}
+        startDate = startDate or self.start
+        endDate = endDate or next_day(self.start, self.days - 1)
+        start = datetime.datetime(startDate.year, startDate.month, startDate.day)
+        end = next_day(datetime.datetime(endDate.year, endDate.month, endDate.day), 1)
+        periods = [start]
+        date = start
+        while True:
+            if period == 'jour':
+                date = next_day(date, 1)
+            elif period == 'semaine':
+                date = next_day(date, 7 - date.weekday())
+            elif period == 'mois':
+                date = datetime.datetime(date.year + date.month // 12, date.month % 12 + 1, 1)
+            else:
+                raise Exception(f'Période {period} inconnue (jour, semaine ou mois).')
+            if date >= end:
+                break
+            periods.append(date)
+        slots = np.array([self.slot(date) for date in periods + [end]])
+        sums = self.slot_sums(slots[:-1], slots[1:])
+        rollup = []
+        for k, periodStart in enumerate(periods):
+            row = {'période': periodStart}
+            for name, labels in groups.items():
+                orders = [TIC_label_order[label] for label in labels]
+                row[name] = tuple(int(values[k, orders].sum()) for values in sums)
+            rollup.append(row)
+        return rollup
+
+#
+# Corrections à partir d'un fichier csv
+#
+# Le fichier csv (séparateur ';') comporte une ligne d'entête puis une
+# correction par ligne :
+#   Index TIC;Relevé;Fin;Valeur;Prix
+#   HCJW;courant;;222222;111,11
+#   HPJB;2024-01-05;;8351707;808.75
+#   HPJB;2024-01-04;2024-01-20;8351707;808.75
+#   HCJR;2024-01-05 04:00;;1522;1.08
+# - Relevé : 'courant' pour l'index courant, une date (ou date à 00:00)
+#   pour le relevé d'index quotidien, une date et heure de 01:00 à 23:00
+#   pour une consommation horaire
+# - Fin : date de fin (incluse) pour appliquer le même relevé d'index
+#   quotidien à plusieurs jours, vide sinon
+# - Valeur : index ou consommation en Wh
+# - Prix : prix cumulé ou prix horaire en euros
+#
+
+# Lit un fichier csv de corrections et retourne la liste des
+# corrections (une par jour pour une plage de jours), chacune sous la
+# forme d'un dictionnaire avec la ligne du fichier, l'index TIC, le
+# type de relevé ('courant', 'jour' ou 'heure'), la date et heure, la
+# valeur et le prix en cents. Les erreurs de format sont toutes
+# signalées ensemble
+def read_TICcorrections_csv(fullfilename):
+    corrections = []
+    errors = []
+    with open(fullfilename, newline='') as csvfile:
+        reader = csv.reader(csvfile, delimiter=';')
+        next(reader, None) # entête
+        for row in reader:
+            line = reader.line_num
+            if not any(cell.strip() for cell in row):
+                continue
+            try:
+                if len(row) != 5:
+                    raise ValueError('5 colonnes attendues')
+                label, reading, end, value, price = (cell.strip() for cell in row)
+                if label not in TIC_label_order:
+                    raise ValueError(f'index TIC {label} inconnu')
+                value = int(value)
+                price = decimal.Decimal(price.replace(',', '.')) * 100
+                if price != int(price):
+                    raise ValueError('prix avec plus de 2 décimales')
+                price = int(price)
+                if reading == 'courant':
+                    kind, start = 'courant', None
+                elif len(reading) == len('2024-01-05'):
+                    kind, start = 'jour', datetime.datetime.strptime(reading, '%Y-%m-%d')
+                else:
+                    start = datetime.datetime.strptime(reading, '%Y-%m-%d %H:%M')
+                    kind = 'jour' if start.hour == 0 and start.minute == 0 else 'heure'
+                    if start.minute != 0:
+                        raise ValueError('heure ronde attendue')
+                if end and kind != 'jour':
+                    raise ValueError('une date de fin n\'est possible que pour un relevé d\'index quotidien')
+                last = datetime.datetime.strptime(end, '%Y-%m-%d') if end else start
+                if kind == 'jour' and last < start:
+                    raise ValueError('date de fin antérieure à la date de début')
+            except (ValueError, decimal.InvalidOperation) as e:
+                errors.append(f'ligne {line} : {e}')
+                continue
+            day = start
+            while True:
+                corrections.append({'ligne': line, 'index TIC': label, 'relevé': kind, 'date': day, 'valeur': value, 'prix': price})
+                if kind != 'jour' or day >= last:
+                    break
+                day = next_day(day, 1)
+    if errors:
+        raise Exception('Fichier de corrections non conforme :\n' + '\n'.join(errors))
+    return corrections
+
+# Retourne les modifications à apporter pour une liste de corrections,
+# après vérification de toutes les corrections (relevé présent dans
+# l'historique, valeurs dans les limites, pas de correction en double).
+# Chaque modification est un dictionnaire avec la position, les octets à
+# écrire, la correction d'origine, le champ modifié et les valeurs avant
+# et après. Les modifications sont triées par position pour être
+# appliquées en une seule passe
+def plan_TICcorrections(corrections, globalConf=None):
+    globalConf = current_globalConf(globalConf)
+    changes = []
+    errors = []
+    for correction in corrections:
+        label, date = correction['index TIC'], correction['date']
+        order = TIC_label_order[label]
+        if correction['relevé'] == 'courant':
+            positions = positionsOfCurrentTIC(label)
+            lengths = TICCurrentIndexOrPriceLength, TICCurrentIndexOrPriceLength
+            fields = 'index', 'cumul prix'
+        elif correction['relevé'] == 'jour':
+            position = globalConf.datePosition(date)
+            if position == -1:
+                errors.append(f'ligne {correction["ligne"]} : {date:%Y-%m-%d} absent de l\'historique')
+                continue
+            position = position + TICDayIndexPriceOffset + order * (TICDayIndexLength + TICDayPriceLength)
+            positions = position, position + TICDayIndexLength
+            lengths = TICDayIndexLength, TICDayPriceLength
+            fields = 'index', 'cumul prix'
+        else:
+            position = globalConf.dateTimePosition(date)
+            if position == -1:
+                errors.append(f'ligne {correction["ligne"]} : {date:%Y-%m-%d %H:00} absent de l\'historique')
+                continue
+            position = position + TICHourConsPriceOffset + order * TICHourConsOrPriceLength * 2
+            positions = position, position + TICHourConsOrPriceLength
+            lengths = TICHourConsOrPriceLength, TICHourConsOrPriceLength
+            fields = 'conso', 'prix'
+        for position, length, field, value in zip(positions, lengths, fields, (correction['valeur'], correction['prix'])):
+            if not 0 <= value < 256 ** length:
+                errors.append(f'ligne {correction["ligne"]} : {field} {value} hors limites')
+                continue
+            before = int.from_bytes(globalConf[position:position+length], byteorder='big')
+            changes.append({'position': position, 'octets': value.to_bytes(length, byteorder='big'), 'correction': correction, 'champ': field, 'avant': before, 'après': value})
+    changes.sort(key=lambda change: change['position'])
+    for previous, change in zip(changes, changes[1:]):
+        if change['position'] < previous['position'] + len(previous['octets']):
+            error = f'lignes {previous["correction"]["ligne"]} et {change["correction"]["ligne"]} : corrections du même relevé'
+            if error not in errors:
+                errors.append(error)
+    if errors:
+        raise Exception('Corrections non applicables :\n' + '\n'.join(errors))
+    return changes
+
+# Applique des modifications préparées par plan_TICcorrections, en un
+# seul parcours dans l'ordre des positions
+def apply_TICcorrections(changes, globalConf=None):
+    globalConf = current_globalConf(globalConf)
+    for change in changes:
+        position = change['position']
+        globalConf[position:position+len(change['octets'])] = change['octets']
+
+# Retourne le relevé d'une correction sous forme de texte
+def format_TICcorrection_reading(correction):
+    if correction['relevé'] == 'courant':
+        return 'courant'
+    return correction['date'].strftime('%Y-%m-%d %H:00')
+
+# Exporte le rapport avant / après des modifications préparées dans un
+# fichier csv (prix en cents)
+@gcestats.timed('csv : outputTICcorrectionsInCsv')
+def outputTICcorrectionsInCsv(changes, fullfilename):
+    with open(fullfilename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';')
+        writer.writerow(['Ligne', 'Relevé', 'Index TIC', 'Champ', 'Avant', 'Après'])
+        for change in changes:
+            correction = change['correction']
+            writer.writerow([correction['ligne'], format_TICcorrection_reading(correction), correction['index TIC'], change['champ'], change['avant'], change['après']])
+
+#
+# Réparation des consommations horaires absentes (nécessite numpy)
+#
+# Une coupure peut laisser des relevés horaires enregistrés avec des
+# valeurs absentes (absentValue), lues comme une consommation nulle : la
+# consommation de ces heures est alors comptée dans la consommation
+# calculée entre 23:00 et 00:00 (différence entre les index quotidiens
+# et la somme des relevés horaires). La réparation répartit ce reste sur
+# les heures absentes, l'heure 23h-00h et les heures non enregistrées
+# (qui gardent leur part dans le calcul de 23h-00h), suivant un profil :
+# - 'plat' : même part pour chaque heure
+# - 'semaines précédentes' : moyenne des consommations à la même heure
+#   le même jour des semaines précédentes (profil plat si aucune
+#   consommation connue)
+# Les réparations sont des corrections horaires à vérifier puis
+# appliquer avec plan_TICcorrections et apply_TICcorrections
+#
+
+TICrepairProfiles = ('plat', 'semaines précédentes')
+
+# Retourne le poids de chaque heure (jours, heures de 0h à 23h, index
+# TIC) pour un profil de réparation, à partir des valeurs de
+# TIC_hour_values (NaN si le poids n'est pas connu)
+def TICrepair_weights(cons, missing, profile='plat', weeks=4):
+    if profile == 'plat':
+        return np.ones(cons.shape)
+    if profile != 'semaines précédentes':
+        raise Exception(f'Profil de réparation {profile} inconnu ({", ".join(TICrepairProfiles)}).')
+    available = ~missing
+    available[:, 23] &= ~missing[:, :23].any(axis=1) # heure 23h-00h faussée par les heures absentes
+    total = np.zeros(cons.shape)
+    count = np.zeros(cons.shape)
+    for week in range(1, weeks + 1):
+        shift = 7 * week
+        if shift >= len(cons):
+            break
+        total[shift:] += np.where(available[:-shift], np.maximum(cons[:-shift], 0), 0)
+        count[shift:] += available[:-shift]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / count
+
+# Retourne les réparations des consommations horaires absentes de tout
+# l'historique :
+# - les corrections horaires (même forme que read_TICcorrections_csv,
+#   sans ligne de fichier), pour plan_TICcorrections
+# - le rapport, une ligne par jour et index TIC avec des heures absentes
+#   (nombre d'heures, reste 23h-00h avant réparation, consommation et
+#   prix répartis, état)
+def plan_TICabsent_repairs(profile='plat', weeks=4, globalConf=None):
+    require_numpy()
+    globalConf = current_globalConf(globalConf)
+    first, last = history_date_range(globalConf)
+    TICrange = get_TIC_range(first, last, globalConf)
+    cons, price, missing = TIC_hour_values(TICrange)
+    dates = TICrange['dates']
+    absent = np.zeros(cons.shape, dtype=bool)
+    absent[:, :23] = TICrange['conso absente']
+    notRecorded = np.zeros(cons.shape, dtype=bool)
+    notRecorded[:, :23] = ~TICrange['heure présente'][..., None]
+    notRecorded[:, 23] = True # heure 23h-00h, calculée
+    restCons, restPrice = TICrange['conso 00'], TICrange['prix 00']
+    # parts des heures : profil plat pour les jours sans poids connus
+    weights = TICrepair_weights(cons, missing, profile, weeks)
+    receivers = absent | notRecorded
+    totals = np.where(receivers, weights, 0).sum(axis=1)
+    unknown = ~(totals > 0) # NaN ou nul
+    weights = np.where(unknown[:, None, :], 1.0, weights)
+    totals = np.where(unknown, receivers.sum(axis=1), totals)
+    shares = np.cumsum(np.where(absent, weights, 0), axis=1) / totals[:, None, :]
+    # arrondis par cumuls : la somme répartie ne dépasse pas le reste
+    repairedCons, repairedPrice = (np.diff(np.floor(rest[:, None, :] * shares).astype(np.int64), axis=1, prepend=0) for rest in (restCons, restPrice))
+    capped = absent & ((repairedCons >= absentValue) | (repairedPrice >= absentValue))
+    repairedCons, repairedPrice = (np.minimum(values, absentValue - 1) for values in (repairedCons, repairedPrice))
+    withAbsent = absent.any(axis=1)
+    repairable = withAbsent & TICrange['jour complet'][:, None] & (restCons >= 0) & (restPrice >= 0)
+    labels = list(TIC_label_order)
+    corrections = []
+    for day, hour, order in zip(*np.nonzero(absent & repairable[:, None, :])):
+        corrections.append({'ligne': None, 'index TIC': labels[order], 'relevé': 'heure', 'date': dates[day].replace(hour=hour + 1),
+                            'valeur': int(repairedCons[day, hour, order]), 'prix': int(repairedPrice[day, hour, order])})
+    report = []
+    for day, order in zip(*np.nonzero(withAbsent)):
+        if not TICrange['jour complet'][day]:
+            state = 'non réparé (jour suivant absent)'
+        elif not repairable[day, order]:
+            state = 'non réparé (reste 23h-00h négatif)'
+        elif capped[day, :, order].any():
+            state = 'réparé (valeurs plafonnées)'
+        else:
+            state = 'réparé'
+        done = repairable[day, order] & absent[day, :, order]
+        report.append({'jour': dates[day], 'index TIC': labels[order], 'heures absentes': int(absent[day, :, order].sum()),
+                       'reste conso': int(restCons[day, order]), 'reste prix': int(restPrice[day, order]),
+                       'conso répartie': int(repairedCons[day, done, order].sum()), 'prix réparti': int(repairedPrice[day, done, order].sum()), 'état': state})
+    return corrections, report
+
+# Exporte le rapport des réparations dans un fichier csv (prix en cents)
+@gcestats.timed('csv : outputTICrepairsInCsv')
+def outputTICrepairsInCsv(report, fullfilename):
+    with open(fullfilename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';')
+        writer.writerow(['Jour', 'Index TIC', 'Heures absentes', 'Reste conso 23h-00h', 'Reste prix 23h-00h', 'Conso répartie', 'Prix réparti', 'Etat'])
+        for row in report:
+            writer.writerow([f'{row["jour"]:%Y-%m-%d}', row['index TIC'], row['heures absentes'], row['reste conso'], row['reste prix'], row['conso répartie'], row['prix réparti'], row['état']])
+
 #
 # Affichage de valeurs dans la console
 #
@@ -411,47 +1574,92 @@ def print_hour_cons_between_23_and_00_TIC_all(date):
         hourTIC = hour_cons_between_23_and_00_TIC(tic_label, date)
         print(tic_label + ' (conso, prix) : ' + format_Wh_price_pair(hourTIC))
 
+# Affiche le rapport avant / après des modifications préparées
+def print_TICcorrections(changes):
+    for change in changes:
+        correction = change['correction']
+        before, after = change['avant'], change['après']
+        if change['champ'] in ('cumul prix', 'prix'):
+            before, after = f'{price_in_euros(before):.2f}', f'{price_in_euros(after):.2f}'
+        print(format_TICcorrection_reading(correction) + ' ' + correction['index TIC'] + ' ' + change['champ'] + ' : ' + str(before) + ' -> ' + str(after))
+
+# Affiche les anomalies de l'historique
+def print_TIC_anomalies(anomalies):
+    for date, hour, label, kind in anomalies:
+        print(('?' if date is None else f'{date:%Y-%m-%d}') + ('' if hour is None else f' {hour:02d}:00') + ('' if label is None else ' ' + label) + ' : ' + kind)
+
 #
 # Fonctions pour gérer le fichier de configuration globale
 #
 
-# Télécharge le fichier de configuration globale depuis l'Ecodevice, le
-# sauvegarde sous le nom de fichier donné et charge son contenu en
-# mémoire
-def download_globalConf_file(fullfilename):
+# Vérifie qu'un fichier est une configuration globale : l'historique
+# doit être présent et comporter au moins un jour dont l'en-tête est une
+# date valide (lève une exception sinon)
+def validate_globalConf_file(fullfilename):
+    globalConf = GlobalConfig(fullfilename)
+    try:
+        if len(globalConf) < historyPosition + dayByteLength:
+            raise Exception(f'historique absent, {len(globalConf)} octets')
+        for position in range(historyPosition, len(globalConf) - dayByteLength + 1, dayByteLength):
+            header = globalConf[position:position+4]
+            if header[3] != 0:
+                continue
+            try:
+                datetime.date(2000 + header[0], header[1], header[2])
+                return
+            except ValueError:
+                continue
+        raise Exception('aucun jour valide dans l\'historique')
+    finally:
+        globalConf.close()
+
+# Télécharge le fichier de configuration globale depuis l'Ecodevice
+# (par morceaux, avec reprise et vérification, voir gcedownload.py), le
+# sauvegarde sous le nom de fichier donné et le charge en mémoire (usage
+# du cache des index comme open_indexed_globalConf). Retourne False si le
+# téléchargement a échoué
+def download_globalConf_file(fullfilename, cache=None):
     global arrGlobalConf
 
     print('Téléchargement en cours...')
-    response = requests.get('http://' + ecodevice + '/admin/download/system.gce')
-    if not response.status_code == 200:
-        print('Le téléchargement a échoué. Erreur : ' + str(response.status_code))
-        return
-    with open(fullfilename, "wb") as outfile:
-        outfile.write(response.content)
-    arrGlobalConf=bytearray(response.content)
-
-# Charge le fichier de configuration globale en mémoire
-def load_globalConf_file(fullfilename):
+    try:
+        gcedownload.download_gce('http://' + ecodevice + '/admin/download/system.gce', fullfilename, validate_globalConf_file)
+    except Exception as e:
+        print('Le téléchargement a échoué. ' + str(e))
+        return False
+    close_globalConf_file()
+    arrGlobalConf=open_indexed_globalConf(fullfilename, cache)
+    return True
+
+# Charge le fichier de configuration globale en mémoire (projection du
+# fichier en lecture seule, les modifications restent en mémoire), avec
+# les index des positions conservés dans le cache à côté du fichier (usage
+# du cache comme open_indexed_globalConf)
+def load_globalConf_file(fullfilename, cache=None):
     global arrGlobalConf
     
-    with open(fullfilename, "rb") as infile:
-        content=infile.read()
-    arrGlobalConf=bytearray(content)    
+    close_globalConf_file()
+    arrGlobalConf=open_indexed_globalConf(fullfilename, cache)
+
+# Libère la configuration globale chargée en mémoire (projection et
+# fichier), avant d'en charger une autre
+def close_globalConf_file():
+    global arrGlobalConf
+
+    if arrGlobalConf is not None:
+        arrGlobalConf.close()
+        arrGlobalConf = None
 
 # Ecrit le contenu (modifié) en mémoire dans un nouveau fichier dont le nom est donné
 def write_globalConf_file(fullfilename):
-        with open(fullfilename, "wb") as outfile:
-            outfile.write(arrGlobalConf)
+    arrGlobalConf.write(fullfilename)
 
 #
 # Actions principales
 #
 
 def main():
-    global arrGlobalConf # Configuration globale chargée en mémoire (bytearray)
-
-    TICmeasures = [] # Liste des mesures TIC
-    TICerrors = [] # Liste des mesures TIC avec marquage des incohérences trouvées
+    global arrGlobalConf # Configuration globale chargée en mémoire (GlobalConfig)
 
     #
     # Téléchargement de la configuration globale (ou travail sur un fichier existant)
@@ -460,7 +1668,8 @@ def main():
     if choice == 'o':
         config_filename = 'system_' + datetime.datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
         fullfilename = workingdir + '/' + config_filename + '.gce'
-        download_globalConf_file(fullfilename)
+        if not download_globalConf_file(fullfilename):
+            return
         print(f'Le fichier a été enregistré et nommé {fullfilename}')
     else: # Travail avec un fichier existant déjà téléchargé
         config_filename = existing_filename
@@ -468,8 +1677,20 @@ def main():
         choice=input(f'Utiliser le fichier {fullfilename} ? [o/n]\n')
         if not choice == 'o':
             return
+        load_globalConf_file(fullfilename) # déjà chargé après un téléchargement
         
-    load_globalConf_file(fullfilename)
+    summary = arrGlobalConf.summary
+    print(f'Historique jusqu\'au {summary["dernier jour"]}, {summary["heures météo"]} heures de données météo')
+
+    #
+    # Recherche des anomalies sur tout l'historique (si numpy est
+    # disponible)
+    #
+    if np is not None:
+        anomalies = scan_TIC_anomalies()
+        fullfilename = workingdir + '/' + config_filename + '_anomalies.csv'
+        outputTICanomaliesInCsv(anomalies, fullfilename)
+        print(f'\n{len(anomalies)} anomalies trouvées dans l\'historique et exportées dans le fichier {fullfilename}')
 
     #
     # Visualisation des erreurs dans des fichiers csv
@@ -492,15 +1713,12 @@ def main():
     # ligne du fichier, avec une heure fictive (l'heure de la création
     # du fichier csv)
     # Les prix visualisés sont en cents dans le csv
+    # Les mesures avec marquage des erreurs sont exportées dans un autre
+    # fichier csv, lors de la même lecture de l'historique
     print('\nExport des mesures sélectionnées dans un fichier csv...')
     fullfilename = workingdir + '/' + config_filename + '_' + startDate.strftime('_du_%Y-%m-%d') + endDate.strftime('_au_%Y-%m-%d') + '.csv'
-    TICmeasures=get_TICmeasures_all(startDate, endDate)
-    outputTICmeasuresInCsv(TICmeasures, fullfilename)
-    # Export des mesures avec marquage des erreurs dans un autre fichier
-    # csv
-    TICerrors=get_TICerrors(TICmeasures)
-    fullfilename=workingdir + '/' + config_filename + '_' + startDate.strftime('_du_%Y-%m-%d') + endDate.strftime('_au_%Y-%m-%d') + '_erreurs.csv'
-    outputTICmeasuresInCsv(TICerrors, fullfilename)
+    errorsFullfilename=workingdir + '/' + config_filename + '_' + startDate.strftime('_du_%Y-%m-%d') + endDate.strftime('_au_%Y-%m-%d') + '_erreurs.csv'
+    outputTICmeasuresAndErrorsInCsv(iter_TICmeasures(startDate, endDate), fullfilename, errorsFullfilename)
     print('\nLes mesures sélectionnées ont été exportées, pour visualiser les erreurs et définir les corrections.')
 
     #
@@ -508,6 +1726,28 @@ def main():
     # Les prix sont à donner en euros
     # ---------------------------
 
+    # Corrections lues dans le fichier csv des corrections (si il est
+    # défini), avec un rapport avant / après exporté dans un fichier csv
+    if corrections_filename:
+        corrections = read_TICcorrections_csv(workingdir + '/' + corrections_filename + '.csv')
+        changes = plan_TICcorrections(corrections)
+        fullfilename = workingdir + '/' + config_filename + '_' + corrections_filename + '_rapport.csv'
+        outputTICcorrectionsInCsv(changes, fullfilename)
+        print(f'\n{len(changes)} modifications lues dans le fichier de corrections, rapport exporté dans le fichier {fullfilename}')
+        apply_TICcorrections(changes)
+
+    # Réparation des consommations horaires absentes (si un profil est
+    # défini), avec un rapport des réparations et un rapport avant /
+    # après exportés dans des fichiers csv
+    if repair_profile:
+        corrections, report = plan_TICabsent_repairs(repair_profile)
+        changes = plan_TICcorrections(corrections)
+        fullfilename = workingdir + '/' + config_filename + '_réparations.csv'
+        outputTICrepairsInCsv(report, fullfilename)
+        outputTICcorrectionsInCsv(changes, workingdir + '/' + config_filename + '_réparations_rapport.csv')
+        print(f'\n{len(corrections)} relevés horaires absents réparés, rapport exporté dans le fichier {fullfilename}')
+        apply_TICcorrections(changes)
+
     # Correction d'un index TIC courant (index et prix cumulé en euros)
 ##    # Exemple
 ##    update_current_TIC('HCJW', 222222, 111.11) # Nouvelles valeurs pour l'index courant HCJW
@@ -550,11 +1790,8 @@ def main():
     # Les prix visualisés sont en cents dans le csv
     print('\nExport des mesures sélectionnées dans un fichier csv...')
     fullfilename = workingdir + '/' + config_filename + '_' + startDate.strftime('_du_%Y-%m-%d') + endDate.strftime('_au_%Y-%m-%d') + '_après_correction.csv'
-    TICmeasures=get_TICmeasures_all(startDate, endDate)
-    outputTICmeasuresInCsv(TICmeasures, fullfilename)
-    TICerrors=get_TICerrors(TICmeasures)
-    fullfilename = workingdir + '/' + config_filename + '_' + startDate.strftime('_du_%Y-%m-%d') + endDate.strftime('_au_%Y-%m-%d') + '_erreurs_après_correction.csv'
-    outputTICmeasuresInCsv(TICerrors, fullfilename)
+    errorsFullfilename = workingdir + '/' + config_filename + '_' + startDate.strftime('_du_%Y-%m-%d') + endDate.strftime('_au_%Y-%m-%d') + '_erreurs_après_correction.csv'
+    outputTICmeasuresAndErrorsInCsv(iter_TICmeasures(startDate, endDate), fullfilename, errorsFullfilename)
     print('\nLes mesures sélectionnées ont été exportées, pour vérifier les corrections.')
     
     #
@@ -570,4 +1807,5 @@ def main():
         print('Restaurer la configuration globale manuellement dans l\'Ecodevice avec ce fichier.')
 
 
-main()
+if __name__ == '__main__':
+    main()
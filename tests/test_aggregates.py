@@ -0,0 +1,86 @@
+""" Tests des cumuls horaires de l'historique (globalconfigfile.py :
+TICAggregates), comparés à des sommes directes des valeurs horaires,
+avant et après des modifications de la configuration globale produite
+par gcegen.py.
+
+Utilisation :
+    python -m unittest discover tests
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import datetime
+import os
+import random
+import tempfile
+import unittest
+
+import gcegen
+import globalconfigfile as gcf
+
+days = 75 # du dimanche 1er janvier au 16 mars 2023
+
+@unittest.skipIf(gcf.np is None, 'numpy absent')
+class TICAggregatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        fullfilename = os.path.join(self.tempdir.name, 'system.gce')
+        gcegen.write_file(gcegen.generate_globalConf(days, cutRate=0.1, absentRate=0.02, seed=4), fullfilename)
+        gcf.load_globalConf_file(fullfilename, 'aucun')
+        self.addCleanup(gcf.close_globalConf_file)
+        self.aggregates = gcf.TICAggregates()
+        self.start = self.aggregates.start
+
+    # Retourne les valeurs horaires de tout l'historique, tableaux (heures, index TIC)
+    def hour_values(self):
+        first, last = gcf.history_date_range()
+        return [values.reshape(-1, gcf.TICCount) for values in gcf.TIC_hour_values(gcf.get_TIC_range(first, last))]
+
+    def assertSameAsSums(self):
+        values = self.hour_values()
+        rng = random.Random(len(values[0]))
+        intervals = [(0, len(values[0])), (0, 0), (23, 25)] + [sorted(rng.sample(range(len(values[0]) + 1), 2)) for _ in range(30)]
+        begin, end = (gcf.np.array(slots) for slots in zip(*intervals))
+        for sums, hourValues in zip(self.aggregates.slot_sums(begin, end), values):
+            for k, (first, last) in enumerate(intervals):
+                self.assertEqual(sums[k].tolist(), hourValues[first:last].sum(axis=0).tolist(), f'heures {first} à {last}')
+        for period, starts in ('semaine', [self.start] + [self.start + datetime.timedelta(days=d) for d in range(1, days, 7)]), \
+                              ('mois', [datetime.datetime(2023, month, 1) for month in (1, 2, 3)]):
+            rollup = self.aggregates.rollup(period)
+            self.assertEqual([row['période'] for row in rollup], starts)
+            bounds = [(date - self.start).days * 24 for date in starts] + [len(values[0])]
+            for k, row in enumerate(rollup):
+                for label, order in gcf.TIC_label_order.items():
+                    expected = tuple(int(hourValues[bounds[k]:bounds[k+1], order].sum()) for hourValues in values)
+                    self.assertEqual(row[label], expected, f'{period} {row["période"]:%Y-%m-%d} {label}')
+
+    def test_before_and_after_updates(self):
+        self.assertSameAsSums()
+        # heures modifiées sur deux jours consécutifs et un jour isolé
+        for date in (datetime.datetime(2023, 1, 31, 23), datetime.datetime(2023, 2, 1, 1), datetime.datetime(2023, 2, 20, 12)):
+            gcf.update_hour_TIC('HPJB', 1234, 1.5, date)
+        self.assertEqual(self.aggregates.dirtyDays, {29, 30, 31, 49, 50})
+        self.assertSameAsSums()
+        # heures absentes renseignées : nombre de valeurs manquantes changé
+        # pour la suite de l'historique
+        TICrange = gcf.get_TIC_range(*gcf.history_date_range())
+        absent = gcf.np.argwhere(TICrange['conso absente'] & TICrange['heure présente'][..., None])
+        self.assertGreater(len(absent), 2)
+        for day, hour, order in absent[:2]:
+            gcf.update_hour_TIC(list(gcf.TIC_label_order)[order], 10, 0.01, TICrange['dates'][day] + datetime.timedelta(hours=int(hour) + 1))
+        self.assertSameAsSums()
+        self.assertEqual(self.aggregates.dirtyDays, set())
+        # index quotidien modifié : consommation 23h-00h de la veille changée
+        gcf.update_day_TIC('HCJW', 99999999, 1000, datetime.datetime(2023, 3, 6))
+        self.assertSameAsSums()
+        # en-tête de jour modifié : cumuls reconstruits
+        position = gcf.arrGlobalConf.datePosition(datetime.datetime(2023, 3, 16))
+        gcf.set_bytes(b'\xff\xff\xff\xff', position)
+        self.assertTrue(self.aggregates.stale)
+        self.assertSameAsSums()
+
+if __name__ == '__main__':
+    unittest.main()
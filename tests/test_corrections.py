@@ -0,0 +1,128 @@
+""" Tests des corrections à partir d'un fichier csv (globalconfigfile.py :
+read_TICcorrections_csv, plan_TICcorrections, apply_TICcorrections),
+sur une configuration globale produite par gcegen.py.
+
+Utilisation :
+    python -m unittest discover tests
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import csv
+import datetime
+import os
+import tempfile
+import unittest
+
+import gcegen
+import globalconfigfile as gcf
+
+header = 'Index TIC;Relevé;Fin;Valeur;Prix\n'
+
+class TICcorrectionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.fullfilename = self.path('system.gce')
+        gcegen.write_file(gcegen.generate_globalConf(30), self.fullfilename)
+        gcf.load_globalConf_file(self.fullfilename, 'aucun')
+        self.addCleanup(gcf.close_globalConf_file)
+
+    def path(self, filename):
+        return os.path.join(self.tempdir.name, filename)
+
+    def write_csv(self, rows):
+        fullfilename = self.path('corrections.csv')
+        with open(fullfilename, 'w', newline='') as csvfile:
+            csvfile.write(header + ''.join(row + '\n' for row in rows))
+        return fullfilename
+
+    def test_read(self):
+        corrections = gcf.read_TICcorrections_csv(self.write_csv([
+            'HCJW;courant;;222222;111,11',
+            'HPJB;2023-01-05;;8351707;808.75',
+            '',
+            'HCJR;2023-01-05 04:00;;1522;1.08',
+            'HCJB;2023-01-06 00:00;;5000;2']))
+        self.assertEqual([(c['ligne'], c['index TIC'], c['relevé'], c['date'], c['valeur'], c['prix']) for c in corrections], [
+            (2, 'HCJW', 'courant', None, 222222, 11111),
+            (3, 'HPJB', 'jour', datetime.datetime(2023, 1, 5), 8351707, 80875),
+            (5, 'HCJR', 'heure', datetime.datetime(2023, 1, 5, 4), 1522, 108),
+            (6, 'HCJB', 'jour', datetime.datetime(2023, 1, 6), 5000, 200)])
+
+    def test_read_range(self):
+        corrections = gcf.read_TICcorrections_csv(self.write_csv(['HPJB;2023-01-10;2023-01-12;8351707;808.75']))
+        self.assertEqual([c['date'] for c in corrections], [datetime.datetime(2023, 1, day) for day in (10, 11, 12)])
+        self.assertTrue(all(c['ligne'] == 2 and c['relevé'] == 'jour' for c in corrections))
+
+    def test_read_errors(self):
+        with self.assertRaises(Exception) as context:
+            gcf.read_TICcorrections_csv(self.write_csv([
+                'HCJW;courant;;222222',
+                'XXXX;courant;;1;1',
+                'HCJW;courant;;1;1.001',
+                'HCJW;2023-01-05 04:30;;1;1',
+                'HCJW;2023-01-05 04:00;2023-01-06;1;1',
+                'HCJW;2023-01-05;2023-01-04;1;1',
+                'HCJW;courant;;abc;1',
+                'HCJW;courant;;1;1']))
+        message = str(context.exception)
+        for line in range(2, 9):
+            self.assertIn(f'ligne {line} :', message)
+        self.assertNotIn('ligne 9 :', message)
+
+    def test_plan_errors(self):
+        corrections = gcf.read_TICcorrections_csv(self.write_csv([
+            'HPJB;2024-06-01;;1;1',
+            'HCJR;2023-01-05 04:00;;70000;1',
+            'HPJB;2023-01-05;;1;1',
+            'HPJB;2023-01-03;2023-01-06;2;2']))
+        with self.assertRaises(Exception) as context:
+            gcf.plan_TICcorrections(corrections)
+        message = str(context.exception)
+        self.assertIn('ligne 2 : 2024-06-01 absent de l\'historique', message)
+        self.assertIn('ligne 3 : conso 70000 hors limites', message)
+        self.assertIn('lignes 4 et 5 : corrections du même relevé', message)
+        self.assertEqual(message.count('corrections du même relevé'), 1)
+
+    def test_report(self):
+        date = datetime.datetime(2023, 1, 5)
+        before = gcf.get_day_TIC('HPJB', date)
+        changes = gcf.plan_TICcorrections(gcf.read_TICcorrections_csv(self.write_csv(['HPJB;2023-01-05;;8351707;808.75'])))
+        self.assertEqual([change['position'] for change in changes], sorted(change['position'] for change in changes))
+        fullfilename = self.path('rapport.csv')
+        gcf.outputTICcorrectionsInCsv(changes, fullfilename)
+        with open(fullfilename, newline='') as csvfile:
+            rows = list(csv.reader(csvfile, delimiter=';'))
+        self.assertEqual(rows, [['Ligne', 'Relevé', 'Index TIC', 'Champ', 'Avant', 'Après'],
+                                ['2', '2023-01-05 00:00', 'HPJB', 'index', str(before[0]), '8351707'],
+                                ['2', '2023-01-05 00:00', 'HPJB', 'cumul prix', str(before[1]), '80875']])
+        self.assertEqual(gcf.get_day_TIC('HPJB', date), before) # rien n'est écrit avant apply_TICcorrections
+
+    def test_apply_same_as_updates(self):
+        rows = ['HPJB;2023-01-05;;8351707;808.75',
+                'HCJW;2023-01-10;2023-01-11;222222;111.25',
+                'HCJR;2023-01-05 04:00;;1522;1.08',
+                'HPJW;2023-01-20 23:00;;0;0']
+        gcf.apply_TICcorrections(gcf.plan_TICcorrections(gcf.read_TICcorrections_csv(self.write_csv(rows))))
+        self.assertEqual(gcf.get_day_TIC('HPJB', datetime.datetime(2023, 1, 5)), (8351707, 80875))
+        self.assertEqual(gcf.get_day_TIC('HCJW', datetime.datetime(2023, 1, 11)), (222222, 11125))
+        self.assertEqual(gcf.get_hour_TIC('HCJR', datetime.datetime(2023, 1, 5, 4)), (1522, 108))
+        gcf.write_globalConf_file(self.path('corrigé.gce'))
+
+        gcf.load_globalConf_file(self.fullfilename, 'aucun')
+        gcf.update_day_TIC('HPJB', 8351707, 808.75, datetime.datetime(2023, 1, 5))
+        gcf.update_multiple_days_TIC('HCJW', 222222, 111.25, datetime.datetime(2023, 1, 10), datetime.datetime(2023, 1, 11))
+        gcf.update_hour_TIC('HCJR', 1522, 1.08, datetime.datetime(2023, 1, 5, 4))
+        gcf.update_hour_TIC('HPJW', 0, 0, datetime.datetime(2023, 1, 20, 23))
+        gcf.write_globalConf_file(self.path('modifié.gce'))
+
+        with open(self.path('corrigé.gce'), 'rb') as corrected, open(self.path('modifié.gce'), 'rb') as updated, open(self.fullfilename, 'rb') as original:
+            corrected, updated, original = corrected.read(), updated.read(), original.read()
+        self.assertEqual(corrected, updated)
+        self.assertNotEqual(corrected, original)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+""" Tests de l'archive dédupliquée des sauvegardes (gcearchive.py), sur
+des configurations produites par gcegen.py.
+
+Utilisation :
+    python -m unittest discover tests
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import datetime
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import gcearchive
+import gcegen
+
+class ArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+    def path(self, *names):
+        return os.path.join(self.tempdir.name, *names)
+
+    # Ecrit une configuration globale dans le dossier d'un Ecodevice
+    def write_device_file(self, device, days, seed):
+        os.makedirs(self.path(device), exist_ok=True)
+        fullfilename = self.path(device, 'system.gce')
+        gcegen.write_file(gcegen.generate_globalConf(days, seed=seed), fullfilename)
+        return fullfilename
+
+    def test_same_name_from_two_devices(self):
+        archive = gcearchive.open_archive(self.path('archive.sqlite'))
+        self.addCleanup(archive.close)
+        maison = self.write_device_file('maison', 10, 1)
+        atelier = self.write_device_file('atelier', 12, 2)
+        self.assertIsNotNone(gcearchive.ingest(archive, maison, snapshotTime=datetime.datetime(2024, 1, 1)))
+        self.assertIsNotNone(gcearchive.ingest(archive, atelier, snapshotTime=datetime.datetime(2024, 1, 2)))
+        self.assertIsNone(gcearchive.ingest(archive, atelier)) # même contenu
+        self.assertEqual(archive.execute('SELECT COUNT(*) FROM snapshots WHERE name = ?', ('system',)).fetchone()[0], 2)
+        gcearchive.restore_snapshot(archive, 'system', self.path('restauré.gce'))
+        with open(self.path('restauré.gce'), 'rb') as restored, open(atelier, 'rb') as original:
+            self.assertEqual(restored.read(), original.read())
+
+    def test_archive_with_unique_names(self):
+        fullfilename = self.path('archive.sqlite')
+        archive = sqlite3.connect(fullfilename)
+        archive.execute('CREATE TABLE snapshots (id INTEGER PRIMARY KEY, name TEXT UNIQUE, kind TEXT, size INTEGER, sha256 BLOB UNIQUE, time TEXT, ingested TEXT)')
+        archive.execute('INSERT INTO snapshots VALUES (1, ?, ?, 0, ?, ?, ?)', ('system', 'globale', b'x', '2023-01-01T00:00:00', '2023-01-01T00:00:00'))
+        archive.commit()
+        archive.close()
+        archive = gcearchive.open_archive(fullfilename)
+        self.addCleanup(archive.close)
+        self.assertIsNotNone(gcearchive.ingest(archive, self.write_device_file('maison', 5, 3)))
+        self.assertEqual(archive.execute('SELECT id, name FROM snapshots ORDER BY id').fetchall(), [(1, 'system'), (2, 'system')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+""" Tests de la reprise des téléchargements (gcedownload.py) sur le
+simulateur de l'Ecodevice (ecodevice_simulator.py).
+
+Utilisation :
+    python -m unittest discover tests
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import os
+import tempfile
+import unittest
+
+import ecodevice_simulator
+import gcedownload
+
+class DownloadResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.content = bytes(range(256)) * 1000
+        self.server = ecodevice_simulator.start_simulator(files={'system': self.content})
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/admin/download/system.gce'
+        self.fullfilename = os.path.join(self.tempdir.name, 'system.gce')
+        self.partfilename = self.fullfilename + gcedownload.partialSuffix
+
+    def write_part(self, content):
+        with open(self.partfilename, 'wb') as outfile:
+            outfile.write(content)
+
+    def read_file(self):
+        with open(self.fullfilename, 'rb') as infile:
+            return infile.read()
+
+    def test_resume_interrupted_run(self):
+        self.write_part(self.content[:100000])
+        gcedownload.download_gce(self.url, self.fullfilename)
+        self.assertEqual(self.read_file(), self.content)
+        self.assertFalse(os.path.exists(self.partfilename))
+        self.assertEqual(self.server.take_stats()['octets envoyés'], len(self.content) - 100000)
+
+    def test_complete_part(self):
+        self.write_part(self.content)
+        gcedownload.download_gce(self.url, self.fullfilename)
+        self.assertEqual(self.read_file(), self.content)
+
+    def test_part_longer_than_file(self):
+        self.write_part(self.content + b'\x00' * 10)
+        gcedownload.download_gce(self.url, self.fullfilename)
+        self.assertEqual(self.read_file(), self.content)
+
+    def test_invalid_part_removed(self):
+        self.write_part(b'\x00' * 100000)
+        def validate(partfilename):
+            with open(partfilename, 'rb') as infile:
+                if infile.read() != self.content:
+                    raise Exception('contenu différent')
+        with self.assertRaises(Exception):
+            gcedownload.download_gce(self.url, self.fullfilename, validate)
+        self.assertFalse(os.path.exists(self.partfilename))
+        gcedownload.download_gce(self.url, self.fullfilename, validate)
+        self.assertEqual(self.read_file(), self.content)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+""" Tests des patchs de configuration globale (gcepatch.py : diff,
+lecture et écriture, application avec conflits), sur des
+configurations produites par gcegen.py.
+
+Utilisation :
+    python -m unittest discover tests
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import datetime
+import os
+import tempfile
+import unittest
+import zlib
+
+import gcegen
+import gcepatch
+import globalconfigfile as gcf
+
+class PatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.old = gcegen.generate_globalConf(20, capacity=25)
+        self.new = bytearray(self.old)
+        self.date = datetime.date(2023, 1, 5)
+        self.dayPosition = gcf.historyPosition + 4 * gcf.dayByteLength
+        self.position = self.dayPosition + gcf.hour00ByteLength + 9 * gcf.hourByteLength + gcf.TICHourConsPriceOffset
+        self.new[self.position:self.position+4] = b'\x01\x02\x03\x04' # 10:00 Inactif conso et prix
+        self.new[gcf.TICCurrentIndexPosition:gcf.TICCurrentIndexPosition+4] = b'\x00\x00\x10\x00'
+
+    def path(self, filename):
+        return os.path.join(self.tempdir.name, filename)
+
+    def test_round_trip(self):
+        patch = gcepatch.diff_globalConf(self.old, self.new)
+        self.assertEqual(patch['jours remplacés'], {})
+        descriptions = [run['description'] for block in patch['blocs'] for run in block['modifications']]
+        self.assertEqual(descriptions, ['courant Inactif index', '2023-01-05 10:00 Inactif conso'])
+        gcepatch.write_patch(patch, self.path('p.gcp'))
+        read = gcepatch.read_patch(self.path('p.gcp'))
+        self.assertEqual(read['blocs'], patch['blocs'])
+        self.assertEqual(read['empreinte après'], patch['empreinte après'])
+        result = bytearray(self.old)
+        self.assertEqual(gcepatch.apply_patch(read, result), [])
+        self.assertEqual(result, self.new)
+        # sur un fichier plus récent (autre jour modifié) : zones appliquées sans conflit
+        other = bytearray(self.old)
+        other[self.dayPosition + 100] ^= 0xFF
+        self.assertEqual(gcepatch.apply_patch(read, other), [])
+        self.assertEqual(other[self.position:self.position+4], b'\x01\x02\x03\x04')
+        # patch déjà appliqué : sans conflit
+        self.assertEqual(gcepatch.apply_patch(read, result), [])
+        self.assertEqual(result, self.new)
+
+    def test_conflicts(self):
+        patch = gcepatch.diff_globalConf(self.old, self.new)
+        base = bytearray(self.old)
+        base[self.position+1] = 0x55 # relevé modifié depuis
+        unchanged = bytes(base)
+        with self.assertRaises(Exception) as context:
+            gcepatch.apply_patch(patch, base)
+        self.assertIn('2023-01-05 10:00 Inactif conso', str(context.exception))
+        self.assertEqual(base, unchanged) # rien n'est appliqué
+        conflicts = gcepatch.apply_patch(patch, base, force=True)
+        self.assertEqual([run['description'] for run in conflicts], ['2023-01-05 10:00 Inactif conso'])
+        self.assertEqual(base, self.new)
+        with self.assertRaises(Exception):
+            gcepatch.apply_patch(patch, bytearray(len(self.old) + gcf.dayByteLength))
+
+    def test_read_not_a_patch(self):
+        gcepatch.write_patch(gcepatch.diff_globalConf(self.old, self.new), self.path('p.gcp'))
+        with open(self.path('p.gcp'), 'rb') as infile:
+            content = infile.read()
+        body = zlib.decompress(content[len(gcepatch.patchMagic)+1:])
+        header = gcepatch.patchMagic + bytes([gcepatch.patchVersion])
+        for name, data in (('vide', b''),
+                           ('entête', gcepatch.patchMagic),
+                           ('version', header),
+                           ('autre version', gcepatch.patchMagic + bytes([gcepatch.patchVersion + 1]) + content[len(header):]),
+                           ('compression', header + b'xxxx'),
+                           ('tronqué', content[:-5]),
+                           ('corps tronqué', header + zlib.compress(body[:-3])),
+                           ('corps trop long', header + zlib.compress(body + b'\x00')),
+                           ('position hors fichier', header + zlib.compress(b'\x00\x00\x00\x10' + body[4:]))):
+            with self.subTest(name):
+                with open(self.path('x.gcp'), 'wb') as outfile:
+                    outfile.write(data)
+                with self.assertRaises(Exception) as context:
+                    gcepatch.read_patch(self.path('x.gcp'))
+                self.assertIn('n\'est pas un patch', str(context.exception))
+
+    def test_replaced_days(self):
+        new = bytearray(self.old)
+        new[self.dayPosition:self.dayPosition+4] = gcf.dateAsBytes(datetime.date(2023, 2, 1)) # jour remplacé
+        empty = gcf.historyPosition + 22 * gcf.dayByteLength
+        new[empty:empty+4] = gcf.dateAsBytes(datetime.date(2023, 1, 21)) # nouveau jour dans un emplacement vide
+        patch = gcepatch.diff_globalConf(self.old, new)
+        self.assertEqual(patch['jours remplacés'], {self.dayPosition: ('2023-01-05', '2023-02-01')})
+        descriptions = [run['description'] for block in patch['blocs'] for run in block['modifications']]
+        self.assertEqual(descriptions, ['2023-02-01 en-tête du jour (remplace le 2023-01-05)', '2023-01-21 en-tête du jour'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+""" Tests des index des positions des jours et des heures de
+l'historique (globalconfigfile.py : GlobalConfig.datePosition et
+dateTimePosition), comparés aux recherches séquentielles d'origine, y
+compris après des modifications des en-têtes de jour et d'heure.
+
+Utilisation :
+    python -m unittest discover tests
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import datetime
+import os
+import random
+import tempfile
+import unittest
+
+import gcegen
+import globalconfigfile as gcf
+
+days = 40
+
+# Recherche séquentielle d'origine de la position d'une date
+def scan_date_position(globalConf, date):
+    position = gcf.historyPosition
+    bDatetime = gcf.dateAsBytes(date)
+    found = globalConf[position:position+len(bDatetime)] == bDatetime
+    while not found and position < len(globalConf):
+        position = position + gcf.dayByteLength
+        found = globalConf[position:position+len(bDatetime)] == bDatetime
+    return position if found else -1
+
+# Recherche séquentielle d'origine de la position d'une date et heure
+def scan_datetime_position(globalConf, date):
+    dayPosition = scan_date_position(globalConf, date)
+    if dayPosition == -1:
+        return -1
+    bDatetime = gcf.dateTimeAsBytes(date)
+    position = dayPosition + gcf.hour00ByteLength
+    found = globalConf[position:position+len(bDatetime)] == bDatetime
+    while not found and position < dayPosition + gcf.dayByteLength:
+        position = position + gcf.hourByteLength
+        found = globalConf[position:position+len(bDatetime)] == bDatetime
+    return position if found else -1
+
+class PositionIndexesTest(unittest.TestCase):
+
+    def setUp(self):
+        content = gcegen.generate_globalConf(days, missingDayRate=0.05, cutRate=0.2, capacity=days + 3, seed=5)
+        # jour en double dans un emplacement libre (la première occurrence est retenue)
+        first = gcf.historyPosition + 7 * gcf.dayByteLength
+        free = len(content) - gcf.dayByteLength
+        content[free:] = content[first:first+gcf.dayByteLength]
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        fullfilename = os.path.join(self.tempdir.name, 'system.gce')
+        gcegen.write_file(content, fullfilename)
+        self.globalConf = gcf.GlobalConfig(fullfilename)
+        self.addCleanup(self.globalConf.close)
+        start = datetime.datetime.combine(gcegen.defaultStartDate, datetime.time())
+        self.dates = [start + datetime.timedelta(days=k) for k in range(-2, days + 2)]
+
+    def assertSameAsScan(self, dates=None):
+        for date in dates or self.dates:
+            self.assertEqual(self.globalConf.datePosition(date), scan_date_position(self.globalConf, date), f'{date:%Y-%m-%d}')
+            for hour in range(24):
+                moment = date.replace(hour=hour)
+                self.assertEqual(self.globalConf.dateTimePosition(moment), scan_datetime_position(self.globalConf, moment), f'{moment:%Y-%m-%d %H:00}')
+
+    def test_same_as_scan(self):
+        self.assertSameAsScan()
+        self.assertNotEqual(self.globalConf.datePosition(self.dates[9]), -1)
+        self.assertEqual(self.globalConf.datePosition(self.dates[0]), -1)
+
+    def test_build_indexes_same_as_scan(self):
+        self.globalConf.build_indexes()
+        self.assertSameAsScan()
+
+    def test_day_header_write(self):
+        date, other = self.dates[10], datetime.datetime(2030, 6, 1)
+        position = self.globalConf.datePosition(date)
+        self.globalConf[position:position+4] = gcf.dateAsBytes(other)
+        self.assertEqual(self.globalConf.datePosition(date), -1)
+        self.assertEqual(self.globalConf.datePosition(other), position)
+        self.assertSameAsScan()
+        # modification à cheval sur la fin du jour précédent et l'en-tête
+        position = self.globalConf.datePosition(self.dates[12])
+        self.globalConf[position-2:position+2] = b'\x00\x00\x00\x00'
+        self.assertEqual(self.globalConf.datePosition(self.dates[12]), -1)
+        self.assertSameAsScan()
+
+    def test_hour_header_write(self):
+        date = self.dates[15]
+        position = self.globalConf.dateTimePosition(date.replace(hour=10))
+        self.assertNotEqual(position, -1)
+        self.globalConf[position+3:position+4] = b'\x0b' # en-tête de 10h devenu 11h
+        self.assertEqual(self.globalConf.dateTimePosition(date.replace(hour=10)), -1)
+        self.assertSameAsScan([date])
+        # en-tête de 10h recopié à une autre position du jour
+        position = self.globalConf.dateTimePosition(date.replace(hour=20))
+        self.globalConf[position-1:position+4] = b'\x00' + gcf.dateTimeAsBytes(date.replace(hour=10))
+        self.assertEqual(self.globalConf.dateTimePosition(date.replace(hour=10)), position)
+        self.assertSameAsScan([date])
+
+    def test_value_write_keeps_indexes(self):
+        date = self.dates[20]
+        self.globalConf.dateTimePosition(date.replace(hour=5))
+        dayIndex = self.globalConf.dayIndex
+        position = self.globalConf.dateTimePosition(date.replace(hour=5)) + gcf.TICHourConsPriceOffset
+        self.globalConf[position:position+4] = b'\x00\x01\x00\x02'
+        self.assertIs(self.globalConf.dayIndex, dayIndex)
+        self.assertIn(self.globalConf.datePosition(date), self.globalConf.hourIndex)
+
+    def test_random_writes(self):
+        rng = random.Random(1)
+        self.globalConf.build_indexes()
+        for k in range(150):
+            day = rng.randrange(days)
+            dayPosition = gcf.historyPosition + day * gcf.dayByteLength
+            header = rng.choice([0] + [gcf.hour00ByteLength + hour * gcf.hourByteLength for hour in range(23)])
+            position = dayPosition + header + rng.randint(-3, 3)
+            length = rng.randint(1, 6)
+            if rng.random() < 0.5:
+                value = bytes(rng.randrange(256) for _ in range(length))
+            else: # en-tête d'un autre jour ou d'une autre heure
+                value = (gcf.dateTimeAsBytes(rng.choice(self.dates).replace(hour=rng.randrange(24))) * 2)[:length]
+            self.globalConf[position:position+length] = value
+            self.assertSameAsScan(rng.sample(self.dates, 3))
+        self.assertSameAsScan()
+
+if __name__ == '__main__':
+    unittest.main()
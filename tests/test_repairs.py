@@ -0,0 +1,95 @@
+""" Tests de la réparation des consommations horaires absentes
+(globalconfigfile.py : plan_TICabsent_repairs), sur une configuration
+globale produite par gcegen.py.
+
+Utilisation :
+    python -m unittest discover tests
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import datetime
+import os
+import tempfile
+import unittest
+
+import gcegen
+import globalconfigfile as gcf
+
+days = 60
+negativeDay = 10 # jour dont le reste 23h-00h est rendu négatif
+lastDay = days - 1 # jour sans jour suivant
+
+@unittest.skipIf(gcf.np is None, 'numpy absent')
+class TICabsentRepairsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.fullfilename = os.path.join(self.tempdir.name, 'system.gce')
+        gcegen.write_file(gcegen.generate_globalConf(days, cutRate=0.1, absentRate=0.03, seed=3), self.fullfilename)
+        self.addCleanup(gcf.close_globalConf_file)
+
+    # Charge le fichier et y ajoute des heures absentes sur un jour sans
+    # jour suivant et sur un jour dont le reste 23h-00h est négatif
+    def load(self):
+        gcf.load_globalConf_file(self.fullfilename, 'aucun')
+        start = datetime.datetime.combine(gcegen.defaultStartDate, datetime.time())
+        for day, hour in (lastDay, 5), (negativeDay, 3):
+            date = start + datetime.timedelta(days=day, hours=hour)
+            for label in gcf.TIC_label_order:
+                for position in gcf.positionsOfHourTIC(label, date):
+                    gcf.set_bytes(gcf.absentValue.to_bytes(gcf.TICHourConsOrPriceLength, byteorder='big'), position)
+        for label in gcf.TIC_label_order:
+            gcf.update_hour_TIC(label, 60000, 0, start + datetime.timedelta(days=negativeDay, hours=8))
+
+    def history(self):
+        first, last = gcf.history_date_range()
+        return gcf.get_TIC_range(first, last)
+
+    def test_profiles(self):
+        for profile in gcf.TICrepairProfiles:
+            with self.subTest(profile=profile):
+                self.load()
+                before = self.history()
+                corrections, report = gcf.plan_TICabsent_repairs(profile)
+                gcf.apply_TICcorrections(gcf.plan_TICcorrections(corrections))
+                after = self.history()
+                labels = list(gcf.TIC_label_order)
+                dates = before['dates']
+                self.assertTrue(corrections)
+                for correction in corrections:
+                    day, order = dates.index(correction['date'].replace(hour=0)), labels.index(correction['index TIC'])
+                    self.assertTrue(before['conso absente'][day, correction['date'].hour - 1, order])
+                repaired = 0
+                for row in report:
+                    day, order = dates.index(row['jour']), labels.index(row['index TIC'])
+                    self.assertEqual(row['heures absentes'], before['conso absente'][day, :, order].sum())
+                    if row['état'].startswith('réparé'):
+                        repaired += 1
+                        # les heures réparées et le reste 23h-00h font la consommation du jour
+                        self.assertFalse(after['conso absente'][day, :, order].any())
+                        self.assertEqual(after['conso jour'][day, order], before['conso jour'][day, order])
+                        self.assertEqual(after['somme conso'][day, order] - before['somme conso'][day, order], row['conso répartie'])
+                        self.assertEqual(after['somme conso'][day, order] + after['conso 00'][day, order], after['conso jour'][day, order])
+                        self.assertGreaterEqual(after['conso 00'][day, order], 0)
+                        self.assertGreaterEqual(after['prix 00'][day, order], 0)
+                    else:
+                        self.assertEqual(row['conso répartie'], 0)
+                        self.assertTrue((after['conso absente'][day, :, order] == before['conso absente'][day, :, order]).all())
+                        self.assertTrue((after['conso'][day, :, order] == before['conso'][day, :, order]).all())
+                self.assertGreater(repaired, 0)
+                states = {(dates.index(row['jour']), row['index TIC']): row['état'] for row in report}
+                for label in labels:
+                    self.assertEqual(states[lastDay, label], 'non réparé (jour suivant absent)')
+                    self.assertEqual(states[negativeDay, label], 'non réparé (reste 23h-00h négatif)')
+                self.assertFalse([c for c in corrections if c['date'].date() in (dates[lastDay].date(), dates[negativeDay].date())])
+
+    def test_unknown_profile(self):
+        self.load()
+        with self.assertRaises(Exception):
+            gcf.plan_TICabsent_repairs('linéaire')
+
+if __name__ == '__main__':
+    unittest.main()
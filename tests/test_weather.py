@@ -0,0 +1,70 @@
+""" Tests du décodage des données météo d'un fichier de configuration
+(weather.py), sur des contenus produits par gcegen.py.
+
+Utilisation :
+    python -m unittest discover tests
+
+Publié sur https://github.com/nobleval
+@Author: nobleval
+"""
+
+import datetime
+import unittest
+
+import gcegen
+import weather
+
+@unittest.skipIf(weather.np is None, 'numpy absent')
+class DecodeWeatherTest(unittest.TestCase):
+
+    def test_complete_file(self):
+        content = gcegen.generate_config(48, datetime.date(2024, 1, 1))
+        decoded = weather.decodeWeatherFromConfigFile(content)
+        self.assertEqual(len(decoded['Heure']), 48)
+        self.assertEqual(str(decoded['Heure'][0]), '2024-01-01T00')
+        self.assertEqual(len(weather.weatherRows(decoded)), 48)
+
+    def test_file_truncated_before_weather(self):
+        content = gcegen.generate_config(48, datetime.date(2024, 1, 1))[:weather.weatherPosition - 100]
+        decoded = weather.decodeWeatherFromConfigFile(content)
+        self.assertEqual(list(decoded), ['Heure'] + list(weather.weatherField.values()))
+        self.assertEqual(decoded['Heure'].dtype, weather.np.dtype('datetime64[h]'))
+        for field in weather.weatherField.values():
+            self.assertEqual(len(decoded[field]), 0)
+            self.assertEqual(decoded[field].dtype.kind, 'i' if field.endswith('Lum') else 'f')
+        self.assertEqual(weather.weatherRows(decoded), [])
+
+    def test_file_truncated_inside_weather(self):
+        content = gcegen.generate_config(48, datetime.date(2024, 1, 1))
+        content = content[:weather.weatherPosition + 10 * weather.weatherHourLength + 5]
+        decoded = weather.decodeWeatherFromConfigFile(content)
+        self.assertEqual(len(decoded['Heure']), 10)
+
+class ParseGraphDataTest(unittest.TestCase):
+
+    def test_values(self):
+        self.assertEqual(weather.parseGraphData('[12.5,13,null,-2,1e2]'), [12.5, 13, None, -2, 100.0])
+        self.assertEqual(weather.parseGraphData([12.5, 13, None]), [12.5, 13, None])
+        self.assertEqual(weather.parseGraphData('[]'), [])
+
+    def test_empty_values(self):
+        self.assertEqual(weather.parseGraphData('[12.5,,13, ,null]'), [12.5, None, 13, None, None])
+        # virgule finale : pas d'heure en plus
+        self.assertEqual(weather.parseGraphData('[12.5,13,]'), [12.5, 13])
+        self.assertEqual(weather.parseGraphData('[12.5,,13,,, ]'), [12.5, None, 13])
+        self.assertEqual(weather.parseGraphData('[,]'), [])
+
+    def test_bad_values(self):
+        # seules les valeurs non conformes sont perdues
+        self.assertEqual(weather.parseGraphData('[12.5,abc,13,NaN,Infinity,"14",1.2.3]'), [12.5, None, 13, None, None, None, None])
+        self.assertEqual(weather.parseGraphData('[12.5,,x,]'), [12.5, None, None])
+        self.assertEqual(weather.parseGraphData([12.5, 'abc', True, 13]), [12.5, None, None, 13])
+
+    def test_not_a_list(self):
+        for data in ('12.5,13', '{"a":1}', '', 12, None):
+            with self.subTest(data=data):
+                with self.assertRaises(ValueError):
+                    weather.parseGraphData(data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,11 +10,23 @@ Publié sur https://github.com/nobleval
 @Author: nobleval
 """
 
-import requests
 import json
 import datetime
-import ast
+import re
 import csv
+import time
+import threading
+import concurrent.futures
+import sqlite3
+import os
+
+import gcedownload
+import gcestats
+
+try:
+    import numpy as np # optionnel, uniquement pour le décodage par tableaux
+except ImportError:
+    np = None
 
 #
 # Données personnelles à modifier
@@ -33,6 +45,10 @@ workingdir= 'D:/My Documents/~Perso/2023/gce config'
 # historique)
 existing_filename = 'config_2024-01-30T15-31-26'
 
+# Nom du fichier (dans le répertoire de travail) du cache local des
+# données météo récupérées depuis l'Ecodevice
+weatherCache_filename = 'cache_meteo.sqlite'
+
 #
 # Autres données
 #
@@ -43,6 +59,22 @@ weatherField={'200': 'X-THL 0 Temp', '201': 'X-THL 0 Hum', '202': 'X-THL 0 Lum',
 # Configuration seule ou configuration globale
 configAPI={'config': 'config', 'global': 'system'}
 
+# Requêtes vers l'Ecodevice (à garder modérées pour ne pas surcharger son
+# serveur web) : nombre maximum de requêtes simultanées, délai minimum
+# entre deux requêtes (en secondes), nombre de nouvelles tentatives en
+# cas d'échec et délai avant la première nouvelle tentative (doublé
+# ensuite), délais maximum de connexion et de réponse (en secondes)
+maxConcurrentRequests = 3
+minRequestInterval = 0.05
+requestRetries = 3
+retryBackoff = 1.0
+requestTimeout = (5, 30)
+
+# Délai après la fin d'une période de 3 jours au-delà duquel ses données
+# ne changent plus (la période est alors conservée dans le cache local
+# sans être redemandée à l'Ecodevice)
+finalDelay = datetime.timedelta(days=2)
+
 #
 # Fonctions pour extraire les données météo depuis le fichier de
 # configuration
@@ -67,14 +99,67 @@ def hourFromBytes(hourPosition):
     hour = int.from_bytes(arrConfig[hourPosition+3:hourPosition+4], byteorder='big')
     try:
         h = datetime.datetime(year,month,day,hour,0)
-    except:
+    except ValueError:
         # absence d'heure ("trou" possible ou fin des mesures ?)
         # heure arbitraire retournée 01/01/2000 00:00
         return datetime.datetime(2000,1,1,0,0)
     return h
 
+# Retourne les données météo du fichier de configuration sous forme de
+# colonnes (nécessite numpy) : 'Heure' (tableau datetime64 par heure) et
+# un tableau par champ météo (réels pour Temp et Hum, entiers pour Lum).
+# Les enregistrements sont décodés jusqu'à la première heure absente ou
+# invalide (considérée comme la fin des mesures). Le contenu lu est
+# celui chargé par le script, sauf si un autre contenu (bytearray ou
+# mmap) est donné
+def decodeWeatherFromConfigFile(config=None):
+    config = arrConfig if config is None else config
+    count = max(0, (len(config) - weatherPosition) // weatherHourLength)
+    if count == 0: # fichier tronqué avant les données météo
+        weather = {'Heure': np.array([], dtype='datetime64[h]')}
+        for field in weatherField.values():
+            weather[field] = np.array([], dtype=np.int64 if field.endswith('Lum') else np.float64)
+        return weather
+    records = np.frombuffer(config, dtype=np.uint8, count=count * weatherHourLength, offset=weatherPosition).reshape(count, weatherHourLength)
+    header = records[:, :4].astype(np.int64)
+    year, month, day, hour = 2000 + header[:, 0], header[:, 1], header[:, 2], header[:, 3]
+    months = (year - 1970) * 12 + np.clip(month, 1, 12) - 1
+    firstDay = months.astype('datetime64[M]').astype('datetime64[D]')
+    monthLength = ((months + 1).astype('datetime64[M]').astype('datetime64[D]') - firstDay).astype(np.int64)
+    valid = (year > 2000) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= monthLength) & (hour <= 23)
+    end = count if valid.all() else int(np.argmin(valid))
+    if gcestats.enabled:
+        gcestats.count('décodage : heures météo', end)
+        gcestats.count('décodage : octets météo', end * weatherHourLength)
+    weather = {}
+    weather['Heure'] = (firstDay[:end] + (day[:end] - 1)).astype('datetime64[h]') + hour[:end]
+    values = records[:end, dataOffset:dataOffset + len(weatherField) * dataLength].view('>u2').astype(np.int64)
+    for column, field in enumerate(weatherField.values()):
+        value = values[:, column]
+        if field.endswith('Temp'):
+            weather[field] = (value * 175.72)/65535 - 46.85
+        if field.endswith('Hum'):
+            weather[field] = (value * 125)/65535 - 6
+        if field.endswith('Lum'):
+            weather[field] = value
+    return weather
+
+# Retourne la liste des données météo par heure (pour l'export csv), à
+# partir des données météo sous forme de colonnes
+def weatherRows(weather):
+    hours = [f'{hour.replace("T", " ")}:00' for hour in np.datetime_as_string(weather['Heure'], unit='h')]
+    columns = {}
+    for field in weatherField.values():
+        if field.endswith('Lum'):
+            columns[field] = weather[field].tolist()
+        else:
+            columns[field] = [f'{value:.2f}' for value in weather[field].tolist()]
+    return [dict(Heure=hour, **{field: values[k] for field, values in columns.items()}) for k, hour in enumerate(hours)]
+
 # Retourne la liste des données météo par heure
 def getWeatherFromConfigFile():
+    if np is not None:
+        return weatherRows(decodeWeatherFromConfigFile())
     weather = []
     hourPosition = weatherPosition
     h = hourFromBytes(hourPosition)
@@ -100,30 +185,49 @@ def getWeatherFromConfigFile():
 # Fonctions pour gérer le fichier de configuration
 #
 
-# Télécharge le fichier de configuration seule depuis l'Ecodevice, le
+# Vérifie qu'un fichier peut contenir les données météo : il doit
+# couvrir la position des données météo, et le premier enregistrement
+# doit être une heure valide ou vide (lève une exception sinon)
+def validateConfigFile(fullfilename):
+    with open(fullfilename, "rb") as infile:
+        infile.seek(weatherPosition)
+        record = infile.read(weatherHourLength)
+    if len(record) < weatherHourLength:
+        raise Exception(f'données météo absentes, {os.path.getsize(fullfilename)} octets')
+    header = record[:4]
+    if header in (b'\x00' * 4, b'\xff' * 4):
+        return
+    try:
+        datetime.datetime(2000 + header[0], header[1], header[2], header[3])
+    except ValueError:
+        raise Exception(f'en-tête de la première heure de données météo invalide ({header.hex()})')
+
+# Télécharge le fichier de configuration seule depuis l'Ecodevice (par
+# morceaux, avec reprise et vérification, voir gcedownload.py), le
 # sauvegarde sous le nom de fichier donné et charge son contenu en
-# mémoire
+# mémoire. Retourne False si le téléchargement a échoué
 def downloadConfigfile(fullfilename, configType):
-    global arrConfig
-
     print('Téléchargement en cours...')
-    response = requests.get('http://' + ecodevice + '/admin/download/' + configAPI[configType] + '.gce')
-    if not response.status_code == 200:
-        print('Le téléchargement a échoué. Erreur : ' + str(response.status_code))
-        return
-    with open(fullfilename, "wb") as outfile:
-        outfile.write(response.content)
-    arrConfig=bytearray(response.content)
-
-# Charge le fichier de configuration en mémoire
+    try:
+        gcedownload.download_gce('http://' + ecodevice + '/admin/download/' + configAPI[configType] + '.gce', fullfilename, validateConfigFile)
+    except Exception as e:
+        print('Le téléchargement a échoué. ' + str(e))
+        return False
+    loadConfigFile(fullfilename)
+    return True
+
+# Charge le fichier de configuration en mémoire (lu directement dans le
+# bytearray, sans copie intermédiaire)
 def loadConfigFile(fullfilename):
     global arrConfig
     
     with open(fullfilename, "rb") as infile:
-        content=infile.read()
-    arrConfig=bytearray(content)
+        content=bytearray(os.fstat(infile.fileno()).st_size)
+        infile.readinto(content)
+    arrConfig=content
 
-# Permet de sélectionner le fichier de configuration et le charger en mémoire
+# Permet de sélectionner le fichier de configuration et le charger en
+# mémoire. Retourne False si aucun fichier n'a été chargé
 def selectAndLoadConfigFile():
     # Téléchargement de la configuration (ou travail sur un fichier existant)
     configType = 'config'
@@ -131,15 +235,17 @@ def selectAndLoadConfigFile():
     if choice == 'o':
         config_filename = configType + '_' + datetime.datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
         fullfilename = workingdir + '/' + config_filename + '.gce'
-        downloadConfigfile(fullfilename, configType)
+        if not downloadConfigfile(fullfilename, configType):
+            return False
         print(f'Le fichier a été enregistré et nommé {fullfilename}')
     else: # Travail avec un fichier existant déjà téléchargé (configuration seule ou configuration globale)
         config_filename = existing_filename
         fullfilename = workingdir + '/' + config_filename + '.gce'
         choice=input(f'Utiliser le fichier {fullfilename} ? [o/n]\n')
         if not choice == 'o':
-            return        
+            return False
         loadConfigFile(fullfilename)
+    return True
 
 #
 # Fonctions pour extraire les données météo depuis l'Ecodevice
@@ -150,50 +256,248 @@ def exclude_datetime_in_the_future(pair):
         key, value = pair
         return(key <= datetime.datetime.now())
 
-# Retourne les données météo par champ
-def getWeatherByField(startDate, field):
-        measure={}        
+# Session HTTP partagée (connexions conservées entre les requêtes)
+session = None
+
+# Nombre d'Ecodevice dont les connexions sont conservées par la session
+# (collecte de plusieurs Ecodevice, voir collector.py)
+maxSessionHosts = 16
+
+# Retourne la session HTTP partagée, créée à la première requête avec
+# autant de connexions par Ecodevice que de requêtes simultanées
+# (requests n'est importé qu'à ce moment, le décodage du fichier de
+# configuration n'en a pas besoin)
+def getSession():
+        global session
+        import requests
+        if session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=maxSessionHosts, pool_maxsize=maxConcurrentRequests)
+                session.mount('http://', adapter)
+        return session
+
+# Heure avant laquelle la prochaine requête vers chaque Ecodevice ne
+# doit pas partir (limitation du débit des requêtes, partagée entre les
+# threads)
+nextRequestTimes = {} # adresse -> heure
+rateLock = threading.Lock()
+
+# Attend que le délai minimum depuis la requête précédente vers le même
+# Ecodevice soit écoulé
+def waitRequestSlot(host):
+        with rateLock:
+                now = time.monotonic()
+                nextRequestTime = nextRequestTimes.get(host, 0.0)
+                wait = max(0.0, nextRequestTime - now)
+                nextRequestTimes[host] = max(now, nextRequestTime) + minRequestInterval
+        if wait > 0:
+                time.sleep(wait)
+
+# Envoie une requête graph.json à l'Ecodevice (celui du script, sauf si
+# une autre adresse est donnée) et retourne la réponse json, ou None si
+# la requête a échoué malgré les nouvelles tentatives (erreurs de
+# connexion et erreurs HTTP du serveur, avec un délai doublé à chaque
+# tentative), ou si l'échéance donnée (time.monotonic()) est atteinte
+def postGraph(param, host=None, deadline=None):
+        import requests
+        host = host or ecodevice
+        delay = retryBackoff
+        for attempt in range(requestRetries + 1):
+                if deadline is not None and time.monotonic() >= deadline:
+                        return None # requête abandonnée, signalée par getWeatherByFields
+                waitRequestSlot(host)
+                timeout = requestTimeout
+                if deadline is not None:
+                        timeout = tuple(min(value, max(0.1, deadline - time.monotonic())) for value in requestTimeout)
+                if attempt > 0 and gcestats.enabled:
+                        gcestats.count('http : graph.json nouvelles tentatives')
+                try:
+                        with gcestats.timer('http : graph.json', histogram=True):
+                                response = getSession().post('http://' + host + '/graph.json', data = param, headers = {'Content-Type': 'application/x-www-form-urlencoded'}, timeout = timeout)
+                        if gcestats.enabled:
+                                gcestats.count('http : graph.json octets reçus', len(response.content))
+                        if response.status_code == 200:
+                                return response.json()
+                        error = 'erreur HTTP ' + str(response.status_code)
+                        if response.status_code < 500:
+                                break
+                except (requests.ConnectionError, requests.Timeout) as e:
+                        error = type(e).__name__
+                if attempt < requestRetries:
+                        time.sleep(delay if deadline is None else max(0, min(delay, deadline - time.monotonic())))
+                        delay = delay * 2
+        if gcestats.enabled:
+                gcestats.count('http : graph.json échecs')
+        print('La requête avec les paramètres ' + str(param) + ' a échoué (' + error + ')')
+        return None
+
+# Retourne les dates des requêtes pour récupérer les données depuis une
+# date de début jusqu'à maintenant (une requête pour 3 jours : J-1, J,
+# J+1). Les périodes sont alignées sur des blocs de 3 jours depuis le
+# 01/01/2000 pour être les mêmes quelle que soit la date de début (et
+# pouvoir être conservées dans le cache local)
+def graphDates(startDate):
+        dates = []
         endDate = datetime.datetime.now()
         deltaDate = datetime.timedelta(days=3) # une requête pour 3 jours
-        iteratedDate = startDate + datetime.timedelta(days=1) # J-1, J, J+1
+        origin = datetime.datetime(2000, 1, 1)
+        firstDate = origin + deltaDate * ((datetime.datetime(startDate.year, startDate.month, startDate.day) - origin) // deltaDate)
+        iteratedDate = firstDate + datetime.timedelta(days=1) # J-1, J, J+1
         while (iteratedDate <= endDate + datetime.timedelta(days=1)):
-                param={'period': '1', 'startY': iteratedDate.year, 'startM': iteratedDate.month, 'startD': iteratedDate.day, 'opt': '2', 'target': field}
-                response = requests.post('http://' + ecodevice + '/graph.json', data = param, headers = {'Content-Type': 'application/x-www-form-urlencoded'})
-                if response.status_code == 200:
-                        responseJson = response.json()
-                        deltaTime = datetime.timedelta(hours=1)
-                        startTime=iteratedDate - datetime.timedelta(days=1)
-                        iteratedTime = startTime
-                        try:
-                                valueList = ast.literal_eval(responseJson['data'])
-                        except:
-                                # ignorer le champ
-                                print(weatherField[field] + ' sera ignoré (valeurs absentes ou non conformes).')
-                                return
+                dates.append(iteratedDate)
+                iteratedDate += deltaDate
+        return dates
+
+# Format d'une valeur de la liste 'data' des réponses graph.json
+graphNumber = re.compile(r'-?\d+(\.\d*)?([eE][-+]?\d+)?')
+
+# Refuse les constantes NaN et Infinity acceptées par json.loads
+def rejectGraphConstant(constant):
+        raise ValueError(f'valeur graph.json non conforme : {constant}')
+
+# Retourne la liste des valeurs horaires du texte 'data' d'une réponse
+# graph.json, de la forme [12.5,13,null,,14.25] : entiers ou réels, None
+# pour une heure sans valeur (vide ou null) ou une valeur non conforme.
+# Le texte est décodé par json.loads, et valeur par valeur seulement s'il
+# comporte des valeurs vides ou non conformes ; les valeurs vides en fin
+# de liste (virgule finale) sont ignorées pour ne pas décaler les heures.
+# Lève ValueError si le contenu n'est pas une liste
+def parseGraphData(data):
+        if isinstance(data, str):
+                try:
+                        values = json.loads(data, parse_constant=rejectGraphConstant)
+                except ValueError:
+                        values = None # valeurs vides ou non conformes
+                if type(values) is list and all(value is None or type(value) in (int, float) for value in values):
+                        return values
+        if isinstance(data, list): # liste déjà décodée
+                items = ['null' if value is None else str(value) for value in data]
+        elif isinstance(data, str) and data.startswith('[') and data.endswith(']'):
+                body = data[1:-1].strip()
+                items = body.split(',') if body else []
+        else:
+                raise ValueError(f'données graph.json non conformes : {str(data)[:40]}')
+        items = [item.strip() for item in items]
+        while items and items[-1] == '':
+                items.pop()
+        values = []
+        for item in items:
+                if item == '' or item == 'null' or graphNumber.fullmatch(item) is None:
+                        values.append(None)
+                elif item.isdigit() or (item[0] == '-' and item[1:].isdigit()):
+                        values.append(int(item))
+                else:
+                        values.append(float(item))
+        return values
+
+# Retourne la liste des valeurs d'un champ pour une requête (3 jours à
+# partir de la veille de la date donnée, None pour une heure sans
+# valeur), None si la requête a échoué ou n'est pas partie avant
+# l'échéance donnée. Lève ValueError si les valeurs sont absentes ou non
+# conformes
+def getGraphValues(iteratedDate, field, host=None, deadline=None):
+        param={'period': '1', 'startY': iteratedDate.year, 'startM': iteratedDate.month, 'startD': iteratedDate.day, 'opt': '2', 'target': field}
+        responseJson = postGraph(param, host, deadline)
+        if responseJson is None:
+                return None
+        try:
+                return parseGraphData(responseJson['data'])
+        except (KeyError, TypeError) as e:
+                raise ValueError(str(e))
+
+# Ouvre (et crée si besoin) le cache local des données météo : une
+# ligne par champ et par période de 3 jours récupérée, avec les valeurs
+# horaires et l'indication que la période est définitive
+def openWeatherCache(fullfilename):
+        cache = sqlite3.connect(fullfilename)
+        cache.execute('CREATE TABLE IF NOT EXISTS graph (field TEXT, start TEXT, final INTEGER, fetched TEXT, data TEXT, PRIMARY KEY (field, start))')
+        return cache
+
+# Retourne les valeurs conservées dans le cache pour les périodes
+# définitives d'un champ (date de la requête -> liste des valeurs)
+def getCachedGraphValues(cache, field):
+        rows = cache.execute('SELECT start, data FROM graph WHERE field = ? AND final = 1', (field,))
+        return {datetime.datetime.fromisoformat(start): json.loads(data) for start, data in rows}
+
+# Conserve dans le cache les valeurs d'une période récupérée, définitive
+# si sa fin est assez ancienne
+def storeGraphValues(cache, field, iteratedDate, valueList):
+        final = iteratedDate + datetime.timedelta(days=2) + finalDelay <= datetime.datetime.now()
+        cache.execute('INSERT OR REPLACE INTO graph VALUES (?, ?, ?, ?, ?)', (field, iteratedDate.isoformat(), int(final), datetime.datetime.now().isoformat(timespec='seconds'), json.dumps(valueList)))
+
+# Retourne les données météo de plusieurs champs (dictionnaire champ ->
+# données par heure depuis la date de début, None pour un champ ignoré).
+# Les requêtes de tous les champs et de toutes les périodes sont
+# envoyées en parallèle (dans la limite de maxConcurrentRequests) puis
+# les données sont remises dans l'ordre chronologique. Si un cache local
+# est donné, seules les périodes absentes du cache ou pas encore
+# définitives sont demandées à l'Ecodevice (celui du script, sauf si une
+# autre adresse est donnée). Si une échéance (time.monotonic()) est
+# donnée, les requêtes ne partent plus après elle, et une exception est
+# levée une fois les périodes déjà reçues conservées dans le cache
+def getWeatherByFields(startDate, fields, cache=None, host=None, deadline=None):
+        dates = graphDates(startDate)
+        cached = {field: getCachedGraphValues(cache, field) if cache is not None else {} for field in fields}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=maxConcurrentRequests) as executor:
+                futures = {field: {iteratedDate: executor.submit(getGraphValues, iteratedDate, field, host, deadline) for iteratedDate in dates if iteratedDate not in cached[field]} for field in fields}
+        weatherByField = {}
+        for field in fields:
+                measure={}
+                deltaTime = datetime.timedelta(hours=1)
+                for iteratedDate in dates:
+                        if iteratedDate in cached[field]:
+                                valueList = cached[field][iteratedDate]
+                        else:
+                                try:
+                                        valueList = futures[field][iteratedDate].result()
+                                except ValueError:
+                                        # ignorer le champ
+                                        print(weatherField[field] + ' sera ignoré (valeurs absentes ou non conformes).')
+                                        measure = None
+                                        break
+                                if valueList is None:
+                                        continue
+                                if cache is not None:
+                                        storeGraphValues(cache, field, iteratedDate, valueList)
+                        iteratedTime = iteratedDate - datetime.timedelta(days=1)
                         for value in valueList:
-                                measure[iteratedTime]=value
+                                if iteratedTime >= startDate and value is not None: # heure sans valeur manquante
+                                        measure[iteratedTime]=value
                                 iteratedTime += deltaTime
-                else:
-                        print('La requête avec les paramètres ' + str(param) + ' a échouée (erreur HTTP ' + response.status_code + ')')
-                iteratedDate += deltaDate                
-        return measure
+                weatherByField[field] = measure
+        if cache is not None:
+                cache.commit()
+        if deadline is not None and time.monotonic() >= deadline:
+                raise Exception('Récupération des données météo interrompue (délai dépassé).')
+        return weatherByField
 
-def getWeatherFromDevice(startDate):
+# Retourne les données météo par champ
+def getWeatherByField(startDate, field, cache=None, host=None):
+        return getWeatherByFields(startDate, [field], cache, host)[field]
+
+# Retourne les données météo par heure depuis une date de début, en
+# utilisant le cache local si il est donné (synchronisation incrémentale
+# : seules les périodes récentes ou manquantes sont demandées), depuis
+# l'Ecodevice du script sauf si une autre adresse est donnée, avant
+# l'échéance donnée s'il y en a une (voir getWeatherByFields)
+def getWeatherFromDevice(startDate, cache=None, host=None, deadline=None):
         # donnée météo pour chaque champ 
-        weatherByField={}
-        for field in weatherField:
-                weatherByField[field]=getWeatherByField(startDate, field)
-        # toutes les données météo par heure     
+        weatherByField=getWeatherByFields(startDate, list(weatherField), cache, host, deadline)
+        fields = [field for field in weatherField if weatherByField[field] is not None]
+        if not fields:
+                return []
+        # toutes les données météo par heure (heures d'au moins un champ,
+        # les champs sans valeur pour une heure restent vides)
         weather=[]
-        for keyDateTime in dict(filter(exclude_datetime_in_the_future, weatherByField[next(iter(weatherField))].items())): # n'importe quel champ météo est utilisé en référence pour l'heure
+        hours = set()
+        for field in fields:
+                hours.update(weatherByField[field])
+        for keyDateTime in sorted(dict(filter(exclude_datetime_in_the_future, dict.fromkeys(hours).items()))):
                 measure={}
                 measure['Heure']=f'{keyDateTime:%Y-%m-%d %H:00}'
-                for field in weatherField:
-                        try:
+                for field in fields:
+                        if keyDateTime in weatherByField[field]:
                                 measure[weatherField[field]]=weatherByField[field][keyDateTime]
-                        except:
-                                # ignorer les valeurs manquantes pour les champs ignorés
-                                continue
                 weather.append(measure)
         return weather 
 
@@ -202,6 +506,7 @@ def getWeatherFromDevice(startDate):
 #
 
 # Exporte les données meteo dans un fichier csv
+@gcestats.timed('csv : outputWeatherInCsv')
 def outputWeatherInCsv(weather, fullfilename):
     # entête csv
     field_names = []
@@ -222,10 +527,14 @@ def main():
 ##        # Récupération des données météo à partir de l'Ecodevice        
 ##        # Date de début des données météo (pour l'export à partir de l'Ecodevice)
 ##        startDate = datetime.datetime(2024, 1, 15)
-##        weather = getWeatherFromDevice(startDate)
+##        # Les périodes déjà récupérées sont conservées dans un cache
+##        # local et ne sont plus redemandées à l'Ecodevice
+##        cache = openWeatherCache(workingdir + '/' + weatherCache_filename)
+##        weather = getWeatherFromDevice(startDate, cache)
 
         # Ou récupération des données à partir d'un fichier de config
-        selectAndLoadConfigFile()
+        if not selectAndLoadConfigFile():
+                return
         weather = getWeatherFromConfigFile()
 
         # Export csv
@@ -235,6 +544,5 @@ def main():
         fullfilename=workingdir + '/' + filename + '.csv'
         outputWeatherInCsv(weather, fullfilename)
         
-main()
-
-
+if __name__ == '__main__':
+    main()